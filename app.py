@@ -1,18 +1,68 @@
+import atexit
+import base64
+import bisect
 import hashlib
+import hmac
 import json
 import os
 import csv
+import gzip
 import io
+import itertools
+import math
+import multiprocessing
+import queue
 import re
 import secrets
 import sqlite3
+import threading
+import time
 import uuid
 import zipfile
-from datetime import datetime, timezone
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
 import xml.etree.ElementTree as ET
 
-from flask import Flask, abort, jsonify, render_template, request, url_for
+from flask import (
+    Flask,
+    Response,
+    abort,
+    g,
+    has_request_context,
+    jsonify,
+    render_template,
+    request,
+    send_file,
+    stream_with_context,
+    url_for,
+)
+from flask.json.provider import DefaultJSONProvider
 from markupsafe import escape
+from werkzeug.exceptions import RequestEntityTooLarge
+
+try:
+    import brotli
+except ImportError:  # Optional: enables "br" response compression when installed.
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Optional: enables SHARE_DATA_CODEC=zstd when installed.
+    zstandard = None
+
+try:
+    import numpy
+except ImportError:  # Optional: runs the import coordinate checks as array operations.
+    numpy = None
+
+try:
+    import orjson
+except ImportError:  # Optional: faster JSON for share documents and API responses.
+    orjson = None
 
 ANALYTICS_KEYS = (
     "sessions_total",
@@ -34,18 +84,1492 @@ ANALYTICS_EVENTS = {
 APP_VERSION = os.environ.get("APP_VERSION", "1.4.1")
 MAPBOX_ACCESS_TOKEN = os.environ.get("MAPBOX_ACCESS_TOKEN") or os.environ.get("MAPBOX_TOKEN", "")
 MAPBOX_STYLE_URL = os.environ.get("MAPBOX_STYLE_URL", "mapbox://styles/mapbox/streets-v12")
+IMPORT_MAX_KML_BYTES = int(os.environ.get("IMPORT_MAX_KML_BYTES", str(512 * 1024 * 1024)))
+# Clusters are precomputed for zooms 0..CLUSTER_MAX_ZOOM on a grid of 2**CLUSTER_GRID_BITS
+# cells per Web Mercator tile side; closer in, clients page raw places by bbox instead.
+CLUSTER_MAX_ZOOM = 14
+CLUSTER_GRID_BITS = 2
+MERCATOR_MAX_LAT = 85.05112878
+EARTH_RADIUS_M = 6371008.8
+METRES_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+# Imported coordinates are rounded to ~0.1 m, finer than any consumer GPS fix.
+IMPORT_COORD_DECIMALS = 6
+IMPORT_COORD_SCALE = 10.0**IMPORT_COORD_DECIMALS
+PLACE_SEARCH_FIELDS = ("title", "note", "address")
+# Nearest-place search without a radius starts this wide and grows 4x until it has enough hits.
+SEARCH_START_RADIUS_M = 1000.0
+# Place rows are written this many at a time; the background indexer commits after each chunk
+# and then pauses, so writers waiting on the lock (whose busy handler backs off) get their turn.
+PLACE_INDEX_CHUNK = 500
+PLACE_INDEX_PAUSE = 0.02
+
+# Applied to every pooled connection. WAL lets readers run alongside a writer, and
+# synchronous=NORMAL is durable across application crashes in WAL mode.
+SQLITE_PRAGMAS = (
+    # Must precede the switch to WAL; only takes effect on a new database. Lets the
+    # maintenance task return freed pages to the disk with incremental_vacuum.
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+def cluster_cell(lat: float, lng: float, zoom: int) -> tuple:
+    scale = 1 << (zoom + CLUSTER_GRID_BITS)
+    lat = max(min(lat, MERCATOR_MAX_LAT), -MERCATOR_MAX_LAT)
+    sin_lat = math.sin(math.radians(lat))
+    x = int((lng + 180.0) / 360.0 * scale)
+    y = int((0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale)
+    return min(max(x, 0), scale - 1), min(max(y, 0), scale - 1)
+
+
+def cluster_deltas(added: list, removed: list) -> dict:
+    """Aggregates coordinate changes into per-cell (count, lat sum, lng sum) deltas."""
+    deltas = {}
+    for coords, sign in ((added, 1), (removed, -1)):
+        for lat, lng in coords:
+            # Cells nest: a coarser zoom's cell is the deepest one shifted right per level.
+            x, y = cluster_cell(lat, lng, CLUSTER_MAX_ZOOM)
+            for shift in range(CLUSTER_MAX_ZOOM + 1):
+                key = (CLUSTER_MAX_ZOOM - shift, x >> shift, y >> shift)
+                count, sum_lat, sum_lng = deltas.get(key, (0, 0.0, 0.0))
+                deltas[key] = (count + sign, sum_lat + sign * lat, sum_lng + sign * lng)
+    return deltas
+
+
+def radius_boxes(lat: float, lng: float, radius: float) -> list:
+    """Lat/lng boxes covering a circle of `radius` metres, split at the antimeridian."""
+    reach = math.degrees(radius / EARTH_RADIUS_M)
+    min_lat, max_lat = lat - reach, lat + reach
+    if min_lat <= -90 or max_lat >= 90:
+        return [(max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0)]
+    # Widest at the box edge farthest from the equator.
+    span = reach / math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if span >= 180:
+        return [(min_lat, max_lat, -180.0, 180.0)]
+    if lng - span < -180:
+        return [(min_lat, max_lat, lng - span + 360, 180.0), (min_lat, max_lat, -180.0, lng + span)]
+    if lng + span > 180:
+        return [(min_lat, max_lat, lng - span, 180.0), (min_lat, max_lat, -180.0, lng + span - 360)]
+    return [(min_lat, max_lat, lng - span, lng + span)]
+
+
+def distance_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def search_terms(query: str) -> list:
+    # Word characters only, so user input never reaches FTS5 query syntax.
+    return re.findall(r"\w+", query)
+
+
+def place_search_text(place: dict) -> tuple:
+    return tuple(str(place.get(field) or "") for field in PLACE_SEARCH_FIELDS)
+
+
+def place_entries(places: list) -> list:
+    """(position, place_id, place) for each place of a document, with ids made unique."""
+    entries = []
+    seen = set()
+    for position, place in enumerate(place for place in places if isinstance(place, dict)):
+        place_id = str(place.get("id") or f"#{position}")
+        if place_id in seen:
+            place_id = f"{place_id}#{position}"
+        seen.add(place_id)
+        entries.append((position, place_id, place))
+    return entries
+
+
+def sqlite_supports(statement: str) -> bool:
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute(statement)
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+    return True
+
+
+SQLITE_HAS_RTREE = sqlite_supports("CREATE VIRTUAL TABLE probe USING rtree(id, min_x, max_x)")
+SQLITE_HAS_FTS5 = sqlite_supports("CREATE VIRTUAL TABLE probe USING fts5(body)")
+
+
+class ConnectionPool:
+    """Reusable SQLite connections shared by the request threads of one process."""
+
+    def __init__(self, db_path: str, size: int = 8, timeout: float = 5.0):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._closed = False
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _check_fork(self) -> None:
+        # Connections must not cross fork(): a preloaded parent hands workers a fresh pool.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._idle = queue.LifoQueue(maxsize=self.size)
+                self._pid = os.getpid()
+                self._closed = False
+
+    def acquire(self) -> sqlite3.Connection:
+        self._check_fork()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._open()
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed or self._pid != os.getpid():
+            conn.close()
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
+            conn.close()
+
+
+class AnalyticsBuffer:
+    """Coalesces counter increments in memory and writes them in one transaction."""
+
+    thread_name = "analytics-flush"
+
+    def __init__(self, write, max_pending: int = 100, interval: float = 5.0):
+        self._write = write
+        self.max_pending = max(1, max_pending)
+        self.interval = interval
+        self._pending = {}
+        self._pending_events = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def add(self, metric: str, amount: int = 1) -> None:
+        with self._lock:
+            self._pending[metric] = self.merge(self._pending.get(metric), amount)
+            self._pending_events += 1
+            due = (
+                self._pending_events >= self.max_pending
+                or time.monotonic() - self._last_flush >= self.interval
+            )
+        self._ensure_thread()
+        if due:
+            self.flush()
+
+    def pending(self) -> dict:
+        with self._lock:
+            return dict(self._pending)
+
+    def totals(self, read) -> dict:
+        # Holding the flush lock keeps an in-flight batch from being counted twice or not at all.
+        with self._flush_lock:
+            data = read()
+            pending = self.pending()
+        for metric, amount in pending.items():
+            data[metric] = data.get(metric, 0) + amount
+        return data
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._pending_events = 0
+                self._last_flush = time.monotonic()
+            if not batch:
+                return
+            try:
+                self._write(batch)
+            except Exception:
+                # Put the batch back so a failed write (e.g. a locked database) is retried later.
+                with self._lock:
+                    for metric, amount in batch.items():
+                        self._pending[metric] = self.merge(self._pending.get(metric), amount)
+                raise
+
+    @staticmethod
+    def merge(current, value):
+        return (current or 0) + value
+
+    def _ensure_thread(self) -> None:
+        if self.interval <= 0 or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wakeup.clear()
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._wakeup.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        self._wakeup.set()
+        self.flush()
+
+
+class AccessTimeBuffer(AnalyticsBuffer):
+    """Keeps the latest access time per share in memory and writes them in batches."""
+
+    thread_name = "access-flush"
+
+    @staticmethod
+    def merge(current, value):
+        return value if current is None else max(current, value)
+
+
+class PeriodicTask:
+    """Runs `job` every `interval` seconds on a daemon thread, started lazily in each process."""
+
+    def __init__(self, job, interval: float, name: str):
+        self._job = job
+        self.interval = interval
+        self.name = name
+        self._stop = threading.Event()
+        self._due = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def ensure_started(self) -> None:
+        if self.interval <= 0 or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def wake(self) -> None:
+        """Runs the job now rather than at the end of the current interval."""
+        self.ensure_started()
+        self._due.set()
+
+    def _run(self) -> None:
+        while True:
+            self._due.wait(self.interval)
+            if self._stop.is_set():
+                return
+            self._due.clear()
+            try:
+                self._job()
+            except Exception:
+                # A busy or locked database just means this round is skipped.
+                pass
+
+    def close(self) -> None:
+        self._stop.set()
+        self._due.set()
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class MetricsRegistry:
+    """In-process histograms, rendered in the Prometheus text exposition format.
+
+    An observation is a bisect and three additions under a lock, cheap enough to keep on
+    every request. Values are per process; each worker reports its own.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help_text: str, buckets=LATENCY_BUCKETS) -> None:
+        self._histograms[name] = (help_text, tuple(buckets), {})
+
+    def collector(self, collect) -> None:
+        """Registers `collect() -> [(name, type, help, value)]`, read at render time."""
+        self._collectors.append(collect)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        _, buckets, series = self._histograms[name]
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(buckets, value)
+        with self._lock:
+            entry = series.get(key)
+            if entry is None:
+                entry = series[key] = [[0] * (len(buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    @staticmethod
+    def _labels(pairs) -> str:
+        if not pairs:
+            return ""
+        escaped = []
+        for key, value in pairs:
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            escaped.append(f'{key}="{value}"')
+        return "{" + ",".join(escaped) + "}"
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            snapshot = {
+                name: (help_text, buckets, {key: (list(entry[0]), entry[1]) for key, entry in series.items()})
+                for name, (help_text, buckets, series) in self._histograms.items()
+            }
+        for name, (help_text, buckets, series) in snapshot.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, (counts, total) in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip((*buckets, "+Inf"), counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{self._labels((*key, ('le', bound)))} {cumulative}")
+                lines.append(f"{name}_sum{self._labels(key)} {total}")
+                lines.append(f"{name}_count{self._labels(key)} {cumulative}")
+        for collect in self._collectors:
+            for name, kind, help_text, value in collect():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def timed_iter(iterable, observe):
+    """Yields from `iterable`, reporting only the time spent producing items to `observe`."""
+    iterator = iter(iterable)
+    elapsed = 0.0
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - started
+            yield item
+    finally:
+        observe(elapsed)
+
+
+class VerifiedPasswordCache:
+    """Bounded LRU of recently verified share passwords, so PBKDF2 runs once per TTL."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(stored_hash: str, salt: str, supplied: str) -> tuple:
+        # Keep only a fast digest of the candidate in memory, never the password itself.
+        digest = hashlib.sha256(f"{salt}:{supplied}".encode("utf-8")).digest()
+        return stored_hash, digest
+
+    def check(self, key: tuple) -> bool:
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def add(self, key: tuple) -> None:
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, stored_hash: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == stored_hash]:
+                del self._entries[key]
+
+
+class LRUCache:
+    """Small thread-safe LRU mapping for per-process lookups."""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max(1, max_size)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+# Stored share documents start with a codec marker; legacy rows are plain JSON text.
+SHARE_DATA_MARKERS = {"zlib": b"\x00z", "zstd": b"\x00s"}
+SHARE_DATA_CODECS = ("none", *SHARE_DATA_MARKERS)
+# A share's document: its blob, or the inline copy of rows written before blobs existed.
+SHARE_DOCUMENT_SQL = "COALESCE((SELECT data FROM share_blobs WHERE hash = shares.blob_hash), shares.data)"
+# A share past its expiry is gone to every request at once; maintenance deletes the row later.
+# Bound to the current time from utc_now(); ISO timestamps in UTC compare correctly as text.
+SHARE_LIVE_SQL = "(shares.expires_at IS NULL OR shares.expires_at > ?)"
+
+
+def utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+# Response codings in order of preference; br needs the optional brotli package.
+RESPONSE_CODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+# Below this size the compression header and CPU cost outweigh the saved bytes.
+COMPRESS_MIN_BYTES = 1024
+
+
+def dumps_json(value) -> str:
+    """JSON text for storage: orjson when installed, the json module for anything it rejects."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(value)
+
+
+def loads_json(data):
+    """Parses JSON text or UTF-8 bytes; the json module takes what orjson rejects (NaN, huge ints)."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except ValueError:
+            pass
+    return json.loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, with orjson doing the encoding and decoding when it is installed."""
+
+    def _encode(self, obj, indent: bool = False) -> bytes:
+        # Dates and dataclasses go through `default`, so output matches the json module's.
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs) -> str:
+        # Only the layouts Flask itself asks for; anything else is the json module's job.
+        if orjson is not None and kwargs in ({}, {"separators": (",", ":")}, {"indent": 2}):
+            try:
+                return self._encode(obj, indent="indent" in kwargs).decode("utf-8")
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return super().loads(s, **kwargs) if kwargs else loads_json(s)
+
+    def response(self, *args, **kwargs) -> Response:
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        # The same arguments as jsonify(): one value, several (a list), or keyword arguments.
+        if args and kwargs:
+            raise TypeError("app.json.response() takes either args or kwargs, not both")
+        obj = args[0] if len(args) == 1 else args or kwargs or None
+        try:
+            body = self._encode(obj, indent=(self.compact is None and self._app.debug) or self.compact is False)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+# Known place fields and the types their parsed JSON values may have; missing and null are
+# always fine. Other fields, such as photos, are stored untouched. Exact types, so bool is no int.
+PLACE_FIELD_TYPES = {
+    field: frozenset(types) | {type(None)}
+    for field, types in (
+        ("id", (str, int)),
+        ("title", (str,)),
+        ("note", (str,)),
+        ("address", (str,)),
+        ("lat", (int, float)),
+        ("lng", (int, float)),
+        ("createdAt", (str, int, float)),
+    )
+}
+
+
+class InvalidPlaces(ValueError):
+    pass
+
+
+def has_non_finite(value) -> bool:
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(has_non_finite(item) for item in value.values())
+    if isinstance(value, list):
+        return any(has_non_finite(item) for item in value)
+    return False
+
+
+def validate_places(places) -> list:
+    """Checks places against PLACE_FIELD_TYPES; raises InvalidPlaces naming the first bad value."""
+    if not isinstance(places, list):
+        raise InvalidPlaces("places must be a list")
+    for index, place in enumerate(places):
+        if not isinstance(place, dict):
+            raise InvalidPlaces(f"places[{index}] must be an object")
+        for field, types in PLACE_FIELD_TYPES.items():
+            if type(place.get(field)) not in types:
+                raise InvalidPlaces(f"places[{index}].{field} has the wrong type")
+        # The json module accepts NaN and Infinity, but orjson would write them back as null and
+        # the json module as invalid JSON, so they are not stored at all.
+        if has_non_finite(place):
+            raise InvalidPlaces(f"places[{index}] contains NaN or Infinity")
+    return places
+
+
+def splice_share_document(document: bytes, fields: dict):
+    """Adds `fields` to a stored share document without parsing it, or returns None if it can't."""
+    # Documents are written as {"title": <non-empty>, "places": [...]}, with nothing else in them.
+    if not (document.startswith(b'{"title":') and document.endswith(b"}")):
+        return None
+    return document[:-1] + b"," + dumps_json(fields).encode("utf-8")[1:]
+
+
+def encode_share_data(text: str, codec: str = "zlib"):
+    if codec == "none":
+        return text
+    raw = text.encode("utf-8")
+    if codec == "zstd":
+        return SHARE_DATA_MARKERS["zstd"] + zstandard.ZstdCompressor(level=6).compress(raw)
+    return SHARE_DATA_MARKERS["zlib"] + zlib.compress(raw, 6)
+
+
+def decode_share_bytes(value) -> bytes:
+    """The stored document as UTF-8 bytes, which loads_json and responses take without decoding."""
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    marker, payload = bytes(value[:2]), value[2:]
+    if marker == SHARE_DATA_MARKERS["zlib"]:
+        return zlib.decompress(payload)
+    if marker == SHARE_DATA_MARKERS["zstd"]:
+        if zstandard is None:
+            raise RuntimeError("zstd-compressed shares need the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    return bytes(value)
+
+
+# What decode_share_bytes raises for a damaged row, or a zstd one without the zstandard package.
+SHARE_DATA_ERRORS = (zlib.error, RuntimeError) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+def decode_share_data(value) -> str:
+    return value if isinstance(value, str) else decode_share_bytes(value).decode("utf-8")
+
+
+def compress_body(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def iter_compressed(chunks, coding: str):
+    # Flushes after every chunk so a streamed body still reaches the client incrementally.
+    if coding == "br":
+        compressor = brotli.Compressor(quality=5)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+class ShareResponseCache:
+    """Bounded LRU of serialized share responses keyed by (share id, revision).
+
+    Each entry maps a content coding ("identity", "gzip") to ready-to-send bytes, so a hot
+    share is read from SQLite and encoded once per revision instead of once per request.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, share_id: str, revision: int):
+        with self._lock:
+            variants = self._entries.get((share_id, revision))
+            if variants is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((share_id, revision))
+            self.hits += 1
+            return dict(variants)
+
+    def put(self, share_id: str, revision: int, coding: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            variants = self._entries.setdefault((share_id, revision), {})
+            self._bytes += len(body) - len(variants.get(coding, b""))
+            variants[coding] = body
+            self._entries.move_to_end((share_id, revision))
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= sum(len(data) for data in evicted.values())
+                self.evictions += 1
+
+    def invalidate(self, share_id: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == share_id]:
+                self._bytes -= sum(len(data) for data in self._entries.pop(key).values())
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class LocalShareEvents:
+    """In-process pub/sub of share change notifications, keyed by share id."""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, share_id: str, event: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(share_id, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Events only say "changed"; a slow listener loses nothing by skipping one.
+                pass
+
+    def subscribe(self, share_id: str) -> queue.Queue:
+        subscriber = queue.Queue(maxsize=16)
+        with self._lock:
+            self._subscribers.setdefault(share_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, share_id: str, subscriber: queue.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(share_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[share_id]
+
+    def watched(self) -> set:
+        with self._lock:
+            return set(self._subscribers)
+
+    @contextmanager
+    def listen(self, share_id: str):
+        subscriber = self.subscribe(share_id)
+        try:
+            yield subscriber
+        finally:
+            self.unsubscribe(share_id, subscriber)
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteShareEvents(LocalShareEvents):
+    """Fans out changes written by other worker processes by watching shares.updated_at."""
+
+    # Rows can commit slightly after the timestamp they carry; rescan this window each tick.
+    OVERLAP = timedelta(seconds=5)
+
+    def __init__(self, get_db, interval: float = 0.5):
+        super().__init__()
+        self._get_db = get_db
+        self.interval = interval
+        self._seen = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def publish(self, share_id: str, event: dict) -> None:
+        if self._mark_seen(share_id, event.get("updatedAt")):
+            super().publish(share_id, event)
+
+    def subscribe(self, share_id: str) -> queue.Queue:
+        self._ensure_thread()
+        return super().subscribe(share_id)
+
+    def _mark_seen(self, share_id: str, updated_at) -> bool:
+        with self._lock:
+            if self._seen.get(share_id) == updated_at:
+                return False
+            self._seen[share_id] = updated_at
+            return True
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="share-events", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        cursor = datetime.now(timezone.utc)
+        while not self._stop.wait(self.interval):
+            watched = self.watched()
+            with self._lock:
+                self._seen = {key: value for key, value in self._seen.items() if key in watched}
+            if not watched:
+                cursor = datetime.now(timezone.utc)
+                continue
+            since = (cursor - self.OVERLAP).isoformat()
+            try:
+                with self._get_db() as conn:
+                    rows = conn.execute(
+                        "SELECT id, updated_at, revision FROM shares WHERE updated_at > ?", (since,)
+                    ).fetchall()
+            except sqlite3.Error:
+                continue
+            for row in rows:
+                updated_at = row["updated_at"]
+                cursor = max(cursor, datetime.fromisoformat(updated_at))
+                if row["id"] in watched:
+                    self.publish(
+                        row["id"], {"id": row["id"], "updatedAt": updated_at, "revision": row["revision"]}
+                    )
+
+    def close(self) -> None:
+        self._stop.set()
+
+
+def render_markdown(text: str) -> str:
+    if not text:
+        return "<p>Changelog is unavailable right now.</p>"
+
+    lines = text.splitlines()
+    html_parts = []
+    in_list = False
+    paragraph = []
+
+    def flush_paragraph():
+        nonlocal paragraph
+        if paragraph:
+            content = " ".join(paragraph).strip()
+            if content:
+                html_parts.append(f"<p>{format_inline_markdown(content)}</p>")
+            paragraph = []
+
+    def close_list():
+        nonlocal in_list
+        if in_list:
+            html_parts.append("</ul>")
+            in_list = False
+
+    def format_inline_markdown(value: str) -> str:
+        safe = escape(value)
+        safe = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", safe)
+        safe = re.sub(r"`(.+?)`", r"<code>\1</code>", safe)
+        return safe
+
+    for raw_line in lines:
+        line = raw_line.rstrip()
+        stripped = line.strip()
+
+        if not stripped:
+            flush_paragraph()
+            close_list()
+            continue
+
+        if stripped.startswith("### "):
+            flush_paragraph()
+            close_list()
+            html_parts.append(f"<h4>{format_inline_markdown(stripped[4:])}</h4>")
+            continue
+        if stripped.startswith("## "):
+            flush_paragraph()
+            close_list()
+            html_parts.append(f"<h3>{format_inline_markdown(stripped[3:])}</h3>")
+            continue
+        if stripped.startswith("# "):
+            flush_paragraph()
+            close_list()
+            html_parts.append(f"<h2>{format_inline_markdown(stripped[2:])}</h2>")
+            continue
+
+        if stripped.startswith("- ") or stripped.startswith("— "):
+            flush_paragraph()
+            if not in_list:
+                html_parts.append("<ul>")
+                in_list = True
+            html_parts.append(f"<li>{format_inline_markdown(stripped[2:])}</li>")
+            continue
+
+        paragraph.append(stripped)
+
+    flush_paragraph()
+    close_list()
+
+    return "\n".join(html_parts)
+
+
+def parse_float(value):
+    try:
+        return float(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def grid_cell(x: float, y: float) -> tuple:
+    # The cell plus, per axis, the side of the cell the point is nearer to.
+    cell_x, cell_y = math.floor(x), math.floor(y)
+    return cell_x, cell_y, 1 if x - cell_x >= 0.5 else -1, 1 if y - cell_y >= 0.5 else -1
+
+
+def round_coordinate(value: float) -> float:
+    # Scale, round half to even, unscale: the same float operations as the NumPy path below, so
+    # both give identical results (round(value, 6) rounds the decimal value and can differ).
+    # A negative zero comes out as 0.0.
+    return round(value * IMPORT_COORD_SCALE) / IMPORT_COORD_SCALE
+
+
+def scan_coordinates(rows: list, cell_m: float = 0.0) -> list:
+    """Returns (index, lat, lng, cell) for each row whose coordinates are in range, rounded.
+
+    `cell` places the point on a grid `cell_m` metres wide for near-duplicate lookups (see
+    grid_cell), or is None when `cell_m` is 0. With NumPy installed the chunk is checked as arrays.
+    """
+    if numpy is not None:
+        count = len(rows)
+        lat = numpy.fromiter((math.nan if row[0] is None else row[0] for row in rows), numpy.float64, count)
+        lng = numpy.fromiter((math.nan if row[1] is None else row[1] for row in rows), numpy.float64, count)
+        with numpy.errstate(invalid="ignore"):
+            index = numpy.flatnonzero((numpy.abs(lat) <= 90) & (numpy.abs(lng) <= 180))
+        # See round_coordinate; adding 0.0 turns a negative zero into 0.0.
+        lat = numpy.rint(lat[index] * IMPORT_COORD_SCALE) / IMPORT_COORD_SCALE + 0.0
+        lng = numpy.rint(lng[index] * IMPORT_COORD_SCALE) / IMPORT_COORD_SCALE + 0.0
+        cells = [None] * len(index)
+        if cell_m:
+            y = lat * METRES_PER_DEGREE / cell_m
+            x = lng * numpy.cos(numpy.radians(lat)) * METRES_PER_DEGREE / cell_m
+            cell_x, cell_y = numpy.floor(x), numpy.floor(y)
+            cells = list(
+                zip(
+                    cell_x.astype(numpy.int64).tolist(),
+                    cell_y.astype(numpy.int64).tolist(),
+                    numpy.where(x - cell_x >= 0.5, 1, -1).tolist(),
+                    numpy.where(y - cell_y >= 0.5, 1, -1).tolist(),
+                )
+            )
+        return list(zip(index.tolist(), lat.tolist(), lng.tolist(), cells))
+
+    scanned = []
+    for index, row in enumerate(rows):
+        lat, lng = row[0], row[1]
+        # NaN fails both comparisons, so it is dropped along with out-of-range values.
+        if lat is None or lng is None or not (abs(lat) <= 90 and abs(lng) <= 180):
+            continue
+        lat, lng = round_coordinate(lat), round_coordinate(lng)
+        cell = None
+        if cell_m:
+            cell = grid_cell(
+                lng * math.cos(math.radians(lat)) * METRES_PER_DEGREE / cell_m, lat * METRES_PER_DEGREE / cell_m
+            )
+        scanned.append((index, lat, lng, cell))
+    return scanned
+
+
+class ImportCleaner:
+    """Turns parsed rows into places, dropping bad coordinates and merging near-duplicates.
+
+    A point is a near-duplicate when an earlier point with the same title (ignoring case and
+    spacing) lies within `dedup_m` metres; 0 keeps every point.
+    """
+
+    def __init__(self, dedup_m: float = 0.0):
+        self.dedup_m = max(0.0, dedup_m)
+        self.dropped = 0
+        self.merged = 0
+        self._cells = {}
+
+    def _is_duplicate(self, lat: float, lng: float, cell: tuple, key: str) -> bool:
+        # Cells are twice the merge distance wide, so any match lies in the point's own cell
+        # or in the three neighbours on the side of it the point is nearer to.
+        x, y, step_x, step_y = cell
+        for neighbour in ((x, y), (x + step_x, y), (x, y + step_y), (x + step_x, y + step_y)):
+            for other_lat, other_lng, other_key in self._cells.get(neighbour, ()):
+                if other_key == key and distance_m(lat, lng, other_lat, other_lng) <= self.dedup_m:
+                    return True
+        self._cells.setdefault((x, y), []).append((lat, lng, key))
+        return False
+
+    def counts(self, places: int) -> dict:
+        return {"places": places, "routes": 0, "dropped": self.dropped, "merged": self.merged}
+
+    def clean(self, rows: list) -> list:
+        scanned = scan_coordinates(rows, 2 * self.dedup_m)
+        self.dropped += len(rows) - len(scanned)
+        places = []
+        for index, lat, lng, cell in scanned:
+            _, _, title, note, address = rows[index]
+            title = (title or "Untitled").strip() or "Untitled"
+            if cell is not None and self._is_duplicate(lat, lng, cell, " ".join(title.casefold().split())):
+                self.merged += 1
+                continue
+            places.append({"title": title, "lat": lat, "lng": lng, "note": note or "", "address": address or ""})
+        # One timestamp and one urandom call for the whole chunk instead of one per place.
+        created_at = datetime.now(timezone.utc).isoformat()
+        ids = os.urandom(16 * len(places)).hex()
+        return [
+            {"id": ids[offset * 32 : offset * 32 + 32], **place, "createdAt": created_at}
+            for offset, place in enumerate(places)
+        ]
+
+
+def as_stream(source):
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+
+def local_name(tag) -> str:
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def child_text(element, name: str) -> str:
+    for child in element:
+        if local_name(child.tag) == name:
+            return child.text or ""
+    return ""
+
+
+def iter_xml_elements(source, target: str):
+    # Yields each completed `target` element and then drops everything parsed so far
+    # under its parent, so memory stays flat however many elements the file holds.
+    stack = []
+    open_targets = 0
+    for event, element in ET.iterparse(as_stream(source), events=("start", "end")):
+        if event == "start":
+            stack.append(element)
+            if local_name(element.tag) == target:
+                open_targets += 1
+            continue
+        stack.pop()
+        is_target = local_name(element.tag) == target
+        if is_target:
+            open_targets -= 1
+            yield element
+        if open_targets == 0 and stack:
+            del stack[-1][:]
+
+
+def parse_gpx_places(source):
+    for point in iter_xml_elements(source, "wpt"):
+        lat = parse_float(point.attrib.get("lat"))
+        lng = parse_float(point.attrib.get("lon"))
+        name = child_text(point, "name")
+        desc = child_text(point, "desc")
+        yield lat, lng, name or "GPX point", desc, ""
+
+
+def parse_csv_places(source):
+    text = io.TextIOWrapper(as_stream(source), encoding="utf-8-sig", errors="replace", newline="")
+    reader = csv.DictReader(text)
+    if not reader.fieldnames:
+        return
+
+    key_map = {name.strip().lower(): name for name in reader.fieldnames if name}
+    lat_key = next((key_map[k] for k in ("latitude", "lat") if k in key_map), None)
+    lng_key = next((key_map[k] for k in ("longitude", "lng", "lon") if k in key_map), None)
+    title_key = next((key_map[k] for k in ("title", "name") if k in key_map), None)
+    note_key = next((key_map[k] for k in ("note", "description", "desc") if k in key_map), None)
+    address_key = next((key_map[k] for k in ("address", "location") if k in key_map), None)
+
+    if not lat_key or not lng_key:
+        return
+
+    for row in reader:
+        lat = parse_float(row.get(lat_key))
+        lng = parse_float(row.get(lng_key))
+        title = row.get(title_key) if title_key else "CSV point"
+        note = row.get(note_key) if note_key else ""
+        address = row.get(address_key) if address_key else ""
+        yield lat, lng, title, note, address
+
+
+def parse_kml_places(source):
+    for placemark in iter_xml_elements(source, "Placemark"):
+        point = next((element for element in placemark.iter() if local_name(element.tag) == "Point"), None)
+        coords = child_text(point, "coordinates") if point is not None else ""
+        if not coords.strip():
+            continue
+        first = coords.strip().split()[0]
+        parts = [part.strip() for part in first.split(",")]
+        lng = parse_float(parts[0])
+        lat = parse_float(parts[1]) if len(parts) > 1 else None
+        name = child_text(placemark, "name")
+        desc = child_text(placemark, "description")
+        yield lat, lng, name or "KML point", desc, ""
+
+
+def parse_kmz_places(source, max_kml_bytes: int = IMPORT_MAX_KML_BYTES):
+    with zipfile.ZipFile(as_stream(source)) as archive:
+        member = next((info for info in archive.infolist() if info.filename.lower().endswith(".kml")), None)
+        if not member:
+            return
+        if member.file_size > max_kml_bytes:
+            raise ValueError("KML document is too large")
+        # Decompress while parsing instead of reading the whole member up front.
+        with archive.open(member) as kml_stream:
+            yield from parse_kml_places(kml_stream)
+
+
+IMPORT_PARSERS = {
+    ".gpx": parse_gpx_places,
+    ".csv": parse_csv_places,
+    ".kmz": parse_kmz_places,
+}
+
+IMPORT_PARSE_ERRORS = (ET.ParseError, zipfile.BadZipFile, UnicodeDecodeError, ValueError)
+
+
+class ImportLimitError(ValueError):
+    pass
+
+
+def iter_place_batches(rows, max_places: int, cleaner: ImportCleaner, batch_size: int = 256):
+    """Yields lists of JSON-encoded places, cleaning `batch_size` rows at a time; enforces the point limit."""
+    rows = iter(rows)
+    count = 0
+    while True:
+        chunk = list(itertools.islice(rows, batch_size))
+        if not chunk:
+            return
+        places = cleaner.clean(chunk)
+        count += len(places)
+        if count > max_places:
+            raise ImportLimitError("too many points")
+        if places:
+            yield [dumps_json(place) for place in places]
+
+
+class PatchConflict(Exception):
+    pass
+
+
+def apply_place_ops(places: list, ops: list) -> list:
+    """Applies PATCH operations keyed by place id; raises ValueError for malformed ops."""
+    if not isinstance(ops, list):
+        raise ValueError("ops must be a list")
+    places = [place for place in places if isinstance(place, dict)]
+
+    def index_by_id(place_id):
+        return next((index for index, place in enumerate(places) if place.get("id") == place_id), None)
+
+    for op in ops:
+        if not isinstance(op, dict):
+            raise ValueError("op must be an object")
+        kind = op.get("op")
+        if kind == "add":
+            place = op.get("place")
+            if not isinstance(place, dict) or not place.get("id"):
+                raise ValueError("add needs a place with an id")
+            if index_by_id(place["id"]) is not None:
+                raise PatchConflict(place["id"])
+            index = op.get("index")
+            places.insert(index if isinstance(index, int) and index >= 0 else len(places), place)
+        elif kind == "update":
+            index = index_by_id(op.get("id"))
+            if index is None:
+                raise PatchConflict(op.get("id"))
+            if isinstance(op.get("place"), dict):
+                places[index] = {**op["place"], "id": op["id"]}
+            elif isinstance(op.get("fields"), dict):
+                places[index] = {**places[index], **op["fields"], "id": op["id"]}
+            else:
+                raise ValueError("update needs place or fields")
+        elif kind == "remove":
+            index = index_by_id(op.get("id"))
+            if index is not None:
+                del places[index]
+        elif kind == "reorder":
+            order = op.get("order")
+            if not isinstance(order, list):
+                raise ValueError("reorder needs an order list")
+            rank = {place_id: position for position, place_id in enumerate(order)}
+            # Places missing from `order` keep their relative order after the listed ones.
+            places.sort(key=lambda place: rank.get(place.get("id"), len(rank)))
+        else:
+            raise ValueError(f"unknown op {kind!r}")
+    return places
+
+
+XML_CONTROL_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+EXPORT_MIMETYPES = {
+    "gpx": "application/gpx+xml",
+    "kml": "application/vnd.google-earth.kml+xml",
+    "kmz": "application/vnd.google-earth.kmz",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def escape_xml(value) -> str:
+    text = XML_CONTROL_CHARS.sub("", str(value))
+    return (
+        text.replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace(">", "&gt;")
+        .replace('"', "&quot;")
+        .replace("'", "&apos;")
+    )
+
+
+def export_description(place: dict, lat: float, lng: float) -> str:
+    address = place.get("address") or f"{lat:.5f}, {lng:.5f}"
+    return f"{place['note']}\n{address}" if place.get("note") else address
+
+
+def iter_exportable(places):
+    for place in places:
+        lat, lng = parse_float(place.get("lat")), parse_float(place.get("lng"))
+        if lat is not None and lng is not None:
+            yield place, lat, lng
+
+
+def export_gpx(title: str, places, updated_at: str):
+    """Streams the same GPX document the browser exporter in share.js builds."""
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<gpx version="1.1" creator="GeoNotion" xmlns="http://www.topografix.com/GPX/1/1">\n'
+        f"  <metadata>\n    <name>{escape_xml(title)}</name>\n    <time>{updated_at}</time>\n  </metadata>\n"
+    )
+    for place, lat, lng in iter_exportable(places):
+        yield (
+            f'  <wpt lat="{place["lat"]}" lon="{place["lng"]}">\n'
+            f"    <name>{escape_xml(place.get('title') or 'Untitled')}</name>\n"
+            f"    <desc>{escape_xml(export_description(place, lat, lng))}</desc>\n"
+            "  </wpt>\n"
+        )
+    yield "</gpx>"
+
+
+def export_kml(title: str, places, updated_at: str):
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<kml xmlns="http://www.opengis.net/kml/2.2">\n'
+        f"  <Document>\n    <name>{escape_xml(title)}</name>\n"
+    )
+    for place, lat, lng in iter_exportable(places):
+        yield (
+            "    <Placemark>\n"
+            f"      <name>{escape_xml(place.get('title') or 'Untitled')}</name>\n"
+            f"      <description>{escape_xml(export_description(place, lat, lng))}</description>\n"
+            "      <Point>\n"
+            f"        <coordinates>{place['lng']},{place['lat']},0</coordinates>\n"
+            "      </Point>\n"
+            "    </Placemark>\n"
+        )
+    yield "  </Document>\n</kml>"
+
 
+def export_csv(title: str, places, updated_at: str):
+    def row(values) -> str:
+        cells = []
+        for value in values:
+            text = "" if value is None else str(value)
+            cells.append('"' + text.replace('"', '""') + '"' if re.search(r'[",\n]', text) else text)
+        return ",".join(cells)
 
-def create_app() -> Flask:
+    yield row(("Title", "Note", "Address", "Latitude", "Longitude"))
+    for place in places:
+        values = (place.get(key) for key in ("title", "note", "address", "lat", "lng"))
+        yield "\n" + row(values)
+
+
+class StreamSink(io.RawIOBase):
+    """Write-only, unseekable file that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        chunks, self._chunks = self._chunks, []
+        return b"".join(chunks)
+
+
+def export_kmz(title: str, places, updated_at: str):
+    # zipfile writes data descriptors when it cannot seek, so the archive is produced
+    # front to back as the KML is generated, without holding the document in memory.
+    sink = StreamSink()
+    stamp = datetime.fromisoformat(updated_at).timetuple()[:6]
+    member = zipfile.ZipInfo("doc.kml", date_time=max(stamp, (1980, 1, 1, 0, 0, 0)))
+    member.compress_type = zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(sink, mode="w") as archive:
+        with archive.open(member, mode="w") as kml:
+            for chunk in export_kml(title, places, updated_at):
+                kml.write(chunk.encode("utf-8"))
+                data = sink.drain()
+                if data:
+                    yield data
+    yield sink.drain()
+
+
+EXPORTERS = {"gpx": export_gpx, "kml": export_kml, "kmz": export_kmz, "csv": export_csv}
+
+
+IMPORT_PARSE_ERROR = "We couldn’t process this file. Please try again."
+IMPORT_LIMIT_ERROR = "This file has too many points to import."
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+def run_import_job(
+    db_path: str, jobs_dir: str, job_id: str, extension: str, list_title: str, max_places: int, dedup_m: float
+) -> None:
+    """Parses an uploaded file in a pool process, recording progress in `import_jobs`."""
+    upload_path = os.path.join(jobs_dir, f"{job_id}.upload")
+    result_path = os.path.join(jobs_dir, f"{job_id}.json.gz")
+    conn = sqlite3.connect(db_path, timeout=5.0)
+
+    def update(assignments: str, params: tuple = (), state: str = "running") -> bool:
+        # Every write is conditional on the expected state, so a cancelled job stays cancelled.
+        now = datetime.now(timezone.utc).isoformat()
+        with conn:
+            cursor = conn.execute(
+                f"UPDATE import_jobs SET {assignments}, updated_at = ? WHERE id = ? AND state = ?",
+                (*params, now, job_id, state),
+            )
+        return cursor.rowcount > 0
+
+    try:
+        if not update("state = 'running'", state="queued"):
+            return
+        count = 0
+        next_report = time.monotonic() + 0.5
+        head = {"ok": True, "job_id": job_id, "state": "done", "list_id": uuid.uuid4().hex, "list_title": list_title}
+        # Results are stored gzipped and sent as-is to clients that accept gzip.
+        with open(upload_path, "rb") as upload, gzip.open(result_path + ".tmp", "wt", encoding="utf-8") as out:
+            out.write(json.dumps(head)[:-1] + ', "places": [')
+            cleaner = ImportCleaner(dedup_m)
+            for batch in iter_place_batches(IMPORT_PARSERS[extension](upload), max_places, cleaner):
+                out.write(("," if count else "") + ",".join(batch))
+                count += len(batch)
+                if time.monotonic() >= next_report:
+                    next_report = time.monotonic() + 0.5
+                    if not update("processed_bytes = ?, places_count = ?", (upload.tell(), count)):
+                        raise ImportCancelled()
+            out.write("], " + json.dumps({"counts": cleaner.counts(count)})[1:])
+        if not count:
+            update("state = 'failed', error = ?", ("No points found in file",))
+            return
+        os.replace(result_path + ".tmp", result_path)
+        if not update("state = 'done', processed_bytes = total_bytes, places_count = ?", (count,)):
+            os.remove(result_path)
+    except ImportCancelled:
+        pass
+    except IMPORT_PARSE_ERRORS as exc:
+        error = IMPORT_LIMIT_ERROR if isinstance(exc, ImportLimitError) else IMPORT_PARSE_ERROR
+        update("state = 'failed', error = ?", (error,))
+    except Exception:
+        # Anything else (a full disk, a locked database) must not leave the job running until
+        # the TTL; the exception still reaches the future, where the app logs it.
+        try:
+            update("state = 'failed', error = ?", (IMPORT_PARSE_ERROR,))
+        except sqlite3.Error:
+            pass
+        raise
+    finally:
+        conn.close()
+        for path in (upload_path, result_path + ".tmp"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def create_app(migrate: bool = True) -> Flask:
+    """Builds the app; with `migrate=False` the schema must already be current (`flask migrate`)."""
     app = Flask(__name__, static_folder="static")
+    app.json = FastJSONProvider(app)
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     db_path = os.environ.get("DB_PATH", os.path.join(BASE_DIR, "data", "geonotion.db"))
     admin_token = os.environ.get("ADMIN_TOKEN")
+    # Signs share access tokens; set SECRET_KEY so tokens stay valid across workers and restarts.
+    share_token_key = (os.environ.get("SECRET_KEY") or secrets.token_hex(32)).encode("utf-8")
+    share_token_ttl = int(os.environ.get("SHARE_TOKEN_TTL", str(12 * 3600)))
+    password_cache = VerifiedPasswordCache(
+        max_size=int(os.environ.get("PASSWORD_CACHE_SIZE", "1024")),
+        ttl=float(os.environ.get("PASSWORD_CACHE_TTL", "300")),
+    )
+    db_pool = ConnectionPool(db_path, size=int(os.environ.get("DB_POOL_SIZE", "8")))
+    share_data_codec = os.environ.get("SHARE_DATA_CODEC", "zlib")
+    if share_data_codec not in SHARE_DATA_CODECS:
+        raise ValueError(f"SHARE_DATA_CODEC must be one of {', '.join(SHARE_DATA_CODECS)}")
+    if share_data_codec == "zstd" and zstandard is None:
+        raise RuntimeError("SHARE_DATA_CODEC=zstd requires the zstandard package")
+    # Keyed by revision, which every read looks up anyway, so per-worker copies stay coherent.
+    share_cache = ShareResponseCache(
+        max_entries=int(os.environ.get("SHARE_CACHE_SIZE", "256")),
+        max_bytes=int(os.environ.get("SHARE_CACHE_BYTES", str(32 * 1024 * 1024))),
+    )
+
+    metrics = MetricsRegistry()
+    metrics.histogram("http_request_duration_seconds", "Time to produce a response, by endpoint.")
+    metrics.histogram("http_response_size_bytes", "Size of non-streamed response bodies.", SIZE_BUCKETS)
+    metrics.histogram("sqlite_pool_wait_seconds", "Time waiting for a pooled connection.")
+    metrics.histogram("sqlite_span_seconds", "Time a connection is checked out, commit included.")
+    metrics.histogram("sqlite_write_lock_wait_seconds", "Time waiting in BEGIN IMMEDIATE for the write lock.")
+    metrics.histogram("share_decode_seconds", "Time to decompress and parse a stored share document.")
+    metrics.histogram("share_payload_bytes", "Size of share documents written.", SIZE_BUCKETS)
+    metrics.histogram("password_hash_seconds", "Time spent in PBKDF2 for share passwords.")
+    metrics.histogram("import_parse_seconds", "Time spent parsing an uploaded file, by format.")
+    app.extensions["metrics"] = metrics
+
+    @contextmanager
+    def get_db():
+        # Checks a pooled connection out for the duration of a `with` block and commits on exit.
+        started = time.perf_counter()
+        endpoint = (request.endpoint or "unmatched") if has_request_context() else "background"
+        try:
+            with db_pool.connection() as conn:
+                metrics.observe("sqlite_pool_wait_seconds", time.perf_counter() - started)
+                yield conn
+        finally:
+            metrics.observe("sqlite_span_seconds", time.perf_counter() - started, endpoint=endpoint)
+
+    def begin_write(conn) -> None:
+        # BEGIN IMMEDIATE returns once the write lock is ours, so its duration is the lock wait.
+        # A batch opens the transaction once; the writes it is made of then join it.
+        if conn.in_transaction:
+            return
+        with metrics.timer("sqlite_write_lock_wait_seconds"):
+            conn.execute("BEGIN IMMEDIATE")
 
-    def get_db() -> sqlite3.Connection:
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+    def shutdown() -> None:
+        # Called by the WSGI server when a worker stops and again at exit; only the first call acts.
+        if shutdown_state["done"]:
+            return
+        shutdown_state["done"] = True
+        atexit.unregister(shutdown)
+        executor = import_pool["executor"]
+        if executor is not None and import_pool["pid"] == os.getpid():
+            executor.shutdown(wait=False, cancel_futures=True)
+        share_events.close()
+        maintenance.close()
+        place_indexer.close()
+        try:
+            analytics_buffer.close()
+            access_buffer.close()
+        finally:
+            db_pool.close()
+
+    shutdown_state = {"done": False}
+    atexit.register(shutdown)
+    app.extensions["db_pool"] = db_pool
+    app.extensions["shutdown"] = shutdown
+    app.extensions["share_cache"] = share_cache
 
     def ensure_db() -> None:
         with get_db() as conn:
@@ -57,7 +1581,11 @@ def create_app() -> Flask:
                     created_at TEXT NOT NULL,
                     updated_at TEXT NOT NULL,
                     password_hash TEXT,
-                    password_salt TEXT
+                    password_salt TEXT,
+                    title TEXT,
+                    places_count INTEGER,
+                    payload_bytes INTEGER,
+                    revision INTEGER NOT NULL DEFAULT 1
                 )
                 """
             )
@@ -66,6 +1594,557 @@ def create_app() -> Flask:
                 conn.execute("ALTER TABLE shares ADD COLUMN password_hash TEXT")
             if "password_salt" not in columns:
                 conn.execute("ALTER TABLE shares ADD COLUMN password_salt TEXT")
+            if "title" not in columns:
+                conn.execute("ALTER TABLE shares ADD COLUMN title TEXT")
+            if "places_count" not in columns:
+                conn.execute("ALTER TABLE shares ADD COLUMN places_count INTEGER")
+            if "payload_bytes" not in columns:
+                conn.execute("ALTER TABLE shares ADD COLUMN payload_bytes INTEGER")
+            if "revision" not in columns:
+                conn.execute("ALTER TABLE shares ADD COLUMN revision INTEGER NOT NULL DEFAULT 1")
+            if "blob_hash" not in columns:
+                conn.execute("ALTER TABLE shares ADD COLUMN blob_hash TEXT")
+            if "expires_at" not in columns:
+                conn.execute("ALTER TABLE shares ADD COLUMN expires_at TEXT")
+            if "last_accessed" not in columns:
+                conn.execute("ALTER TABLE shares ADD COLUMN last_accessed TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_shares_created_at ON shares (created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_shares_last_accessed ON shares (last_accessed)")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_shares_expires_at ON shares (expires_at) WHERE expires_at IS NOT NULL"
+            )
+            # Share documents are stored once per distinct content and referenced by hash;
+            # `shares.data` only still holds documents of rows not yet moved over. The place
+            # rows of a document are filed under its `index_id`.
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS share_blobs (
+                    hash TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    refcount INTEGER NOT NULL,
+                    stored_bytes INTEGER NOT NULL,
+                    index_id INTEGER,
+                    places_indexed INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_share_blobs_orphans ON share_blobs (hash) WHERE refcount <= 0"
+            )
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_share_blobs_index ON share_blobs (index_id) "
+                "WHERE index_id IS NOT NULL"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_share_blobs_unindexed ON share_blobs (hash) WHERE places_indexed = 0"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_shares_updated_at ON shares (updated_at)")
+            # Covering index: version checks and /meta are answered without touching `data`,
+            # which sits in front of these columns in the row and may span overflow pages.
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_shares_meta ON shares (
+                    id, revision, updated_at, places_count, password_hash, password_salt, expires_at
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS places (
+                    id INTEGER PRIMARY KEY,
+                    index_id INTEGER NOT NULL,
+                    place_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    lat REAL,
+                    lng REAL,
+                    data TEXT NOT NULL,
+                    UNIQUE (index_id, place_id)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_places_position ON places (index_id, position)")
+            if SQLITE_HAS_RTREE:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS places_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng)"
+                )
+            else:
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_places_coords ON places (index_id, lat, lng)")
+            if SQLITE_HAS_FTS5:
+                fts_exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'places_fts'"
+                ).fetchone()
+                # index_id is indexed too, so a search intersects with one list's rows inside FTS5.
+                conn.execute(
+                    """
+                    CREATE VIRTUAL TABLE IF NOT EXISTS places_fts USING fts5(
+                        index_id, title, note, address,
+                        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+                    )
+                    """
+                )
+                if not fts_exists:
+                    conn.execute(
+                        """
+                        INSERT INTO places_fts (rowid, index_id, title, note, address)
+                        SELECT id, index_id, COALESCE(json_extract(data, '$.title'), ''),
+                            COALESCE(json_extract(data, '$.note'), ''), COALESCE(json_extract(data, '$.address'), '')
+                        FROM places
+                        """
+                    )
+            clusters_exist = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'place_clusters'"
+            ).fetchone()
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS place_clusters (
+                    index_id INTEGER NOT NULL,
+                    zoom INTEGER NOT NULL,
+                    x INTEGER NOT NULL,
+                    y INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    sum_lat REAL NOT NULL,
+                    sum_lng REAL NOT NULL,
+                    PRIMARY KEY (index_id, zoom, x, y)
+                ) WITHOUT ROWID
+                """
+            )
+        backfill_share_metadata()
+        migrate_share_blobs()
+        collect_share_blobs()
+        if not clusters_exist:
+            backfill_place_clusters()
+        index_pending_places()
+        backfill_last_accessed()
+
+    def place_coordinates(place: dict) -> tuple:
+        lat, lng = parse_float(place.get("lat")), parse_float(place.get("lng"))
+        if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return None, None
+        return lat, lng
+
+    def adjust_place_clusters(conn, index_id: int, added: list, removed: list) -> None:
+        deltas = cluster_deltas(added, removed)
+        conn.executemany(
+            """
+            INSERT INTO place_clusters (index_id, zoom, x, y, count, sum_lat, sum_lng)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (index_id, zoom, x, y) DO UPDATE SET
+                count = count + excluded.count,
+                sum_lat = sum_lat + excluded.sum_lat,
+                sum_lng = sum_lng + excluded.sum_lng
+            """,
+            [(index_id, *key, *delta) for key, delta in deltas.items() if delta[0]],
+        )
+        if removed:
+            conn.execute("DELETE FROM place_clusters WHERE index_id = ? AND count <= 0", (index_id,))
+
+    def backfill_place_clusters() -> None:
+        # One-off build for places indexed before clusters existed, one document at a time.
+        with get_db() as conn:
+            index_ids = [row["index_id"] for row in conn.execute("SELECT DISTINCT index_id FROM places")]
+        for index_id in index_ids:
+            with get_db() as conn:
+                coords = conn.execute(
+                    "SELECT lat, lng FROM places WHERE index_id = ? AND lat IS NOT NULL", (index_id,)
+                ).fetchall()
+                adjust_place_clusters(conn, index_id, [tuple(row) for row in coords], [])
+
+    def write_place_rows(conn, index_id: int, entries: list) -> None:
+        # Brings the rows of these places under `index_id` in step, touching only those that changed.
+        if not entries:
+            return
+        existing = {
+            row["place_id"]: row
+            for row in conn.execute(
+                f"""
+                SELECT id, place_id, position, lat, lng, data FROM places
+                WHERE index_id = ? AND place_id IN ({", ".join("?" * len(entries))})
+                """,
+                (index_id, *(place_id for _, place_id, _ in entries)),
+            )
+        }
+        added = []
+        removed = []
+        for position, place_id, place in entries:
+            data = dumps_json(place)
+            current = existing.get(place_id)
+            if current is not None and current["data"] == data and current["position"] == position:
+                continue
+            lat, lng = place_coordinates(place)
+            old = (current["lat"], current["lng"]) if current is not None else (None, None)
+            if old != (lat, lng):
+                if old[0] is not None:
+                    removed.append(old)
+                if lat is not None:
+                    added.append((lat, lng))
+            if current is None:
+                row_id = conn.execute(
+                    "INSERT INTO places (index_id, place_id, position, lat, lng, data) VALUES (?, ?, ?, ?, ?, ?)",
+                    (index_id, place_id, position, lat, lng, data),
+                ).lastrowid
+            else:
+                row_id = current["id"]
+                conn.execute(
+                    "UPDATE places SET position = ?, lat = ?, lng = ?, data = ? WHERE id = ?",
+                    (position, lat, lng, data, row_id),
+                )
+            if SQLITE_HAS_RTREE:
+                conn.execute("DELETE FROM places_rtree WHERE id = ?", (row_id,))
+                if lat is not None:
+                    conn.execute("INSERT INTO places_rtree VALUES (?, ?, ?, ?, ?)", (row_id, lat, lat, lng, lng))
+            if SQLITE_HAS_FTS5 and (current is None or current["data"] != data):
+                if current is not None:
+                    conn.execute("DELETE FROM places_fts WHERE rowid = ?", (row_id,))
+                conn.execute(
+                    "INSERT INTO places_fts (rowid, index_id, title, note, address) VALUES (?, ?, ?, ?, ?)",
+                    (row_id, index_id, *place_search_text(place)),
+                )
+        if added or removed:
+            adjust_place_clusters(conn, index_id, added, removed)
+
+    def stale_place_rows(conn, index_id: int, entries: list) -> list:
+        keep = {place_id for _, place_id, _ in entries}
+        rows = conn.execute("SELECT id, place_id FROM places WHERE index_id = ?", (index_id,))
+        return [row["id"] for row in rows if row["place_id"] not in keep]
+
+    def delete_place_rows(conn, index_id: int, row_ids: list) -> None:
+        if not row_ids:
+            return
+        params = [(row_id,) for row_id in row_ids]
+        if SQLITE_HAS_RTREE:
+            conn.executemany("DELETE FROM places_rtree WHERE id = ?", params)
+        if SQLITE_HAS_FTS5:
+            conn.executemany("DELETE FROM places_fts WHERE rowid = ?", params)
+        # Clusters only lose the rows really deleted here, in case another indexer got there first.
+        deleted = conn.execute(
+            f"DELETE FROM places WHERE id IN ({', '.join('?' * len(row_ids))}) RETURNING lat, lng", row_ids
+        ).fetchall()
+        removed = [(row["lat"], row["lng"]) for row in deleted if row["lat"] is not None]
+        if removed:
+            adjust_place_clusters(conn, index_id, [], removed)
+
+    def claim_place_index(conn, digest: str):
+        """The `index_id` to file the document's places under, or None if it needs no indexing."""
+        blob = conn.execute(
+            "SELECT index_id, refcount, places_indexed FROM share_blobs WHERE hash = ?", (digest,)
+        ).fetchone()
+        if blob is None or blob["places_indexed"] or blob["refcount"] <= 0:
+            return None
+        if blob["index_id"] is not None:
+            return blob["index_id"]
+        newest = conn.execute("SELECT MAX(index_id) FROM share_blobs WHERE index_id IS NOT NULL").fetchone()[0]
+        conn.execute("UPDATE share_blobs SET index_id = ? WHERE hash = ?", ((newest or 0) + 1, digest))
+        return (newest or 0) + 1
+
+    def drop_place_index(conn, index_ids: list) -> None:
+        params = [(index_id,) for index_id in index_ids]
+        if SQLITE_HAS_RTREE:
+            conn.executemany("DELETE FROM places_rtree WHERE id IN (SELECT id FROM places WHERE index_id = ?)", params)
+        if SQLITE_HAS_FTS5:
+            conn.executemany("DELETE FROM places_fts WHERE rowid IN (SELECT id FROM places WHERE index_id = ?)", params)
+        conn.executemany("DELETE FROM places WHERE index_id = ?", params)
+        conn.executemany("DELETE FROM place_clusters WHERE index_id = ?", params)
+
+    def index_blob_places(conn, digest: str, places: list) -> None:
+        # Place rows belong to the stored document, so identical shares are indexed once.
+        if len(places) > place_index_inline_max:
+            # Left to the background indexer, which commits after every chunk, so a large
+            # list never holds the write lock for long. Woken once this request is done.
+            g.index_places = True
+            return
+        index_id = claim_place_index(conn, digest)
+        if index_id is None:
+            return
+        entries = place_entries(places)
+        for start in range(0, len(entries), PLACE_INDEX_CHUNK):
+            write_place_rows(conn, index_id, entries[start : start + PLACE_INDEX_CHUNK])
+        stale = stale_place_rows(conn, index_id, entries)
+        for start in range(0, len(stale), PLACE_INDEX_CHUNK):
+            delete_place_rows(conn, index_id, stale[start : start + PLACE_INDEX_CHUNK])
+        conn.execute("UPDATE share_blobs SET places_indexed = 1 WHERE hash = ?", (digest,))
+
+    def adopt_place_index(conn, old_digest, digest: str) -> None:
+        # An edit usually leaves the previous document unreferenced. Its place rows then move to
+        # the new document, so re-indexing only rewrites the places that changed.
+        if not old_digest or old_digest == digest:
+            return
+        old = conn.execute("SELECT index_id, refcount FROM share_blobs WHERE hash = ?", (old_digest,)).fetchone()
+        if old is None or old["index_id"] is None or old["refcount"] > 0:
+            return
+        new = conn.execute("SELECT index_id FROM share_blobs WHERE hash = ?", (digest,)).fetchone()
+        if new["index_id"] is not None:
+            return
+        conn.execute("UPDATE share_blobs SET index_id = NULL, places_indexed = 0 WHERE hash = ?", (old_digest,))
+        conn.execute("UPDATE share_blobs SET index_id = ? WHERE hash = ?", (old["index_id"], digest))
+
+    def index_blob_in_chunks(digest: str, entries: list) -> bool:
+        # One chunk of places per transaction, like the other backfills. Each re-checks the claim:
+        # in between, another worker may have finished the document or it may have been dropped.
+        index_id = None
+
+        def claim(conn) -> bool:
+            nonlocal index_id
+            begin_write(conn)
+            claimed = claim_place_index(conn, digest)
+            if claimed is None or index_id not in (None, claimed):
+                return False
+            index_id = claimed
+            return True
+
+        for start in range(0, len(entries), PLACE_INDEX_CHUNK):
+            with get_db() as conn:
+                if not claim(conn):
+                    return False
+                write_place_rows(conn, index_id, entries[start : start + PLACE_INDEX_CHUNK])
+            time.sleep(PLACE_INDEX_PAUSE)
+        with get_db() as conn:
+            if not claim(conn):
+                return False
+            stale = stale_place_rows(conn, index_id, entries)
+        for start in range(0, len(stale), PLACE_INDEX_CHUNK):
+            with get_db() as conn:
+                if not claim(conn):
+                    return False
+                delete_place_rows(conn, index_id, stale[start : start + PLACE_INDEX_CHUNK])
+            time.sleep(PLACE_INDEX_PAUSE)
+        with get_db() as conn:
+            if not claim(conn):
+                return False
+            conn.execute("UPDATE share_blobs SET places_indexed = 1 WHERE hash = ?", (digest,))
+        return True
+
+    def index_pending_places() -> int:
+        """Indexes the documents writes left to the background; returns how many were finished."""
+        finished = 0
+        while True:
+            with get_db() as conn:
+                blob = conn.execute(
+                    """
+                    SELECT hash, data FROM share_blobs INDEXED BY idx_share_blobs_unindexed
+                    WHERE places_indexed = 0 AND refcount > 0 LIMIT 1
+                    """
+                ).fetchone()
+            if blob is None:
+                return finished
+            try:
+                places = loads_json(decode_share_bytes(blob["data"])).get("places") or []
+            except (ValueError, AttributeError, *SHARE_DATA_ERRORS):
+                # Indexed as empty, so an unreadable document is not picked up again on every run.
+                app.logger.warning("Share blob %s could not be decoded for indexing", blob["hash"])
+                places = []
+            finished += index_blob_in_chunks(blob["hash"], place_entries(places))
+
+    def share_metadata(title: str, places: list, data: str) -> tuple:
+        return title, len(places), len(data.encode("utf-8"))
+
+    def backfill_share_metadata(batch_size: int = 200) -> None:
+        # Rows written before the metadata columns existed are filled in small batches,
+        # each in its own transaction, so the migration never holds the write lock for long.
+        while True:
+            with get_db() as conn:
+                rows = conn.execute(
+                    f"SELECT id, {SHARE_DOCUMENT_SQL} AS data FROM shares WHERE places_count IS NULL LIMIT ?", (batch_size,)
+                ).fetchall()
+                if not rows:
+                    return
+                updates = []
+                for row in rows:
+                    text = decode_share_data(row["data"])
+                    try:
+                        data = loads_json(text)
+                    except ValueError:
+                        data = {}
+                    if not isinstance(data, dict):
+                        data = {}
+                    places = data.get("places") or []
+                    title = data.get("title") or "My map"
+                    updates.append((*share_metadata(title, places, text), row["id"]))
+                conn.executemany(
+                    "UPDATE shares SET title = ?, places_count = ?, payload_bytes = ? WHERE id = ?",
+                    updates,
+                )
+
+    def acquire_share_blob(conn, text: str) -> str:
+        """Takes a reference on the blob holding `text`, storing it only if it is new."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if conn.execute(
+            "UPDATE share_blobs SET refcount = refcount + 1 WHERE hash = ?", (digest,)
+        ).rowcount:
+            return digest
+        data = encode_share_data(text, share_data_codec)
+        conn.execute(
+            "INSERT INTO share_blobs (hash, data, refcount, stored_bytes) VALUES (?, ?, 1, ?)",
+            (digest, data, len(data)),
+        )
+        return digest
+
+    def release_share_blob(conn, digest) -> None:
+        # Unreferenced blobs are left for collect_share_blobs, so content that is shared
+        # again soon after (an undo, a re-share) is revived instead of rewritten.
+        if digest:
+            conn.execute("UPDATE share_blobs SET refcount = refcount - 1 WHERE hash = ?", (digest,))
+
+    def migrate_share_blobs(batch_size: int = 200) -> None:
+        # Documents still inline in `shares.data` are moved to blobs in small batches.
+        # Readers fall back to the inline copy, so this can run while the app serves traffic.
+        while True:
+            with get_db() as conn:
+                begin_write(conn)
+                rows = conn.execute(
+                    "SELECT id, data FROM shares WHERE blob_hash IS NULL LIMIT ?", (batch_size,)
+                ).fetchall()
+                if not rows:
+                    return
+                conn.executemany(
+                    "UPDATE shares SET blob_hash = ?, data = '' WHERE id = ?",
+                    [(acquire_share_blob(conn, decode_share_data(row["data"])), row["id"]) for row in rows],
+                )
+
+    def collect_share_blobs(batch_size: int = 100) -> int:
+        removed = 0
+        while True:
+            with get_db() as conn:
+                orphans = conn.execute(
+                    """
+                    DELETE FROM share_blobs WHERE hash IN (
+                        SELECT hash FROM share_blobs INDEXED BY idx_share_blobs_orphans
+                        WHERE refcount <= 0 LIMIT ?
+                    )
+                    RETURNING index_id
+                    """,
+                    (batch_size,),
+                ).fetchall()
+                drop_place_index(conn, [row["index_id"] for row in orphans if row["index_id"] is not None])
+            removed += len(orphans)
+            if len(orphans) < batch_size:
+                return removed
+
+    def backfill_last_accessed(batch_size: int = 500) -> None:
+        # Shares from before access tracking count as last used when they were last written.
+        while True:
+            with get_db() as conn:
+                updated = conn.execute(
+                    """
+                    UPDATE shares SET last_accessed = updated_at WHERE id IN (
+                        SELECT id FROM shares WHERE last_accessed IS NULL LIMIT ?
+                    )
+                    """,
+                    (batch_size,),
+                ).rowcount
+            if updated < batch_size:
+                return
+
+    def delete_shares(conn, share_ids: list) -> None:
+        for share_id in share_ids:
+            row = conn.execute("SELECT blob_hash FROM shares WHERE id = ?", (share_id,)).fetchone()
+            if not row:
+                continue
+            # The document and its place rows stay until collect_share_blobs finds them unused.
+            release_share_blob(conn, row["blob_hash"])
+            conn.execute("DELETE FROM shares WHERE id = ?", (share_id,))
+
+    def purge_shares(condition: str, params: tuple, batch_size: int = 100) -> int:
+        # Small batches, one short write transaction each, so readers and writers keep going.
+        removed = 0
+        while True:
+            with get_db() as conn:
+                begin_write(conn)
+                share_ids = [
+                    row["id"]
+                    for row in conn.execute(
+                        f"SELECT id FROM shares WHERE {condition} LIMIT ?", (*params, batch_size)
+                    )
+                ]
+                delete_shares(conn, share_ids)
+            for share_id in share_ids:
+                share_cache.invalidate(share_id)
+            removed += len(share_ids)
+            if len(share_ids) < batch_size:
+                return removed
+
+    def compact_db(max_pages: int = 2048) -> dict:
+        with get_db() as conn:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                conn.execute(f"PRAGMA incremental_vacuum({int(max_pages)})").fetchall()
+            free_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            busy, wal_pages, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        return {
+            "reclaimedBytes": (free_before - free_after) * page_size,
+            "freeBytes": free_after * page_size,
+            "walCheckpointed": not busy and wal_pages == checkpointed,
+        }
+
+    def run_maintenance() -> dict:
+        # Persist recent reads first, so a share opened a moment ago is not treated as idle.
+        access_buffer.flush()
+        now = datetime.now(timezone.utc)
+        report = {"expiredShares": purge_shares("expires_at <= ?", (now.isoformat(),))}
+        if share_idle_ttl > 0:
+            cutoff = (now - timedelta(seconds=share_idle_ttl)).isoformat()
+            report["idleShares"] = purge_shares("last_accessed < ?", (cutoff,))
+        report["blobsCollected"] = collect_share_blobs()
+        report.update(compact_db())
+        report["finishedAt"] = datetime.now(timezone.utc).isoformat()
+        maintenance_state["report"] = report
+        app.logger.info("Share maintenance: %s", report)
+        return report
+
+    def ensure_task_leases() -> None:
+        with get_db() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS task_leases (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT NOT NULL,
+                    expires_at TEXT NOT NULL
+                )
+                """
+            )
+
+    def claim_task_lease(name: str, ttl: float) -> bool:
+        """Takes or renews the lease on a background task; False while another process holds it."""
+        # The pid tells forked workers apart, the token apps created in the same process.
+        holder = f"{os.getpid()}-{lease_token}"
+        now = datetime.now(timezone.utc)
+        with get_db() as conn:
+            return bool(
+                conn.execute(
+                    """
+                    INSERT INTO task_leases (name, holder, expires_at) VALUES (?, ?, ?)
+                    ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+                    WHERE task_leases.holder = excluded.holder OR task_leases.expires_at <= ?
+                    """,
+                    (name, holder, (now + timedelta(seconds=ttl)).isoformat(), now.isoformat()),
+                ).rowcount
+            )
+
+    def run_scheduled_maintenance():
+        # Every worker runs the timer, but only the lease holder does the work, so the purge and
+        # vacuum are not repeated per worker and competing for the write lock. The lease outlives
+        # two intervals; if its holder exits, another worker takes over after that.
+        if not claim_task_lease("maintenance", maintenance.interval * 2):
+            return None
+        return run_maintenance()
+
+    def ensure_import_jobs() -> None:
+        with get_db() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS import_jobs (
+                    id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    total_bytes INTEGER NOT NULL,
+                    processed_bytes INTEGER NOT NULL DEFAULT 0,
+                    places_count INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+                """
+            )
 
     def ensure_analytics() -> None:
         # Privacy-safe analytics: single-row counters only, no identifiers, no event logs.
@@ -83,210 +2162,257 @@ def create_app() -> Flask:
                 [(key,) for key in ANALYTICS_KEYS],
             )
 
+    def write_analytics(deltas: dict) -> None:
+        with get_db() as conn:
+            conn.executemany(
+                "UPDATE analytics SET count = count + ? WHERE metric = ?",
+                [(amount, metric) for metric, amount in deltas.items()],
+            )
+
+    analytics_buffer = AnalyticsBuffer(
+        write_analytics,
+        max_pending=int(os.environ.get("ANALYTICS_FLUSH_SIZE", "100")),
+        interval=float(os.environ.get("ANALYTICS_FLUSH_INTERVAL", "5")),
+    )
+    app.extensions["analytics_buffer"] = analytics_buffer
+
+    def write_access_times(batch: dict) -> None:
+        with get_db() as conn:
+            conn.executemany(
+                "UPDATE shares SET last_accessed = ? WHERE id = ? AND (last_accessed IS NULL OR last_accessed < ?)",
+                [(accessed, share_id, accessed) for share_id, accessed in batch.items()],
+            )
+
+    # Reads only note the time in memory; the column is written once per share per interval.
+    access_buffer = AccessTimeBuffer(
+        write_access_times,
+        max_pending=int(os.environ.get("ACCESS_FLUSH_SIZE", "1000")),
+        interval=float(os.environ.get("ACCESS_FLUSH_INTERVAL", "60")),
+    )
+    share_default_ttl = int(os.environ.get("SHARE_DEFAULT_TTL", "0"))
+    share_idle_ttl = int(os.environ.get("SHARE_IDLE_TTL", "0"))
+    maintenance_state = {"report": None}
+    lease_token = uuid.uuid4().hex
+    maintenance = PeriodicTask(
+        run_scheduled_maintenance, float(os.environ.get("MAINTENANCE_INTERVAL", "300")), "share-maintenance"
+    )
+    app.extensions["maintenance"] = run_maintenance
+    app.extensions["scheduled_maintenance"] = run_scheduled_maintenance
+    # Lists longer than this are indexed by a background thread instead of inside the write.
+    place_index_inline_max = int(os.environ.get("PLACE_INDEX_INLINE_MAX", "1000"))
+    place_indexer = PeriodicTask(
+        index_pending_places, float(os.environ.get("PLACE_INDEX_INTERVAL", "60")), "place-index"
+    )
+    app.extensions["index_places"] = index_pending_places
+
+    def mark_share_accessed(share_id: str) -> None:
+        access_buffer.add(share_id, datetime.now(timezone.utc).isoformat())
+
+    if os.environ.get("SHARE_EVENTS_BACKEND", "local") == "sqlite":
+        share_events = SQLiteShareEvents(get_db)
+    else:
+        share_events = LocalShareEvents()
+    app.extensions["share_events"] = share_events
+    share_events_timeout = float(os.environ.get("SHARE_EVENTS_TIMEOUT", "60"))
+    # Under a thread-per-request server each open stream pins a thread, so only so many may be
+    # open at once (gunicorn.conf.py sizes this per worker class); the rest get 503 and the
+    # client falls back to polling /meta with its ETag.
+    share_stream_slots = threading.BoundedSemaphore(int(os.environ.get("SHARE_EVENTS_MAX_STREAMS", "16")))
+    export_lengths = LRUCache(max_size=1024)
+    share_batch_max_items = int(os.environ.get("SHARE_BATCH_MAX_ITEMS", "100"))
+    import_max_bytes = int(os.environ.get("IMPORT_MAX_BYTES", str(256 * 1024 * 1024)))
+    # Enforced by Werkzeug while the body is read, so chunked uploads without a
+    # Content-Length are cut off too.
+    app.config["MAX_CONTENT_LENGTH"] = import_max_bytes
+    import_max_places = int(os.environ.get("IMPORT_MAX_PLACES", "100000"))
+    # Points this close to an earlier one with the same title are merged into it; 0 keeps all.
+    import_dedup_m = float(os.environ.get("IMPORT_DEDUP_METERS", "1"))
+    # Uploads above this size are parsed by a background job instead of in the request.
+    import_async_bytes = int(os.environ.get("IMPORT_ASYNC_BYTES", str(5 * 1024 * 1024)))
+    import_max_jobs = int(os.environ.get("IMPORT_MAX_JOBS", "8"))
+    import_job_ttl = int(os.environ.get("IMPORT_JOB_TTL", "3600"))
+    import_jobs_dir = os.environ.get("IMPORT_JOBS_DIR") or os.path.join(os.path.dirname(db_path), "import_jobs")
+    import_pool = {"executor": None, "pid": None}
+    import_pool_lock = threading.Lock()
+
     def increment_analytics(metric: str, amount: int = 1) -> None:
         if metric not in ANALYTICS_KEYS:
             return
-        with get_db() as conn:
-            conn.execute("UPDATE analytics SET count = count + ? WHERE metric = ?", (amount, metric))
+        analytics_buffer.add(metric, amount)
 
     def hash_share_password(password: str, salt: str) -> str:
-        return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("utf-8"), 120000).hex()
+        with metrics.timer("password_hash_seconds"):
+            return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("utf-8"), 120000).hex()
 
     def read_share_password() -> str:
         return request.headers.get("X-Share-Password") or request.args.get("password") or ""
 
-    def verify_share_password(row: sqlite3.Row) -> bool:
+    def sign_share_token(stored_hash: str, expires: int) -> str:
+        mac = hmac.new(share_token_key, f"{stored_hash}:{expires}".encode("utf-8"), hashlib.sha256)
+        return base64.urlsafe_b64encode(mac.digest()[:18]).decode("ascii")
+
+    def issue_share_token(stored_hash: str) -> str:
+        # Bound to the stored hash, so changing or removing the password revokes every token.
+        expires = int(time.time()) + share_token_ttl
+        return f"{expires}.{sign_share_token(stored_hash, expires)}"
+
+    def check_share_token(stored_hash: str, token: str) -> bool:
+        expires, _, signature = token.partition(".")
+        if not expires.isdigit() or int(expires) < time.time():
+            return False
+        return secrets.compare_digest(signature, sign_share_token(stored_hash, int(expires)))
+
+    def read_share_token() -> str:
+        return request.headers.get("X-Share-Token") or request.args.get("share_token") or ""
+
+    def check_share_access(row: sqlite3.Row, supplied: str, token: str) -> tuple:
+        """Returns whether the password or token opens the share, and a new token if the password did."""
         stored_hash = row["password_hash"]
         if not stored_hash:
-            return True
-        supplied = read_share_password()
+            return True, None
+        if token and check_share_token(stored_hash, token):
+            return True, None
         if not supplied:
-            return False
+            return False, None
         salt = row["password_salt"] or ""
-        candidate = hash_share_password(supplied, salt)
-        return secrets.compare_digest(candidate, stored_hash)
+        key = password_cache.key(stored_hash, salt, supplied)
+        if not password_cache.check(key):
+            candidate = hash_share_password(supplied, salt)
+            if not secrets.compare_digest(candidate, stored_hash):
+                return False, None
+            password_cache.add(key)
+        return True, issue_share_token(stored_hash)
 
-    def read_analytics() -> dict:
+    def verify_share_password(row: sqlite3.Row) -> bool:
+        allowed, token = check_share_access(row, read_share_password(), read_share_token())
+        if token:
+            g.share_token = token
+        return allowed
+
+    def share_etag(row: sqlite3.Row, variant: str = "") -> str:
+        # Version tag derived from the revision counter, so it is known without reading `data`.
+        return f"r{row['revision']}-{variant}" if variant else f"r{row['revision']}"
+
+    def coded_etag(etag: str, coding: str | None) -> str:
+        # Each content-coding is its own representation, so it gets its own strong validator.
+        return f"{etag}-{coding}" if coding else etag
+
+    def not_modified(etag: str):
+        # Any coding of the current version satisfies the client; answer with the tag it holds.
+        tags = (etag, *(coded_etag(etag, coding) for coding in RESPONSE_CODINGS))
+        matched = next((tag for tag in tags if request.if_none_match.contains_weak(tag)), None)
+        if matched is None:
+            return None
+        response = Response(status=304)
+        response.set_etag(matched)
+        return response
+
+    def read_stored_analytics() -> dict:
         with get_db() as conn:
             rows = conn.execute("SELECT metric, count FROM analytics").fetchall()
         data = {key: 0 for key in ANALYTICS_KEYS}
         data.update({row["metric"]: row["count"] for row in rows})
         return data
 
+    def read_analytics() -> dict:
+        # Totals include increments still waiting in the write-behind buffer.
+        return analytics_buffer.totals(read_stored_analytics)
+
     def is_admin_request() -> bool:
         if not admin_token:
             return False
         supplied = request.headers.get("X-Admin-Token") or request.args.get("token") or ""
         return secrets.compare_digest(supplied, admin_token)
 
-    def render_markdown(text: str) -> str:
-        if not text:
-            return "<p>Changelog is unavailable right now.</p>"
-
-        lines = text.splitlines()
-        html_parts = []
-        in_list = False
-        paragraph = []
-
-        def flush_paragraph():
-            nonlocal paragraph
-            if paragraph:
-                content = " ".join(paragraph).strip()
-                if content:
-                    html_parts.append(f"<p>{format_inline_markdown(content)}</p>")
-                paragraph = []
-
-        def close_list():
-            nonlocal in_list
-            if in_list:
-                html_parts.append("</ul>")
-                in_list = False
-
-        def format_inline_markdown(value: str) -> str:
-            safe = escape(value)
-            safe = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", safe)
-            safe = re.sub(r"`(.+?)`", r"<code>\1</code>", safe)
-            return safe
-
-        for raw_line in lines:
-            line = raw_line.rstrip()
-            stripped = line.strip()
-
-            if not stripped:
-                flush_paragraph()
-                close_list()
-                continue
-
-            if stripped.startswith("### "):
-                flush_paragraph()
-                close_list()
-                html_parts.append(f"<h4>{format_inline_markdown(stripped[4:])}</h4>")
-                continue
-            if stripped.startswith("## "):
-                flush_paragraph()
-                close_list()
-                html_parts.append(f"<h3>{format_inline_markdown(stripped[3:])}</h3>")
-                continue
-            if stripped.startswith("# "):
-                flush_paragraph()
-                close_list()
-                html_parts.append(f"<h2>{format_inline_markdown(stripped[2:])}</h2>")
-                continue
-
-            if stripped.startswith("- ") or stripped.startswith("— "):
-                flush_paragraph()
-                if not in_list:
-                    html_parts.append("<ul>")
-                    in_list = True
-                html_parts.append(f"<li>{format_inline_markdown(stripped[2:])}</li>")
-                continue
-
-            paragraph.append(stripped)
+    def get_import_executor() -> ProcessPoolExecutor:
+        # Created on first use, and again in a forked worker, which cannot reuse the parent's pool.
+        # Pool processes never come from fork(): this process runs threads (requests, analytics,
+        # maintenance, share events), and a fork taken while one holds a lock can deadlock the child.
+        with import_pool_lock:
+            if import_pool["executor"] is None or import_pool["pid"] != os.getpid():
+                workers = int(os.environ.get("IMPORT_WORKERS", str(min(2, os.cpu_count() or 1))))
+                start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                import_pool["executor"] = ProcessPoolExecutor(
+                    max_workers=max(1, workers), mp_context=multiprocessing.get_context(start_method)
+                )
+                import_pool["pid"] = os.getpid()
+            return import_pool["executor"]
 
-        flush_paragraph()
-        close_list()
+    def cleanup_import_jobs() -> None:
+        cutoff = (datetime.now(timezone.utc) - timedelta(seconds=import_job_ttl)).isoformat()
+        with get_db() as conn:
+            # Jobs whose pool process died never report back; give up on them after the TTL.
+            conn.execute(
+                """
+                UPDATE import_jobs SET state = 'failed', error = ?
+                WHERE state IN ('queued', 'running') AND updated_at < ?
+                """,
+                (IMPORT_PARSE_ERROR, cutoff),
+            )
+            expired = conn.execute(
+                "SELECT id FROM import_jobs WHERE updated_at < ? AND state IN ('done', 'failed', 'cancelled')",
+                (cutoff,),
+            ).fetchall()
+            conn.executemany("DELETE FROM import_jobs WHERE id = ?", [(row["id"],) for row in expired])
+        for row in expired:
+            for suffix in (".json.gz", ".upload"):
+                try:
+                    os.remove(os.path.join(import_jobs_dir, row["id"] + suffix))
+                except OSError:
+                    pass
+
+    def submit_import_job(uploaded, extension: str, list_title: str):
+        cleanup_import_jobs()
+        job_id = uuid.uuid4().hex
+        now = datetime.now(timezone.utc).isoformat()
+        os.makedirs(import_jobs_dir, exist_ok=True)
+        upload_path = os.path.join(import_jobs_dir, f"{job_id}.upload")
+        uploaded.save(upload_path)
+        with get_db() as conn:
+            # Count and insert in one statement, so concurrent uploads cannot all pass the limit.
+            queued = conn.execute(
+                """
+                INSERT INTO import_jobs (id, state, filename, total_bytes, created_at, updated_at)
+                SELECT ?, 'queued', ?, ?, ?, ?
+                WHERE (SELECT COUNT(*) FROM import_jobs WHERE state IN ('queued', 'running')) < ?
+                """,
+                (job_id, uploaded.filename, os.path.getsize(upload_path), now, now, import_max_jobs),
+            ).rowcount
+        if not queued:
+            os.remove(upload_path)
+            return jsonify({"ok": False, "error": "Too many imports in progress. Please try again later."}), 429
+        future = get_import_executor().submit(
+            run_import_job,
+            db_path,
+            import_jobs_dir,
+            job_id,
+            extension,
+            list_title,
+            import_max_places,
+            import_dedup_m,
+        )
 
-        return "\n".join(html_parts)
+        def log_failure(done) -> None:
+            if not done.cancelled() and done.exception() is not None:
+                app.logger.error("Import job %s failed", job_id, exc_info=done.exception())
 
-    def parse_float(value):
-        try:
-            return float(str(value).strip())
-        except (TypeError, ValueError):
-            return None
+        future.add_done_callback(log_failure)
+        status_url = url_for("import_job_status", job_id=job_id)
+        return jsonify({"ok": True, "job_id": job_id, "state": "queued", "statusUrl": status_url}), 202
 
-    def build_place(lat, lng, title="Untitled", note="", address=""):
-        return {
-            "id": uuid.uuid4().hex,
-            "title": (title or "Untitled").strip() or "Untitled",
-            "lat": lat,
-            "lng": lng,
-            "note": note or "",
-            "address": address or "",
-            "createdAt": datetime.now(timezone.utc).isoformat(),
-        }
+    def migrate_db() -> None:
+        ensure_db()
+        ensure_analytics()
+        ensure_import_jobs()
+        ensure_task_leases()
 
-    def parse_gpx_places(raw_bytes):
-        root = ET.fromstring(raw_bytes)
-        ns = {"gpx": "http://www.topografix.com/GPX/1/1"}
-        points = root.findall(".//gpx:wpt", ns)
-        if not points:
-            points = root.findall(".//wpt")
-        places = []
-        for point in points:
-            lat = parse_float(point.attrib.get("lat"))
-            lng = parse_float(point.attrib.get("lon"))
-            if lat is None or lng is None:
-                continue
-            name = point.findtext("gpx:name", default="", namespaces=ns) or point.findtext("name", default="")
-            desc = point.findtext("gpx:desc", default="", namespaces=ns) or point.findtext("desc", default="")
-            places.append(build_place(lat, lng, title=name or "GPX point", note=desc))
-        return places
-
-    def parse_csv_places(raw_bytes):
-        text = raw_bytes.decode("utf-8-sig", errors="replace")
-        reader = csv.DictReader(io.StringIO(text))
-        if not reader.fieldnames:
-            return []
-
-        key_map = {name.strip().lower(): name for name in reader.fieldnames if name}
-        lat_key = next((key_map.get(k) for k in ("latitude", "lat")), None)
-        lng_key = next((key_map.get(k) for k in ("longitude", "lng", "lon")), None)
-        title_key = next((key_map.get(k) for k in ("title", "name")), None)
-        note_key = next((key_map.get(k) for k in ("note", "description", "desc")), None)
-        address_key = next((key_map.get(k) for k in ("address", "location")), None)
-
-        if not lat_key or not lng_key:
-            return []
+    if migrate:
+        migrate_db()
 
-        places = []
-        for row in reader:
-            lat = parse_float(row.get(lat_key))
-            lng = parse_float(row.get(lng_key))
-            if lat is None or lng is None:
-                continue
-            title = row.get(title_key) if title_key else "CSV point"
-            note = row.get(note_key) if note_key else ""
-            address = row.get(address_key) if address_key else ""
-            places.append(build_place(lat, lng, title=title, note=note, address=address))
-        return places
-
-    def parse_kml_places(kml_bytes):
-        root = ET.fromstring(kml_bytes)
-        ns = {"kml": "http://www.opengis.net/kml/2.2"}
-        placemarks = root.findall(".//kml:Placemark", ns)
-        if not placemarks:
-            placemarks = root.findall(".//Placemark")
-        places = []
-        for placemark in placemarks:
-            coords = (
-                placemark.findtext(".//kml:Point/kml:coordinates", default="", namespaces=ns)
-                or placemark.findtext(".//Point/coordinates", default="")
-            )
-            if not coords:
-                continue
-            first = coords.strip().split()[0]
-            parts = [part.strip() for part in first.split(",")]
-            if len(parts) < 2:
-                continue
-            lng = parse_float(parts[0])
-            lat = parse_float(parts[1])
-            if lat is None or lng is None:
-                continue
-            name = placemark.findtext("kml:name", default="", namespaces=ns) or placemark.findtext("name", default="")
-            desc = placemark.findtext("kml:description", default="", namespaces=ns) or placemark.findtext("description", default="")
-            places.append(build_place(lat, lng, title=name or "KML point", note=desc))
-        return places
-
-    def parse_kmz_places(raw_bytes):
-        with zipfile.ZipFile(io.BytesIO(raw_bytes)) as archive:
-            kml_name = next((name for name in archive.namelist() if name.lower().endswith(".kml")), None)
-            if not kml_name:
-                return []
-            kml_bytes = archive.read(kml_name)
-        return parse_kml_places(kml_bytes)
-
-    ensure_db()
-    ensure_analytics()
+    @app.cli.command("migrate")
+    def migrate_command():
+        """Create or upgrade the database schema and run pending backfills."""
+        migrate_db()
 
     @app.context_processor
     def inject_app_version():
@@ -332,9 +2458,65 @@ def create_app() -> Flask:
         data = read_analytics()
         return jsonify(data)
 
+    @app.before_request
+    def start_maintenance():
+        maintenance.ensure_started()
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        # Registered before the other after_request hooks, so it runs last and sees final bytes.
+        started = g.pop("request_started", None)
+        if started is not None:
+            endpoint = request.endpoint or "unmatched"
+            metrics.observe(
+                "http_request_duration_seconds",
+                time.perf_counter() - started,
+                endpoint=endpoint,
+                method=request.method,
+                status=response.status_code,
+            )
+            if not response.is_streamed and response.content_length is not None:
+                metrics.observe("http_response_size_bytes", response.content_length, endpoint=endpoint)
+        return response
+
+    def share_cache_metrics():
+        stats = share_cache.stats()
+        return [
+            ("share_cache_hits_total", "counter", "Share responses served from the cache.", stats["hits"]),
+            ("share_cache_misses_total", "counter", "Share responses built from SQLite.", stats["misses"]),
+            ("share_cache_evictions_total", "counter", "Entries dropped to stay within bounds.", stats["evictions"]),
+            ("share_cache_entries", "gauge", "Share revisions held in the cache.", stats["entries"]),
+            ("share_cache_bytes", "gauge", "Bytes held in the share cache.", stats["bytes"]),
+        ]
+
+    metrics.collector(share_cache_metrics)
+
+    @app.route("/admin/metrics")
+    def admin_metrics():
+        if not is_admin_request():
+            abort(404)
+        return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    @app.route("/admin/maintenance")
+    def admin_maintenance():
+        if not is_admin_request():
+            abort(404)
+        return jsonify({"lastRun": maintenance_state["report"], "intervalSeconds": maintenance.interval})
+
+    @app.route("/admin/cache")
+    def admin_cache():
+        if not is_admin_request():
+            abort(404)
+        return jsonify({"shares": share_cache.stats()})
+
     @app.after_request
     def add_share_cache_headers(response):
-        if request.path.startswith("/api/share"):
+        if request.path.startswith("/api/share") and request.endpoint != "export_share":
+            # Keep share payloads out of shared caches; clients revalidate explicitly via ETag.
             response.headers["Cache-Control"] = "no-store"
             response.headers["Pragma"] = "no-cache"
             response.headers["Expires"] = "0"
@@ -346,92 +2528,880 @@ def create_app() -> Flask:
             response.headers["Service-Worker-Allowed"] = "/"
         return response
 
+    @app.after_request
+    def compress_api_response(response):
+        if (
+            not request.path.startswith("/api/")
+            or response.mimetype != "application/json"
+            or response.direct_passthrough
+            or response.status_code in (204, 206, 304)
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        coding = request.accept_encodings.best_match(RESPONSE_CODINGS)
+        if not coding:
+            return response
+        if response.is_streamed:
+            body = response.response
+            response.response = iter_compressed(response.iter_encoded(), coding)
+            if hasattr(body, "close"):
+                response.call_on_close(body.close)
+            response.headers.pop("Content-Length", None)
+        else:
+            body = response.get_data()
+            if len(body) < COMPRESS_MIN_BYTES:
+                return response
+            response.set_data(compress_body(body, coding))
+        response.content_encoding = coding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(coded_etag(etag, coding))
+        return response
+
+    @app.after_request
+    def wake_place_indexer(response):
+        # After the view, so the write that left places to index has committed.
+        if g.pop("index_places", False):
+            place_indexer.wake()
+        return response
+
+    @app.after_request
+    def add_share_token_header(response):
+        token = g.pop("share_token", None)
+        if token and response.status_code < 400:
+            response.headers["X-Share-Token"] = token
+        return response
+
+    def prepare_share(payload: dict) -> dict:
+        """Validates a create payload; raises InvalidPlaces, or ValueError carrying the API error code."""
+        expires_in = payload.get("expiresIn", share_default_ttl or None)
+        if expires_in is not None and (not isinstance(expires_in, int) or expires_in <= 0):
+            raise ValueError("invalid_expires_in")
+        created = datetime.now(timezone.utc)
+        return {
+            "id": uuid.uuid4().hex,
+            "title": payload.get("title") or "My map",
+            "places": validate_places(payload.get("places") or []),
+            "now": created.isoformat(),
+            "expires_at": (created + timedelta(seconds=expires_in)).isoformat() if expires_in else None,
+        }
+
+    def insert_shares(conn, shares: list) -> None:
+        rows = []
+        for share in shares:
+            data = dumps_json({"title": share["title"], "places": share["places"]})
+            metrics.observe("share_payload_bytes", len(data))
+            now = share["now"]
+            rows.append(
+                (
+                    share["id"],
+                    acquire_share_blob(conn, data),
+                    now,
+                    now,
+                    now,
+                    share["expires_at"],
+                    *share_metadata(share["title"], share["places"], data),
+                )
+            )
+        conn.executemany(
+            """
+            INSERT INTO shares (
+                id, data, blob_hash, created_at, updated_at, last_accessed, expires_at,
+                title, places_count, payload_bytes
+            )
+            VALUES (?, '', ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+        # Content that was shared before is already indexed; only new documents get place rows.
+        for share, (_, digest, *_) in zip(shares, rows):
+            index_blob_places(conn, digest, share["places"])
+
+    def share_links(share: dict) -> dict:
+        share_id = share["id"]
+        edit_url = url_for("index", _external=True, share_id=share_id, editable="1")
+        view_url = url_for("index", _external=True, share_id=share_id)
+        return {"id": share_id, "editUrl": edit_url, "viewUrl": view_url, "expiresAt": share["expires_at"]}
+
     @app.post("/api/share")
     def create_share():
         payload = request.get_json(silent=True) or {}
-        title = payload.get("title") or "My map"
-        places = payload.get("places") or []
-        share_id = uuid.uuid4().hex
-        now = datetime.now(timezone.utc).isoformat()
-        data = json.dumps({"title": title, "places": places})
+        try:
+            share = prepare_share(payload)
+        except InvalidPlaces as exc:
+            return jsonify({"error": "invalid_places", "detail": str(exc)}), 400
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
 
         with get_db() as conn:
-            conn.execute(
-                "INSERT INTO shares (id, data, created_at, updated_at) VALUES (?, ?, ?, ?)",
-                (share_id, data, now, now),
-            )
+            insert_shares(conn, [share])
 
         increment_analytics("share_links_created_total")
-        edit_url = url_for("index", _external=True, share_id=share_id, editable="1")
-        view_url = url_for("index", _external=True, share_id=share_id)
-        return jsonify({"id": share_id, "editUrl": edit_url, "viewUrl": view_url})
+        return jsonify(share_links(share))
 
     @app.get("/api/share/<share_id>")
     def get_share(share_id: str):
         with get_db() as conn:
             row = conn.execute(
-                "SELECT data, updated_at, password_hash, password_salt FROM shares WHERE id = ?",
-                (share_id,),
+                f"""
+                SELECT revision, updated_at, password_hash, password_salt
+                FROM shares INDEXED BY idx_shares_meta WHERE id = ? AND {SHARE_LIVE_SQL}
+                """,
+                (share_id, utc_now()),
             ).fetchone()
-        if not row:
-            abort(404)
-        if not verify_share_password(row):
-            return jsonify({"error": "password_required"}), 401
-        data = json.loads(row["data"])
-        return jsonify(
-            {
-                "id": share_id,
-                "title": data.get("title") or "My map",
-                "places": data.get("places") or [],
-                "updatedAt": row["updated_at"],
-            }
-        )
+            if not row:
+                abort(404)
+            if not verify_share_password(row):
+                return jsonify({"error": "password_required"}), 401
+            mark_share_accessed(share_id)
+            etag = share_etag(row)
+            cached = not_modified(etag)
+            if cached:
+                return cached
+            revision = row["revision"]
+            variants = share_cache.get(share_id, revision)
+            if variants is None:
+                data_row = conn.execute(
+                    f"SELECT {SHARE_DOCUMENT_SQL} AS data, revision, updated_at FROM shares WHERE id = ?",
+                    (share_id,),
+                ).fetchone()
+                if data_row is None:
+                    abort(404)
+                # A write may have landed between the two reads: describe, cache and tag the
+                # response by the revision the document was actually read at.
+                row, revision, etag = data_row, data_row["revision"], share_etag(data_row)
+        if variants is None:
+            with metrics.timer("share_decode_seconds"):
+                document = decode_share_bytes(data_row["data"])
+            # The stored document already is most of the response; parse it only if it has an
+            # unexpected shape (a row from an old version, say) and needs normalising.
+            fields = {"id": share_id, "updatedAt": row["updated_at"], "revision": revision}
+            body = splice_share_document(document, fields)
+            if body is None:
+                data = loads_json(document)
+                fields.update(title=data.get("title") or "My map", places=data.get("places") or [])
+                body = app.json.response(fields).get_data()
+            variants = {"identity": body}
+            share_cache.put(share_id, revision, "identity", body)
+        body = variants["identity"]
+        coding = request.accept_encodings.best_match(RESPONSE_CODINGS)
+        if coding and len(body) >= COMPRESS_MIN_BYTES:
+            body = variants.get(coding)
+            if body is None:
+                body = compress_body(variants["identity"], coding)
+                share_cache.put(share_id, revision, coding, body)
+        else:
+            coding = None
+        response = Response(body, mimetype="application/json")
+        if coding:
+            response.content_encoding = coding
+        response.vary.add("Accept-Encoding")
+        response.set_etag(coded_etag(etag, coding))
+        return response
 
     @app.get("/api/share/<share_id>/meta")
     def get_share_meta(share_id: str):
         with get_db() as conn:
             row = conn.execute(
-                "SELECT data, updated_at, password_hash, password_salt FROM shares WHERE id = ?",
-                (share_id,),
+                f"""
+                SELECT revision, updated_at, places_count, password_hash, password_salt
+                FROM shares INDEXED BY idx_shares_meta WHERE id = ? AND {SHARE_LIVE_SQL}
+                """,
+                (share_id, utc_now()),
             ).fetchone()
         if not row:
             abort(404)
         if not verify_share_password(row):
             return jsonify({"error": "password_required"}), 401
-        data = json.loads(row["data"])
-        places = data.get("places") or []
-        return jsonify(
+        mark_share_accessed(share_id)
+        etag = share_etag(row, "meta")
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        response = jsonify(
             {
                 "id": share_id,
                 "updatedAt": row["updated_at"],
-                "placesCount": len(places),
+                "placesCount": row["places_count"] or 0,
+                "revision": row["revision"],
             }
         )
+        response.set_etag(etag)
+        return response
+
+    def store_share_update(conn, share_id: str, title: str, places: list, expected_revision=None):
+        """Rewrites a share; with `expected_revision`, only if nobody else has written since."""
+        now = datetime.now(timezone.utc).isoformat()
+        data = dumps_json({"title": title, "places": places})
+        metrics.observe("share_payload_bytes", len(data))
+        # Take the write lock first, so the revision check and the blob swap see the same row.
+        begin_write(conn)
+        current = conn.execute(
+            f"SELECT revision, blob_hash FROM shares WHERE id = ? AND {SHARE_LIVE_SQL}", (share_id, now)
+        ).fetchone()
+        if not current or expected_revision not in (None, current["revision"]):
+            return None
+        # Blobs are never modified in place: the new content gets its own reference and the
+        # old one is released, so other shares pointing at the old blob are unaffected.
+        digest = acquire_share_blob(conn, data)
+        release_share_blob(conn, current["blob_hash"])
+        adopt_place_index(conn, current["blob_hash"], digest)
+        row = conn.execute(
+            """
+            UPDATE shares
+            SET data = '', blob_hash = ?, updated_at = ?, last_accessed = ?, title = ?, places_count = ?,
+                payload_bytes = ?, revision = revision + 1
+            WHERE id = ?
+            RETURNING revision
+            """,
+            (digest, now, now, *share_metadata(title, places, data), share_id),
+        ).fetchone()
+        index_blob_places(conn, digest, places)
+        return row["revision"], now
+
+    def publish_share_update(share_id: str, revision: int, updated_at: str) -> dict:
+        # Only after commit: readers woken by the event must find the new revision.
+        share_cache.invalidate(share_id)
+        event = {"id": share_id, "updatedAt": updated_at, "revision": revision}
+        share_events.publish(share_id, event)
+        return event
+
+    def share_updated(share_id: str, revision: int, updated_at: str):
+        return jsonify(publish_share_update(share_id, revision, updated_at))
 
     @app.put("/api/share/<share_id>")
     def update_share(share_id: str):
         payload = request.get_json(silent=True) or {}
         title = payload.get("title") or "My map"
-        places = payload.get("places") or []
-        now = datetime.now(timezone.utc).isoformat()
-        data = json.dumps({"title": title, "places": places})
+        try:
+            places = validate_places(payload.get("places") or [])
+        except InvalidPlaces as exc:
+            return jsonify({"error": "invalid_places", "detail": str(exc)}), 400
 
         with get_db() as conn:
             row = conn.execute(
-                "SELECT password_hash, password_salt FROM shares WHERE id = ?", (share_id,)
+                f"SELECT password_hash, password_salt FROM shares WHERE id = ? AND {SHARE_LIVE_SQL}",
+                (share_id, utc_now()),
             ).fetchone()
             if not row:
                 abort(404)
             if not verify_share_password(row):
                 return jsonify({"error": "password_required"}), 401
-            conn.execute("UPDATE shares SET data = ?, updated_at = ? WHERE id = ?", (data, now, share_id))
+            stored = store_share_update(conn, share_id, title, places)
+            if stored is None:
+                # Deleted or expired between the password check and the write lock.
+                abort(404)
+
+        return share_updated(share_id, *stored)
 
-        return jsonify({"id": share_id, "updatedAt": now})
+    @app.patch("/api/share/<share_id>")
+    def patch_share(share_id: str):
+        payload = request.get_json(silent=True) or {}
+        base_revision = payload.get("revision")
+        if not isinstance(base_revision, int):
+            return jsonify({"error": "revision_required"}), 400
+
+        with get_db() as conn:
+            row = conn.execute(
+                f"""
+                SELECT {SHARE_DOCUMENT_SQL} AS data, revision, password_hash, password_salt
+                FROM shares WHERE id = ? AND {SHARE_LIVE_SQL}
+                """,
+                (share_id, utc_now()),
+            ).fetchone()
+            if not row:
+                abort(404)
+            if not verify_share_password(row):
+                return jsonify({"error": "password_required"}), 401
+            conflict = jsonify({"error": "revision_conflict", "revision": row["revision"]}), 409
+            if row["revision"] != base_revision:
+                return conflict
+            with metrics.timer("share_decode_seconds"):
+                data = loads_json(decode_share_bytes(row["data"]))
+            try:
+                places = validate_places(apply_place_ops(data.get("places") or [], payload.get("ops") or []))
+            except PatchConflict:
+                return conflict
+            except InvalidPlaces as exc:
+                return jsonify({"error": "invalid_places", "detail": str(exc)}), 400
+            except ValueError as exc:
+                return jsonify({"error": "invalid_ops", "detail": str(exc)}), 400
+            title = payload.get("title") or data.get("title") or "My map"
+            stored = store_share_update(conn, share_id, title, places, expected_revision=base_revision)
+            if stored is None:
+                # Another writer committed between our read and write.
+                return conflict
+
+        return share_updated(share_id, *stored)
+
+    def read_batch_items(key: str):
+        """Returns the request's item list, or an error response if it is missing or too long."""
+        payload = request.get_json(silent=True)
+        items = payload.get(key) if isinstance(payload, dict) else None
+        if not isinstance(items, list) or not items:
+            return None, (jsonify({"error": f"{key}_required"}), 400)
+        if len(items) > share_batch_max_items:
+            return None, (jsonify({"error": "too_many_items", "limit": share_batch_max_items}), 413)
+        return items, None
+
+    def read_batch_access(item: dict) -> tuple:
+        # Per-item credentials, falling back to the request's for batches of one owner's shares.
+        return item.get("password") or read_share_password(), item.get("shareToken") or read_share_token()
+
+    def is_batch_item(item, require_id: bool = False) -> bool:
+        if not isinstance(item, dict) or not isinstance(item.get("places") or [], list):
+            return False
+        share_id, revision = item.get("id"), item.get("revision")
+        if (share_id is not None or require_id) and not isinstance(share_id, str):
+            return False
+        return revision is None or isinstance(revision, int)
+
+    def attach_batch_tokens(results: list, tokens: dict) -> None:
+        # Tokens issued for a password go back with the item they unlocked.
+        for index, token in tokens.items():
+            if token and results[index]["status"] < 400:
+                results[index]["shareToken"] = token
+
+    def fetch_share_rows(conn, share_ids) -> dict:
+        share_ids = list(dict.fromkeys(share_ids))
+        placeholders = ", ".join("?" * len(share_ids))
+        rows = conn.execute(
+            f"""
+            SELECT id, revision, updated_at, places_count, password_hash, password_salt
+            FROM shares INDEXED BY idx_shares_meta WHERE id IN ({placeholders}) AND {SHARE_LIVE_SQL}
+            """,
+            (*share_ids, utc_now()),
+        )
+        return {row["id"]: row for row in rows}
+
+    @app.post("/api/shares/batch")
+    def batch_shares():
+        """Creates and updates many shares in one transaction, with a status per item."""
+        items, error = read_batch_items("items")
+        if error:
+            return error
+        results = [None] * len(items)
+        creates = []
+        updates = []
+        for index, item in enumerate(items):
+            if not is_batch_item(item):
+                results[index] = {"status": 400, "error": "invalid_item"}
+            elif item.get("id") is None:
+                try:
+                    creates.append((index, prepare_share(item)))
+                except InvalidPlaces as exc:
+                    results[index] = {"status": 400, "error": "invalid_places", "detail": str(exc)}
+                except ValueError as exc:
+                    results[index] = {"status": 400, "error": str(exc)}
+            else:
+                try:
+                    validate_places(item.get("places") or [])
+                except InvalidPlaces as exc:
+                    results[index] = {"id": item["id"], "status": 400, "error": "invalid_places", "detail": str(exc)}
+                    continue
+                updates.append((index, item))
+
+        tokens = {}
+        writes = []
+        if updates:
+            # Passwords are checked before the write lock is taken, so PBKDF2 never holds it.
+            with get_db() as conn:
+                rows = fetch_share_rows(conn, [item["id"] for _, item in updates])
+            for index, item in updates:
+                row = rows.get(item["id"])
+                if row is None:
+                    results[index] = {"id": item["id"], "status": 404, "error": "not_found"}
+                    continue
+                allowed, tokens[index] = check_share_access(row, *read_batch_access(item))
+                if not allowed:
+                    results[index] = {"id": item["id"], "status": 401, "error": "password_required"}
+                    continue
+                writes.append((index, item))
+
+        stored = []
+        if creates or writes:
+            with get_db() as conn:
+                begin_write(conn)
+                insert_shares(conn, [share for _, share in creates])
+                for index, item in writes:
+                    share_id = item["id"]
+                    update = store_share_update(
+                        conn,
+                        share_id,
+                        item.get("title") or "My map",
+                        item.get("places") or [],
+                        expected_revision=item.get("revision"),
+                    )
+                    if update is not None:
+                        stored.append((index, share_id, update))
+                        continue
+                    current = conn.execute(
+                        f"SELECT revision FROM shares WHERE id = ? AND {SHARE_LIVE_SQL}", (share_id, utc_now())
+                    ).fetchone()
+                    if current is None:
+                        results[index] = {"id": share_id, "status": 404, "error": "not_found"}
+                    else:
+                        results[index] = {
+                            "id": share_id,
+                            "status": 409,
+                            "error": "revision_conflict",
+                            "revision": current["revision"],
+                        }
+
+        for index, share in creates:
+            results[index] = {"status": 201, **share_links(share)}
+        for index, share_id, update in stored:
+            results[index] = {"status": 200, **publish_share_update(share_id, *update)}
+        attach_batch_tokens(results, tokens)
+        if creates:
+            increment_analytics("share_links_created_total", len(creates))
+        return jsonify({"results": results})
+
+    @app.post("/api/shares/fetch")
+    def fetch_shares():
+        """Reads many shares, or with `"fields": "meta"` only their revisions, with a status per item."""
+        items, error = read_batch_items("shares")
+        if error:
+            return error
+        meta_only = request.get_json(silent=True).get("fields") == "meta"
+        items = [{"id": item} if isinstance(item, str) else item for item in items]
+        results = [None] * len(items)
+        valid = {index for index, item in enumerate(items) if is_batch_item(item, require_id=True)}
+        with get_db() as conn:
+            rows = fetch_share_rows(conn, [items[index]["id"] for index in valid])
+        tokens = {}
+        wanted = {}
+        for index, item in enumerate(items):
+            if index not in valid:
+                results[index] = {"status": 400, "error": "invalid_item"}
+                continue
+            share_id = item["id"]
+            row = rows.get(share_id)
+            if row is None:
+                results[index] = {"id": share_id, "status": 404, "error": "not_found"}
+                continue
+            allowed, tokens[index] = check_share_access(row, *read_batch_access(item))
+            if not allowed:
+                results[index] = {"id": share_id, "status": 401, "error": "password_required"}
+                continue
+            mark_share_accessed(share_id)
+            if item.get("revision") == row["revision"]:
+                results[index] = {"id": share_id, "status": 304, "revision": row["revision"]}
+            elif meta_only:
+                results[index] = {
+                    "id": share_id,
+                    "status": 200,
+                    "updatedAt": row["updated_at"],
+                    "placesCount": row["places_count"] or 0,
+                    "revision": row["revision"],
+                }
+            else:
+                wanted.setdefault(share_id, []).append(index)
+
+        if wanted:
+            # Documents are read only for the items that passed the checks above.
+            placeholders = ", ".join("?" * len(wanted))
+            with get_db() as conn:
+                documents = conn.execute(
+                    f"""
+                    SELECT id, {SHARE_DOCUMENT_SQL} AS data, revision, updated_at
+                    FROM shares WHERE id IN ({placeholders})
+                    """,
+                    list(wanted),
+                ).fetchall()
+            for document in documents:
+                with metrics.timer("share_decode_seconds"):
+                    data = loads_json(decode_share_bytes(document["data"]))
+                for index in wanted.pop(document["id"]):
+                    results[index] = {
+                        "id": document["id"],
+                        "status": 200,
+                        "title": data.get("title") or "My map",
+                        "places": data.get("places") or [],
+                        "updatedAt": document["updated_at"],
+                        "revision": document["revision"],
+                    }
+            # Whatever is left was deleted between the two reads.
+            for share_id, indexes in wanted.items():
+                for index in indexes:
+                    results[index] = {"id": share_id, "status": 404, "error": "not_found"}
+        attach_batch_tokens(results, tokens)
+        return jsonify({"results": results})
+
+    def parse_bbox(value: str):
+        parts = [parse_float(part) for part in value.split(",")]
+        if len(parts) != 4 or any(part is None for part in parts):
+            return None
+        min_lng, min_lat, max_lng, max_lat = parts
+        if min_lat > max_lat:
+            return None
+        # A box crossing the antimeridian (min_lng > max_lng) is queried as two boxes.
+        if min_lng > max_lng:
+            return [(min_lat, max_lat, min_lng, 180.0), (min_lat, max_lat, -180.0, max_lng)]
+        return [(min_lat, max_lat, min_lng, max_lng)]
+
+    def spatial_filter(boxes: list) -> tuple:
+        """FROM clause, condition and params selecting `places p` rows inside any of `boxes`."""
+        params = [value for box in boxes for value in box]
+        if SQLITE_HAS_RTREE:
+            matches = " OR ".join(
+                "(r.min_lat >= ? AND r.max_lat <= ? AND r.min_lng >= ? AND r.max_lng <= ?)" for _ in boxes
+            )
+            return "places_rtree r JOIN places p ON p.id = r.id", f"({matches})", params
+        matches = " OR ".join("(p.lat BETWEEN ? AND ? AND p.lng BETWEEN ? AND ?)" for _ in boxes)
+        return "places p", f"({matches})", params
+
+    def read_place_index(conn, share_id: str):
+        """The share's metadata and the `index_id` of its place rows, or None if there is no such share."""
+        return conn.execute(
+            f"""
+            SELECT title, revision, updated_at, password_hash, password_salt,
+                share_blobs.index_id, share_blobs.places_indexed
+            FROM shares INDEXED BY idx_shares_meta LEFT JOIN share_blobs ON share_blobs.hash = shares.blob_hash
+            WHERE id = ? AND {SHARE_LIVE_SQL}
+            """,
+            (share_id, utc_now()),
+        ).fetchone()
+
+    def places_indexing(row):
+        # Large lists are indexed in the background after a write; this is usually over in seconds.
+        response = jsonify({"error": "places_indexing", "revision": row["revision"]})
+        response.status_code = 503
+        response.headers["Retry-After"] = "2"
+        return response
+
+    @app.get("/api/share/<share_id>/places")
+    def get_share_places(share_id: str):
+        limit = min(max(request.args.get("limit", 500, type=int), 1), 5000)
+        boxes = parse_bbox(request.args["bbox"]) if request.args.get("bbox") else None
+        if request.args.get("bbox") and boxes is None:
+            return jsonify({"error": "invalid_bbox"}), 400
+
+        with get_db() as conn:
+            row = read_place_index(conn, share_id)
+            if not row:
+                abort(404)
+            if not verify_share_password(row):
+                return jsonify({"error": "password_required"}), 401
+            if not row["places_indexed"]:
+                return places_indexing(row)
+
+            # Cursors carry the revision they were issued for; positions shift on every edit.
+            after = -1
+            cursor = request.args.get("cursor")
+            if cursor:
+                revision, _, position = cursor.partition(":")
+                if not (revision.isdigit() and position.isdigit()):
+                    return jsonify({"error": "invalid_cursor"}), 400
+                if int(revision) != row["revision"]:
+                    return jsonify({"error": "cursor_expired", "revision": row["revision"]}), 409
+                after = int(position)
+
+            if boxes is None:
+                query = "SELECT position, data FROM places p WHERE index_id = ? AND position > ?"
+                params = [row["index_id"], after]
+            else:
+                source, matches, params = spatial_filter(boxes)
+                query = f"SELECT p.position, p.data FROM {source} WHERE {matches} AND p.index_id = ? AND p.position > ?"
+                params += [row["index_id"], after]
+            rows = conn.execute(f"{query} ORDER BY position LIMIT ?", (*params, limit + 1)).fetchall()
+
+        page = rows[:limit]
+        next_cursor = f"{row['revision']}:{page[-1]['position']}" if len(rows) > limit else None
+        body = ",".join(place["data"] for place in page)
+        payload = json.dumps({"id": share_id, "revision": row["revision"], "nextCursor": next_cursor})
+        # Place rows are stored as JSON already, so they are spliced in without re-encoding.
+        return Response(payload[:-1] + ', "places": [' + body + "]}", mimetype="application/json")
+
+    def find_places(conn, index_id: int, terms: list, boxes=None, limit=None) -> list:
+        """Places of one document matching every term (as a prefix), best match first."""
+        source, conditions, params, order = "places p", ["p.index_id = ?"], [index_id], "p.position"
+        if boxes is not None:
+            source, matches, params = spatial_filter(boxes)
+            conditions.insert(0, matches)
+            params.append(index_id)
+        if terms and SQLITE_HAS_FTS5:
+            source += " JOIN places_fts f ON f.rowid = p.id"
+            conditions.append("places_fts MATCH ?")
+            words = " ".join(f'"{term}"*' for term in terms)
+            params.append(f'index_id : "{index_id}" AND {{title note address}} : ({words})')
+            # Title hits outrank note hits, which outrank address hits.
+            order = "bm25(places_fts, 0.0, 10.0, 2.0, 1.0), p.position"
+        else:
+            for term in terms:
+                escaped = term.replace("_", "\\_")
+                conditions.append(
+                    "("
+                    + " OR ".join(
+                        f"json_extract(p.data, '$.{field}') LIKE ? ESCAPE '\\'" for field in PLACE_SEARCH_FIELDS
+                    )
+                    + ")"
+                )
+                params.extend([f"%{escaped}%"] * len(PLACE_SEARCH_FIELDS))
+        where = " AND ".join(conditions)
+        query = f"SELECT p.position, p.lat, p.lng, p.data FROM {source} WHERE {where} ORDER BY {order}"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return conn.execute(query, params).fetchall()
+
+    def nearest_places(conn, index_id: int, terms: list, origin: tuple, radius, limit: int) -> list:
+        # The box is only a prefilter: candidates are ranked and cut by true distance. Without
+        # a radius it widens until `limit` places fall inside the circle, or the circle is the globe.
+        reach = radius or SEARCH_START_RADIUS_M
+        while True:
+            candidates = find_places(conn, index_id, terms, radius_boxes(*origin, reach))
+            scored = sorted(
+                (distance_m(*origin, row["lat"], row["lng"]), row["position"], row) for row in candidates
+            )
+            found = [(row, distance) for distance, _, row in scored if distance <= reach]
+            if radius or len(found) >= limit or reach >= math.pi * EARTH_RADIUS_M:
+                return found[:limit]
+            reach *= 4
+
+    @app.get("/api/share/<share_id>/search")
+    def search_share(share_id: str):
+        terms = search_terms(request.args.get("q", ""))
+        origin = None
+        if request.args.get("near"):
+            parts = [parse_float(part) for part in request.args["near"].split(",")]
+            if len(parts) != 2 or None in parts or not (-90 <= parts[0] <= 90 and -180 <= parts[1] <= 180):
+                return jsonify({"error": "invalid_near"}), 400
+            origin = tuple(parts)
+        radius = request.args.get("radius", type=float)
+        if radius is not None and (origin is None or not radius > 0):
+            return jsonify({"error": "invalid_radius"}), 400
+        if not terms and origin is None:
+            return jsonify({"error": "query_required"}), 400
+        limit = min(max(request.args.get("limit", 50, type=int), 1), 500)
+
+        with get_db() as conn:
+            row = read_place_index(conn, share_id)
+            if not row:
+                abort(404)
+            if not verify_share_password(row):
+                return jsonify({"error": "password_required"}), 401
+            if not row["places_indexed"]:
+                return places_indexing(row)
+            variant = json.dumps([terms, origin, radius, limit])
+            etag = share_etag(row, f"search-{hashlib.sha1(variant.encode('utf-8')).hexdigest()[:16]}")
+            cached = not_modified(etag)
+            if cached:
+                return cached
+            if origin is None:
+                found = [(place, None) for place in find_places(conn, row["index_id"], terms, limit=limit)]
+            else:
+                found = nearest_places(conn, row["index_id"], terms, origin, radius, limit)
+
+        results = []
+        for place, distance in found:
+            result = {"position": place["position"], "place": loads_json(place["data"])}
+            if distance is not None:
+                result["distance"] = round(distance, 1)
+            results.append(result)
+        response = jsonify({"id": share_id, "revision": row["revision"], "results": results})
+        response.set_etag(etag)
+        return response
+
+    @app.get("/api/share/<share_id>/clusters")
+    def get_share_clusters(share_id: str):
+        zoom = request.args.get("z", type=int)
+        if zoom is None or zoom < 0:
+            return jsonify({"error": "invalid_zoom"}), 400
+        boxes = parse_bbox(request.args.get("bbox") or "-180,-90,180,90")
+        if boxes is None:
+            return jsonify({"error": "invalid_bbox"}), 400
+        level = min(zoom, CLUSTER_MAX_ZOOM)
+
+        with get_db() as conn:
+            row = read_place_index(conn, share_id)
+            if not row:
+                abort(404)
+            if not verify_share_password(row):
+                return jsonify({"error": "password_required"}), 401
+            if not row["places_indexed"]:
+                return places_indexing(row)
+            etag = share_etag(row, f"clusters-{level}-{request.args.get('bbox', '')}")
+            cached = not_modified(etag)
+            if cached:
+                return cached
+            clusters = []
+            for min_lat, max_lat, min_lng, max_lng in boxes:
+                min_x, min_y = cluster_cell(max_lat, min_lng, level)
+                max_x, max_y = cluster_cell(min_lat, max_lng, level)
+                clusters.extend(
+                    conn.execute(
+                        """
+                        SELECT count, sum_lat, sum_lng FROM place_clusters
+                        WHERE index_id = ? AND zoom = ? AND x BETWEEN ? AND ? AND y BETWEEN ? AND ?
+                        """,
+                        (row["index_id"], level, min_x, max_x, min_y, max_y),
+                    ).fetchall()
+                )
+
+        response = jsonify(
+            {
+                "id": share_id,
+                "revision": row["revision"],
+                "zoom": level,
+                # Past the deepest precomputed level, page raw places through /places?bbox=.
+                "exact": zoom <= CLUSTER_MAX_ZOOM,
+                "clusters": [
+                    {
+                        "lat": round(cluster["sum_lat"] / cluster["count"], 6),
+                        "lng": round(cluster["sum_lng"] / cluster["count"], 6),
+                        "count": cluster["count"],
+                    }
+                    for cluster in clusters
+                ],
+            }
+        )
+        response.set_etag(etag)
+        return response
+
+    @app.get("/api/share/<share_id>/export.<fmt>")
+    def export_share(share_id: str, fmt: str):
+        if fmt not in EXPORTERS:
+            abort(404)
+        # One read transaction covers the checks and the streamed rows, so the body always
+        # matches the revision in the ETag even if the share is edited mid-download.
+        conn = db_pool.acquire()
+        try:
+            conn.execute("BEGIN")
+            row = read_place_index(conn, share_id)
+            early = None
+            if not row:
+                early = 404
+            elif not verify_share_password(row):
+                early = jsonify({"error": "password_required"}), 401
+            else:
+                mark_share_accessed(share_id)
+                etag = share_etag(row, f"export-{fmt}")
+                early = not_modified(etag)
+        except BaseException:
+            db_pool.release(conn)
+            raise
+        if early is not None:
+            db_pool.release(conn)
+            if early == 404:
+                abort(404)
+            return early
+
+        length_key = (share_id, row["revision"], fmt)
+        total = export_lengths.get(length_key)
+        byte_range = None
+        # Only an ETag validator identifies the bytes; date-based If-Range falls back to 200.
+        if total is not None and request.range and (
+            "If-Range" not in request.headers or request.if_range.etag == etag
+        ):
+            byte_range = request.range.range_for_length(total)
+
+        def places():
+            if not row["places_indexed"]:
+                # Still being indexed: read the stored document instead, in the same transaction.
+                document = conn.execute(
+                    f"SELECT {SHARE_DOCUMENT_SQL} AS data FROM shares WHERE id = ?", (share_id,)
+                ).fetchone()
+                places = loads_json(decode_share_bytes(document["data"])).get("places") or []
+                yield from (place for place in places if isinstance(place, dict))
+                return
+            for place_row in conn.execute(
+                "SELECT data FROM places WHERE index_id = ? ORDER BY position", (row["index_id"],)
+            ):
+                yield loads_json(place_row["data"])
+
+        def stream():
+            start, stop = byte_range or (0, None)
+            offset = 0
+            for chunk in EXPORTERS[fmt](row["title"] or "My map", places(), row["updated_at"]):
+                data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+                end = offset + len(data)
+                if end > start and (stop is None or offset < stop):
+                    yield data[max(start - offset, 0) : None if stop is None else stop - offset]
+                offset = end
+                if stop is not None and offset >= stop:
+                    return
+            # Remember the size so a resumed download can be answered with a byte range.
+            export_lengths.set(length_key, offset)
+
+        filename = re.sub(r'[\\/:*?"<>|]+', "", (row["title"] or "My map").strip()).strip() or "My map"
+        response = Response(stream(), mimetype=EXPORT_MIMETYPES[fmt], status=206 if byte_range else 200)
+        # Runs after the body iterator is closed, including when it was never started.
+        response.call_on_close(lambda: db_pool.release(conn))
+        response.headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{quote(f'{filename}.{fmt}')}"
+        response.headers["Cache-Control"] = "private, no-cache"
+        response.headers["Accept-Ranges"] = "bytes"
+        response.set_etag(etag)
+        response.last_modified = datetime.fromisoformat(row["updated_at"])
+        if byte_range:
+            response.headers["Content-Range"] = f"bytes {byte_range[0]}-{byte_range[1] - 1}/{total}"
+            response.content_length = byte_range[1] - byte_range[0]
+        elif total is not None:
+            response.content_length = total
+        return response
+
+    @app.get("/api/share/<share_id>/events")
+    def share_event_stream(share_id: str):
+        with get_db() as conn:
+            row = conn.execute(
+                f"""
+                SELECT revision, updated_at, password_hash, password_salt
+                FROM shares INDEXED BY idx_shares_meta WHERE id = ? AND {SHARE_LIVE_SQL}
+                """,
+                (share_id, utc_now()),
+            ).fetchone()
+        if not row:
+            abort(404)
+        if not verify_share_password(row):
+            return jsonify({"error": "password_required"}), 401
+        if not share_stream_slots.acquire(blocking=False):
+            response = jsonify({"error": "too_many_streams"})
+            response.status_code = 503
+            response.headers["Retry-After"] = "30"
+            return response
+
+        def format_event(event: dict) -> str:
+            return f"event: update\ndata: {json.dumps(event)}\n\n"
+
+        def stream():
+            # Streams end after SHARE_EVENTS_TIMEOUT so worker threads are recycled;
+            # EventSource reconnects on its own after the advertised retry delay.
+            with share_events.listen(share_id) as subscriber:
+                # Re-read after subscribing so a change racing the handshake is not lost.
+                with get_db() as conn:
+                    current = conn.execute(
+                        "SELECT updated_at, revision FROM shares WHERE id = ?", (share_id,)
+                    ).fetchone()
+                current = current or row
+                yield "retry: 3000\n"
+                yield format_event(
+                    {"id": share_id, "updatedAt": current["updated_at"], "revision": current["revision"]}
+                )
+                deadline = time.monotonic() + share_events_timeout
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return
+                    try:
+                        event = subscriber.get(timeout=min(15.0, remaining))
+                    except queue.Empty:
+                        yield ": keepalive\n\n"
+                        continue
+                    yield format_event(event)
+
+        response = Response(stream_with_context(stream()), mimetype="text/event-stream")
+        # Runs when the server closes the response, whether the stream finished or the client left.
+        response.call_on_close(share_stream_slots.release)
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
 
     @app.get("/api/share/<share_id>/password")
     def get_share_password_state(share_id: str):
         with get_db() as conn:
-            row = conn.execute("SELECT password_hash FROM shares WHERE id = ?", (share_id,)).fetchone()
+            row = conn.execute(
+                f"SELECT password_hash FROM shares WHERE id = ? AND {SHARE_LIVE_SQL}", (share_id, utc_now())
+            ).fetchone()
         if not row:
             abort(404)
         return jsonify({"hasPassword": bool(row["password_hash"])})
@@ -445,25 +3415,35 @@ def create_app() -> Flask:
         salt = secrets.token_hex(8)
         password_hash = hash_share_password(password, salt)
         with get_db() as conn:
-            cursor = conn.execute("SELECT 1 FROM shares WHERE id = ?", (share_id,))
-            if not cursor.fetchone():
+            row = conn.execute(
+                f"SELECT password_hash FROM shares WHERE id = ? AND {SHARE_LIVE_SQL}", (share_id, utc_now())
+            ).fetchone()
+            if not row:
                 abort(404)
             conn.execute(
                 "UPDATE shares SET password_hash = ?, password_salt = ? WHERE id = ?",
                 (password_hash, salt, share_id),
             )
+        share_cache.invalidate(share_id)
+        if row["password_hash"]:
+            password_cache.invalidate(row["password_hash"])
         return jsonify({"ok": True})
 
     @app.delete("/api/share/<share_id>/password")
     def delete_share_password(share_id: str):
         with get_db() as conn:
-            cursor = conn.execute("SELECT 1 FROM shares WHERE id = ?", (share_id,))
-            if not cursor.fetchone():
+            row = conn.execute(
+                f"SELECT password_hash FROM shares WHERE id = ? AND {SHARE_LIVE_SQL}", (share_id, utc_now())
+            ).fetchone()
+            if not row:
                 abort(404)
             conn.execute(
                 "UPDATE shares SET password_hash = NULL, password_salt = NULL WHERE id = ?",
                 (share_id,),
             )
+        share_cache.invalidate(share_id)
+        if row["password_hash"]:
+            password_cache.invalidate(row["password_hash"])
         return jsonify({"ok": True})
 
     @app.post("/api/analytics/event")
@@ -479,7 +3459,10 @@ def create_app() -> Flask:
 
     @app.post("/api/import")
     def import_file():
-        uploaded = request.files.get("file")
+        try:
+            uploaded = request.files.get("file")
+        except RequestEntityTooLarge:
+            return jsonify({"ok": False, "error": "This file is too large to import."}), 413
         if not uploaded or not uploaded.filename:
             return jsonify({"ok": False, "error": "File is required"}), 400
 
@@ -487,36 +3470,112 @@ def create_app() -> Flask:
         if extension not in {".gpx", ".csv", ".kmz"}:
             return jsonify({"ok": False, "error": "Unsupported file format"}), 400
 
-        try:
-            raw_bytes = uploaded.read()
-            if extension == ".gpx":
-                places = parse_gpx_places(raw_bytes)
-            elif extension == ".csv":
-                places = parse_csv_places(raw_bytes)
-            else:
-                places = parse_kmz_places(raw_bytes)
-        except (ET.ParseError, zipfile.BadZipFile, UnicodeDecodeError, ValueError):
-            return jsonify({"ok": False, "error": "We couldn’t process this file. Please try again."}), 400
-
-        if not places:
-            return jsonify({"ok": False, "error": "No points found in file"}), 400
-
         list_title = os.path.splitext(uploaded.filename)[0].strip() or "Imported map"
-        return jsonify(
-            {
-                "ok": True,
-                "list_id": uuid.uuid4().hex,
-                "list_title": list_title,
-                "counts": {"places": len(places), "routes": 0},
-                "places": places,
-            }
+        # The size of the file itself: the header may be missing (chunked) or count the whole form.
+        uploaded.stream.seek(0, os.SEEK_END)
+        upload_bytes = uploaded.stream.tell()
+        uploaded.stream.seek(0)
+        if upload_bytes > import_async_bytes:
+            return submit_import_job(uploaded, extension, list_title)
+
+        # Flask closes request files when the view returns, but the response below keeps
+        # reading the upload after that, so take the stream over and close it ourselves.
+        upload_stream, uploaded.stream = uploaded.stream, io.BytesIO()
+        cleaner = ImportCleaner(import_dedup_m)
+        batches = timed_iter(
+            iter_place_batches(IMPORT_PARSERS[extension](upload_stream), import_max_places, cleaner),
+            lambda seconds: metrics.observe("import_parse_seconds", seconds, format=extension[1:]),
         )
 
-    return app
+        # Parse the first batch before answering so empty and unreadable files still get a 400.
+        try:
+            first_batch = next(batches, None)
+        except IMPORT_PARSE_ERRORS as exc:
+            upload_stream.close()
+            error = IMPORT_LIMIT_ERROR if isinstance(exc, ImportLimitError) else IMPORT_PARSE_ERROR
+            return jsonify({"ok": False, "error": error}), 400
+        if not first_batch:
+            upload_stream.close()
+            return jsonify({"ok": False, "error": "No points found in file"}), 400
 
+        head = json.dumps({"list_id": uuid.uuid4().hex, "list_title": list_title})
+
+        def stream():
+            # The body is written as places are parsed. "ok" comes last so a failure
+            # halfway through the file still ends in a valid document the client rejects.
+            yield head[:-1] + ', "places": [' + ",".join(first_batch)
+            count = len(first_batch)
+            try:
+                for batch in batches:
+                    count += len(batch)
+                    yield "," + ",".join(batch)
+            except IMPORT_PARSE_ERRORS as exc:
+                error = IMPORT_LIMIT_ERROR if isinstance(exc, ImportLimitError) else IMPORT_PARSE_ERROR
+                yield "], " + json.dumps({"ok": False, "error": error})[1:]
+                app.logger.info("Import aborted: %s", exc)
+                return
+            finally:
+                upload_stream.close()
+            tail = {"counts": cleaner.counts(count), "ok": True}
+            yield "], " + json.dumps(tail)[1:]
+
+        return Response(stream(), mimetype="application/json")
+
+    @app.get("/api/import/<job_id>")
+    def import_job_status(job_id: str):
+        cleanup_import_jobs()
+        with get_db() as conn:
+            job = conn.execute("SELECT * FROM import_jobs WHERE id = ?", (job_id,)).fetchone()
+        if not job:
+            abort(404)
+        if job["state"] == "done":
+            result_path = os.path.join(import_jobs_dir, f"{job_id}.json.gz")
+            try:
+                if request.accept_encodings["gzip"]:
+                    response = send_file(result_path, mimetype="application/json")
+                    response.content_encoding = "gzip"
+                    response.vary.add("Accept-Encoding")
+                    return response
+                result = gzip.open(result_path, "rb")
+            except FileNotFoundError:
+                # Cleanup removed the result after the row was read.
+                return jsonify({"ok": False, "error": "This import has expired. Please upload the file again."}), 410
+            response = Response(iter(lambda: result.read(64 * 1024), b""), mimetype="application/json")
+            response.call_on_close(result.close)
+            return response
+        status = {
+            "ok": job["state"] != "failed",
+            "job_id": job_id,
+            "state": job["state"],
+            "progress": {
+                "places": job["places_count"],
+                "bytes": job["processed_bytes"],
+                "totalBytes": job["total_bytes"],
+            },
+        }
+        if job["error"]:
+            status["error"] = job["error"]
+        return jsonify(status)
 
-app = create_app()
+    @app.delete("/api/import/<job_id>")
+    def cancel_import_job(job_id: str):
+        now = datetime.now(timezone.utc).isoformat()
+        with get_db() as conn:
+            job = conn.execute("SELECT state FROM import_jobs WHERE id = ?", (job_id,)).fetchone()
+            if not job:
+                abort(404)
+            # A running job notices the state change at its next progress report and stops.
+            cancelled = conn.execute(
+                """
+                UPDATE import_jobs SET state = 'cancelled', updated_at = ?
+                WHERE id = ? AND state IN ('queued', 'running')
+                """,
+                (now, job_id),
+            ).rowcount
+        return jsonify({"ok": True, "state": "cancelled" if cancelled else job["state"]})
+
+    return app
 
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5600)
+    create_app().run(debug=True, port=5600)
@@ -0,0 +1,368 @@
+"""Benchmarks for the share and import APIs.
+
+Runs parser, JSON codec and markdown microbenchmarks and a concurrent mixed workload against
+the Flask app on a throwaway SQLite database, then prints (or saves) the results as JSON:
+
+    python benchmarks/bench.py --sizes 100,10000 --output results.json
+    python benchmarks/bench.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench.py --baseline benchmarks/baseline.json   # exits 1 on regressions
+
+All data is generated from a fixed seed, so runs on the same machine are comparable.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import resource
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Apps created here must never touch the real database.
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="geonotion-bench-"), "import.db"))
+
+import app as app_module  # noqa: E402
+from app import (  # noqa: E402
+    EXPORTERS,
+    ImportCleaner,
+    create_app,
+    dumps_json,
+    iter_place_batches,
+    loads_json,
+    parse_csv_places,
+    parse_gpx_places,
+    parse_kml_places,
+    parse_kmz_places,
+    render_markdown,
+    splice_share_document,
+)
+
+PARSERS = {
+    "gpx": parse_gpx_places,
+    "kml": parse_kml_places,
+    "kmz": parse_kmz_places,
+    "csv": parse_csv_places,
+}
+# Operation mix for the load test: share opens, /meta polling and PATCH edits.
+DEFAULT_MIX = {"read": 0.3, "poll": 0.6, "write": 0.1}
+# Metrics where a larger value is worse; everything else is a throughput.
+LOWER_IS_BETTER = ("p50_ms", "p99_ms", "seconds", "peak_rss_kb")
+
+
+def generate_places(count: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    words = ["cafe", "park", "museum", "bridge", "market", "tower", "garden", "station", "harbor"]
+    places = []
+    for index in range(count):
+        places.append(
+            {
+                "id": f"p{index}",
+                "title": f"{rng.choice(words).title()} {index}",
+                "note": " ".join(rng.choice(words) for _ in range(rng.randint(0, 12))),
+                "address": f"{rng.randint(1, 200)} {rng.choice(words).title()} street",
+                "lat": round(rng.uniform(-60, 70), 6),
+                "lng": round(rng.uniform(-180, 180), 6),
+            }
+        )
+    return places
+
+
+def generate_file(fmt: str, places: list) -> bytes:
+    # The server's own exporters, so benchmark inputs are files the app really produces.
+    chunks = EXPORTERS[fmt]("Benchmark", iter(places), "2024-01-01T00:00:00+00:00")
+    return b"".join(chunk.encode("utf-8") if isinstance(chunk, str) else chunk for chunk in chunks)
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def peak_rss_kb() -> int:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes.
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+
+def time_repeated(func, repeat: int) -> list:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def bench_parsers(sizes: list, repeat: int, seed: int) -> dict:
+    results = {}
+    for size in sizes:
+        places = generate_places(size, seed)
+        for fmt, parser in PARSERS.items():
+            data = generate_file(fmt, places)
+
+            def run():
+                # The whole import stage: parsing, coordinate clean-up, dedup and JSON encoding.
+                batches = iter_place_batches(parser(io.BytesIO(data)), size, ImportCleaner(1.0))
+                return sum(len(batch) for batch in batches)
+
+            parsed = run()
+            if parsed != size:
+                raise AssertionError(f"{fmt} import returned {parsed} of {size} places")
+            durations = time_repeated(run, repeat)
+            best = min(durations)
+            results[f"parse.{fmt}.{size}"] = {
+                "seconds": best,
+                "places_per_s": size / best,
+                "mb_per_s": len(data) / best / 1e6,
+            }
+    return results
+
+
+def json_codecs() -> list:
+    # The stdlib path is always measured, so a run shows what the optional codec buys.
+    return ["json"] + (["orjson"] if app_module.orjson is not None else [])
+
+
+def bench_json(size: int, repeat: int, seed: int) -> dict:
+    document = {"title": "Benchmark", "places": generate_places(size, seed)}
+    text = json.dumps(document)
+    stored = text.encode("utf-8")
+    fields = {"id": "0" * 32, "updatedAt": "2024-01-01T00:00:00+00:00", "revision": 1}
+    megabytes = len(stored) / 1e6
+    workdir = tempfile.mkdtemp(prefix="geonotion-bench-")
+    previous = os.environ.get("DB_PATH")
+    os.environ["DB_PATH"] = os.path.join(workdir, "json.db")
+    try:
+        app = create_app()
+    finally:
+        if previous is None:
+            os.environ.pop("DB_PATH", None)
+        else:
+            os.environ["DB_PATH"] = previous
+    client = app.test_client()
+    share_id = client.post("/api/share", json=document).get_json()["id"]
+    share_cache = app.extensions["share_cache"]
+
+    def reencode():
+        # What GET /api/share did before: parse the stored document, then serialise it again.
+        with app.app_context():
+            return app.json.response({**fields, **loads_json(stored)}).get_data()
+
+    def get_uncached():
+        share_cache.invalidate(share_id)
+        return client.get(f"/api/share/{share_id}").data
+
+    def put():
+        # Parsing, place validation, the stored document and the per-place index rows.
+        return client.put(f"/api/share/{share_id}", data=text, content_type="application/json").data
+
+    results = {}
+    installed = app_module.orjson
+    try:
+        for codec in json_codecs():
+            app_module.orjson = installed if codec == "orjson" else None
+            for name, func in (
+                ("dumps", lambda: dumps_json(document)),
+                ("loads", lambda: loads_json(stored)),
+                ("share_reencode", reencode),
+                ("share_get", get_uncached),
+                ("share_put", put),
+            ):
+                best = min(time_repeated(func, repeat))
+                results[f"json.{name}.{codec}.{size}"] = {"seconds": best, "mb_per_s": megabytes / best}
+    finally:
+        app_module.orjson = installed
+        app.extensions["shutdown"]()
+    best = min(time_repeated(lambda: splice_share_document(stored, fields), repeat))
+    results[f"json.share_splice.{size}"] = {"seconds": best, "mb_per_s": megabytes / best}
+    return results
+
+
+def bench_markdown(repeat: int) -> dict:
+    with open(os.path.join(ROOT, "CHANGELOG.md"), encoding="utf-8") as changelog:
+        text = changelog.read()
+    large = "\n\n".join([text] * 50)
+    results = {}
+    for name, source in (("changelog", text), ("changelog_x50", large)):
+        best = min(time_repeated(lambda: render_markdown(source), repeat))
+        results[f"markdown.{name}"] = {"seconds": best, "mb_per_s": len(source.encode("utf-8")) / best / 1e6}
+    return results
+
+
+def bench_load(places_per_share: int, shares: int, threads: int, duration: float, mix: dict, seed: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix="geonotion-bench-")
+    previous = os.environ.get("DB_PATH")
+    os.environ["DB_PATH"] = os.path.join(workdir, "load.db")
+    try:
+        app = create_app()
+    finally:
+        if previous is None:
+            os.environ.pop("DB_PATH", None)
+        else:
+            os.environ["DB_PATH"] = previous
+
+    seeder = app.test_client()
+    share_ids = []
+    for index in range(shares):
+        payload = {"title": f"Share {index}", "places": generate_places(places_per_share, seed + index)}
+        share_ids.append(seeder.post("/api/share", json=payload).get_json()["id"])
+
+    operations = list(mix)
+    weights = [mix[name] for name in operations]
+    latencies = {name: [] for name in operations}
+    conflicts = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_id: int) -> None:
+        rng = random.Random(seed * 1000 + worker_id)
+        client = app.test_client()
+        etags = {}
+        local = {name: [] for name in operations}
+        local_conflicts = 0
+        while time.perf_counter() < deadline:
+            operation = rng.choices(operations, weights)[0]
+            share_id = rng.choice(share_ids)
+            started = time.perf_counter()
+            if operation == "read":
+                client.get(f"/api/share/{share_id}", headers={"Accept-Encoding": "gzip"}).get_data()
+            elif operation == "poll":
+                headers = {"If-None-Match": etags[share_id]} if share_id in etags else {}
+                response = client.get(f"/api/share/{share_id}/meta", headers=headers)
+                etags[share_id] = response.headers.get("ETag", "")
+            else:
+                revision = client.get(f"/api/share/{share_id}/meta").get_json()["revision"]
+                op = {
+                    "op": "update",
+                    "id": f"p{rng.randrange(places_per_share)}",
+                    "fields": {"note": f"edited by {worker_id}"},
+                }
+                response = client.patch(f"/api/share/{share_id}", json={"revision": revision, "ops": [op]})
+                local_conflicts += response.status_code == 409
+            local[operation].append(time.perf_counter() - started)
+        with lock:
+            for name, values in local.items():
+                latencies[name].extend(values)
+            conflicts[0] += local_conflicts
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    app.extensions["shutdown"]()
+
+    prefix = f"load.{places_per_share}"
+    results = {}
+    for name, values in latencies.items():
+        if values:
+            results[f"{prefix}.{name}"] = {
+                "ops_per_s": len(values) / elapsed,
+                "p50_ms": percentile(values, 0.50) * 1000,
+                "p99_ms": percentile(values, 0.99) * 1000,
+            }
+    total = sum(len(values) for values in latencies.values())
+    results[f"{prefix}.total"] = {"ops_per_s": total / elapsed, "write_conflicts": conflicts[0]}
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Returns (key, metric, baseline, current) for every metric worse than the tolerance."""
+    regressions = []
+    for key, metrics in results.items():
+        for metric, value in metrics.items():
+            before = baseline.get(key, {}).get(metric)
+            if not before or metric == "write_conflicts":
+                continue
+            ratio = value / before
+            worse = ratio > 1 + tolerance if metric in LOWER_IS_BETTER else ratio < 1 - tolerance
+            if worse:
+                regressions.append((key, metric, before, value))
+    return regressions
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}")
+        mix[name] = float(weight)
+    return mix
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1,100,1000,10000,100000", help="places per generated file")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per microbenchmark; the best is kept")
+    parser.add_argument("--load-places", type=int, default=1000, help="places per share in the load test")
+    parser.add_argument("--load-shares", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="e.g. read=0.3,poll=0.6,write=0.1")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json-places", type=int, default=10000, help="places in the JSON codec payload")
+    parser.add_argument("--only", choices=("parsers", "json", "markdown", "load"), action="append")
+    parser.add_argument("--output", help="write results JSON here instead of stdout")
+    parser.add_argument("--save-baseline", help="also write the results as a baseline file")
+    parser.add_argument("--baseline", help="compare against this baseline and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    sections = set(args.only or ("parsers", "json", "markdown", "load"))
+    results = {}
+    if "parsers" in sections:
+        sizes = [int(size) for size in args.sizes.split(",")]
+        results.update(bench_parsers(sizes, args.repeat, args.seed))
+    if "json" in sections:
+        results.update(bench_json(args.json_places, args.repeat, args.seed))
+    if "markdown" in sections:
+        results.update(bench_markdown(args.repeat))
+    if "load" in sections:
+        results.update(
+            bench_load(args.load_places, args.load_shares, args.threads, args.duration, args.mix, args.seed)
+        )
+    results["process"] = {"peak_rss_kb": peak_rss_kb()}
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "arguments": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as output:
+            output.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as source:
+            baseline = json.load(source)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for key, metric, before, value in regressions:
+            print(f"REGRESSION {key} {metric}: {before:.4g} -> {value:.4g}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
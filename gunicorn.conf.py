@@ -0,0 +1,50 @@
+"""Gunicorn settings for production; every value can be overridden from the environment."""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+# One process per core; greenlets (or threads) cover requests waiting on SQLite, the network or SSE.
+workers = int(os.environ.get("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+
+try:
+    import gevent
+except ImportError:  # Optional: without it every open SSE stream holds a gthread thread.
+    gevent = None
+
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gevent" if gevent is not None else "gthread")
+if worker_class == "gevent":
+    # Patch before the app is preloaded, so the locks, queues and threads it creates in the
+    # master are gevent's; the worker itself would only patch after forking.
+    from gevent import monkey
+
+    monkey.patch_all()
+    # An open SSE stream is a parked greenlet, so most connections may be streams.
+    worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "1000"))
+    os.environ.setdefault("SHARE_EVENTS_MAX_STREAMS", str(worker_connections * 3 // 4))
+else:
+    threads = int(os.environ.get("GUNICORN_THREADS", "32"))
+    # Each SSE stream holds a thread for up to SHARE_EVENTS_TIMEOUT; half stay free for requests.
+    os.environ.setdefault("SHARE_EVENTS_MAX_STREAMS", str(max(1, threads // 2)))
+
+preload_app = True
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+accesslog = "-"
+errorlog = "-"
+
+if workers > 1:
+    # Share change notifications must reach SSE clients connected to other workers.
+    os.environ.setdefault("SHARE_EVENTS_BACKEND", "sqlite")
+
+
+def when_ready(server):
+    # The master opened connections while migrating; workers must not inherit live handles.
+    server.app.wsgi().extensions["db_pool"].close()
+
+
+def worker_exit(server, worker):
+    # Flush buffered analytics and access times, and stop background threads and pools.
+    worker.wsgi.extensions["shutdown"]()
@@ -6,10 +6,14 @@ document.addEventListener("DOMContentLoaded", () => {
     let isRemoteShare = false;
     let readOnly = false;
     let remoteSharePassword = "";
+    let remoteShareToken = "";
     let pendingShare = null;
     let shareSyncTimer = null;
     let sharePollTimer = null;
+    let shareEvents = null;
+    let shareEventsId = null;
     let lastShareUpdatedAt = null;
+    let lastShareMetaEtag = null;
 
   const appLoading = document.getElementById("appLoading");
   const undoBanner = document.getElementById("undoBanner");
@@ -54,73 +58,264 @@ document.addEventListener("DOMContentLoaded", () => {
   let lastImportedFile = null;
   let importInFlight = false;
 
+  const buildShareHeaders = (password = "") => {
+    const headers = password ? { "X-Share-Password": password } : {};
+    if (remoteShareToken) headers["X-Share-Token"] = remoteShareToken;
+    return headers;
+  };
+
+  const rememberShareToken = (response) => {
+    const token = response.headers.get("X-Share-Token");
+    if (token) remoteShareToken = token;
+  };
+
+  // Last state each share was synced to, so later saves can PATCH only what changed.
+  const shareSyncState = new Map();
+
   const loadRemoteShare = async (shareId, password = "") => {
     if (!shareId) return null;
     try {
-      const headers = password ? { "X-Share-Password": password } : {};
+      const headers = buildShareHeaders(password);
       const response = await fetch(`/api/share/${shareId}`, { headers });
+      rememberShareToken(response);
       if (response.status === 401) {
         return { requiresPassword: true };
       }
       if (!response.ok) throw new Error("Remote share load failed");
-      return await response.json();
+      const data = await response.json();
+      if (Number.isInteger(data.revision)) {
+        // What we just loaded is the baseline for the next save, so it can be a PATCH.
+        shareSyncState.set(shareId, {
+          revision: data.revision,
+          title: data.title || "My map",
+          places: data.places || [],
+        });
+      }
+      return data;
     } catch (err) {
       console.warn("Remote share load failed", err);
       return null;
     }
   };
 
-  const loadRemoteShareMeta = async (shareId, password = "") => {
+  const loadRemoteShareMeta = async (shareId, password = "", etag = null) => {
     if (!shareId) return null;
     try {
-      const headers = password ? { "X-Share-Password": password } : {};
-      const response = await fetch(`/api/share/${shareId}/meta`, { headers });
+      const headers = buildShareHeaders(password);
+      if (etag) headers["If-None-Match"] = etag;
+      // Revalidate by hand: the API answers with no-store, so the HTTP cache won't do it for us.
+      const response = await fetch(`/api/share/${shareId}/meta`, { headers, cache: "no-store" });
+      rememberShareToken(response);
+      if (response.status === 304) {
+        return { notModified: true };
+      }
       if (response.status === 401) {
         return { requiresPassword: true };
       }
       if (!response.ok) throw new Error("Remote share meta failed");
-      return await response.json();
+      const meta = await response.json();
+      meta.etag = response.headers.get("ETag");
+      return meta;
     } catch (err) {
       console.warn("Remote share meta failed", err);
       return null;
     }
   };
 
+  const placesEqual = (a, b) => JSON.stringify(a) === JSON.stringify(b);
+
+  const diffSharePlaces = (base, next) => {
+    if (![...base, ...next].every((place) => place && place.id)) return null;
+    const baseById = new Map(base.map((place) => [place.id, place]));
+    const nextIds = new Set(next.map((place) => place.id));
+    const ops = [];
+    const order = [];
+    base.forEach((place) => {
+      if (nextIds.has(place.id)) {
+        order.push(place.id);
+      } else {
+        ops.push({ op: "remove", id: place.id });
+      }
+    });
+    next.forEach((place, index) => {
+      const previous = baseById.get(place.id);
+      if (!previous) {
+        ops.push({ op: "add", place, index });
+        order.splice(index, 0, place.id);
+      } else if (!placesEqual(previous, place)) {
+        ops.push({ op: "update", id: place.id, place });
+      }
+    });
+    const nextOrder = next.map((place) => place.id);
+    if (!placesEqual(order, nextOrder)) ops.push({ op: "reorder", order: nextOrder });
+    return ops;
+  };
+
+  // Replay a diff on top of a newer version; edits to places removed there are dropped.
+  const applyShareOps = (base, ops) => {
+    let result = [...base];
+    ops.forEach((op) => {
+      if (op.op === "remove") {
+        result = result.filter((place) => place.id !== op.id);
+      } else if (op.op === "update") {
+        result = result.map((place) => (place.id === op.id ? op.place : place));
+      } else if (op.op === "add" && !result.some((place) => place.id === op.place.id)) {
+        result.splice(Math.min(op.index, result.length), 0, op.place);
+      } else if (op.op === "reorder") {
+        const byId = new Map(result.map((place) => [place.id, place]));
+        const ordered = op.order.filter((id) => byId.has(id)).map((id) => byId.get(id));
+        const orderedIds = new Set(op.order);
+        result = [...ordered, ...result.filter((place) => !orderedIds.has(place.id))];
+      }
+    });
+    return result;
+  };
+
+  const syncShare = async (shareId, title, places, headers, onRebase) => {
+    const synced = shareSyncState.get(shareId);
+    const ops = synced ? diffSharePlaces(synced.places, places) : null;
+    if (synced && ops && !ops.length && synced.title === title) return null;
+    let response = null;
+    if (synced && ops) {
+      response = await fetch(`/api/share/${shareId}`, {
+        method: "PATCH",
+        headers,
+        body: JSON.stringify({ revision: synced.revision, title, ops }),
+      });
+    }
+    if (response?.status === 409) {
+      // Someone else saved in between: rebase our changes onto their version instead of
+      // overwriting it. Loading the share also makes it the baseline if this attempt fails.
+      const latest = await loadRemoteShare(shareId, headers["X-Share-Password"] || "");
+      if (!latest || latest.requiresPassword || !Number.isInteger(latest.revision)) return response;
+      const latestPlaces = latest.places || [];
+      const latestTitle = latest.title || "My map";
+      places = applyShareOps(latestPlaces, ops);
+      title = title !== synced.title ? title : latestTitle;
+      onRebase?.(title, places);
+      const rebasedOps = diffSharePlaces(latestPlaces, places);
+      if (!rebasedOps) return response;
+      if (!rebasedOps.length && title === latestTitle) return null;
+      response = await fetch(`/api/share/${shareId}`, {
+        method: "PATCH",
+        headers,
+        body: JSON.stringify({ revision: latest.revision, title, ops: rebasedOps }),
+      });
+    }
+    if (!response) {
+      // No baseline yet: fall back to a full write.
+      response = await fetch(`/api/share/${shareId}`, {
+        method: "PUT",
+        headers,
+        body: JSON.stringify({ title, places }),
+      });
+    }
+    if (response.ok) {
+      const result = await response.json().catch(() => ({}));
+      if (Number.isInteger(result.revision)) {
+        shareSyncState.set(shareId, { revision: result.revision, title, places });
+      } else {
+        shareSyncState.delete(shareId);
+      }
+    } else if (response.status !== 409) {
+      shareSyncState.delete(shareId);
+    }
+    return response;
+  };
+
+  // Show what was actually saved after a conflicting edit was merged in.
+  const replaceListContents = (listId, title, nextPlaces) => {
+    const idx = lists.findIndex((l) => l.id === listId);
+    if (idx === -1) return;
+    lists = [...lists.slice(0, idx), { ...lists[idx], title, places: nextPlaces }, ...lists.slice(idx + 1)];
+    GeoStore.saveLists(lists);
+    listsWithPlaces = new Set(
+      lists.filter((list) => (list.places || []).length > 0).map((list) => list.id)
+    );
+    renderListsPanel();
+    if (listId === currentListId) syncFromActiveList();
+  };
+
   const saveRemoteShare = async (list) => {
     if (!remoteShareId || !remoteEditable) return;
     try {
-      const headers = { "Content-Type": "application/json" };
-      if (remoteSharePassword) headers["X-Share-Password"] = remoteSharePassword;
-      await fetch(`/api/share/${remoteShareId}`, {
-        method: "PUT",
+      const headers = { "Content-Type": "application/json", ...buildShareHeaders(remoteSharePassword) };
+      const response = await syncShare(
+        remoteShareId,
+        list.title || "My map",
+        list.places || [],
         headers,
-        body: JSON.stringify({ title: list.title || "My map", places: list.places || [] }),
-      });
+        (title, places) => replaceListContents(list.id, title, places)
+      );
+      if (response) rememberShareToken(response);
     } catch (err) {
       console.warn("Remote share save failed", err);
     }
   };
 
+  const normalizeOwnedPlaces = (list) =>
+    GeoShare?.normalizePlaces && Array.isArray(list.places)
+      ? GeoShare.normalizePlaces(list.places)
+      : list.places || [];
+
   const saveOwnedShare = async (list, shareId) => {
     if (!shareId) return;
     try {
       const headers = { "Content-Type": "application/json" };
       const password = GeoShare?.getSharePassword?.(shareId) || "";
       if (password) headers["X-Share-Password"] = password;
-      const normalized =
-        GeoShare?.normalizePlaces && Array.isArray(list.places)
-          ? GeoShare.normalizePlaces(list.places)
-          : list.places || [];
-      await fetch(`/api/share/${shareId}`, {
-        method: "PUT",
-        headers,
-        body: JSON.stringify({ title: list.title || "My map", places: normalized }),
-      });
+      await syncShare(shareId, list.title || "My map", normalizeOwnedPlaces(list), headers, (title, places) =>
+        replaceListContents(list.id, title, places)
+      );
     } catch (err) {
       console.warn("Owned share sync failed", err);
     }
   };
 
+  // Several owned lists changed at once (e.g. renamed in the lists panel): write them in one request.
+  const saveOwnedSharesBatch = async (entries) => {
+    const items = entries.map(([shareId, list]) => {
+      const item = { id: shareId, title: list.title || "My map", places: normalizeOwnedPlaces(list) };
+      const password = GeoShare?.getSharePassword?.(shareId) || "";
+      if (password) item.password = password;
+      return item;
+    });
+    try {
+      const response = await fetch("/api/shares/batch", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ items }),
+      });
+      if (!response.ok) throw new Error("Owned share batch failed");
+      const { results = [] } = await response.json();
+      items.forEach((item, index) => {
+        const result = results[index] || {};
+        if (result.status === 200 && Number.isInteger(result.revision)) {
+          shareSyncState.set(item.id, { revision: result.revision, title: item.title, places: item.places });
+        } else {
+          shareSyncState.delete(item.id);
+        }
+      });
+    } catch (err) {
+      console.warn("Owned share batch failed, saving one by one", err);
+      for (const [shareId, list] of entries) await saveOwnedShare(list, shareId);
+    }
+  };
+
+  const pendingOwnedShares = new Map();
+
+  const flushOwnedShares = async () => {
+    shareSyncTimer = null;
+    const entries = [...pendingOwnedShares];
+    pendingOwnedShares.clear();
+    if (entries.length === 1) {
+      // A single list keeps the PATCH path, which only sends what changed.
+      await saveOwnedShare(entries[0][1], entries[0][0]);
+    } else if (entries.length) {
+      await saveOwnedSharesBatch(entries);
+    }
+  };
+
   const scheduleRemoteSave = (list) => {
     if (!remoteShareId || !remoteEditable) return;
     if (remoteSaveTimer) clearTimeout(remoteSaveTimer);
@@ -131,38 +326,92 @@ document.addEventListener("DOMContentLoaded", () => {
     if (!list || isRemoteShare || readOnly) return;
     const shareId = GeoShare?.getShareIdForList?.(list.id);
     if (!shareId) return;
+    pendingOwnedShares.set(shareId, list);
     if (shareSyncTimer) clearTimeout(shareSyncTimer);
-    shareSyncTimer = setTimeout(() => saveOwnedShare(list, shareId), 400);
+    shareSyncTimer = setTimeout(flushOwnedShares, 400);
+  };
+
+  const stopShareEvents = () => {
+    if (shareEvents) {
+      shareEvents.close();
+      shareEvents = null;
+      shareEventsId = null;
+    }
   };
 
   const stopSharePolling = () => {
+    stopShareEvents();
     if (sharePollTimer) {
       clearInterval(sharePollTimer);
       sharePollTimer = null;
     }
   };
 
-  const startSharePolling = () => {
-    stopSharePolling();
-    if (!isRemoteShare || remoteEditable || !remoteShareId) return;
-    const poll = async () => {
-      const meta = await loadRemoteShareMeta(remoteShareId, remoteSharePassword);
-      if (!meta || meta.requiresPassword) return;
-      if (!lastShareUpdatedAt) {
-        lastShareUpdatedAt = meta.updatedAt || null;
-        return;
-      }
-      if (meta.updatedAt && meta.updatedAt !== lastShareUpdatedAt) {
-        lastShareUpdatedAt = meta.updatedAt;
-        const data = await loadRemoteShare(remoteShareId, remoteSharePassword);
-        if (data && !data.requiresPassword) {
-          applyRemoteShareData(remoteShareId, data, remoteEditable);
-        }
+  const handleRemoteShareVersion = async (updatedAt) => {
+    if (!lastShareUpdatedAt) {
+      lastShareUpdatedAt = updatedAt || null;
+      return;
+    }
+    if (updatedAt && updatedAt !== lastShareUpdatedAt) {
+      lastShareUpdatedAt = updatedAt;
+      const data = await loadRemoteShare(remoteShareId, remoteSharePassword);
+      if (data && !data.requiresPassword) {
+        applyRemoteShareData(remoteShareId, data, remoteEditable);
       }
+    }
+  };
+
+  const startShareMetaPolling = () => {
+    if (sharePollTimer) return;
+    const poll = async () => {
+      const meta = await loadRemoteShareMeta(remoteShareId, remoteSharePassword, lastShareMetaEtag);
+      if (!meta || meta.notModified || meta.requiresPassword) return;
+      lastShareMetaEtag = meta.etag || null;
+      await handleRemoteShareVersion(meta.updatedAt);
     };
     poll();
     sharePollTimer = setInterval(poll, 8000);
   };
+
+  const startShareEvents = () => {
+    if (typeof EventSource === "undefined") return false;
+    if (shareEvents && shareEventsId === remoteShareId) return true;
+    stopShareEvents();
+    // EventSource cannot send headers; prefer the short-lived token over the password in the URL.
+    const query = remoteShareToken
+      ? `?share_token=${encodeURIComponent(remoteShareToken)}`
+      : remoteSharePassword
+        ? `?password=${encodeURIComponent(remoteSharePassword)}`
+        : "";
+    const source = new EventSource(`/api/share/${remoteShareId}/events${query}`);
+    source.addEventListener("update", (event) => {
+      try {
+        handleRemoteShareVersion(JSON.parse(event.data).updatedAt);
+      } catch (err) {
+        console.warn("Share event parse failed", err);
+      }
+    });
+    source.onerror = () => {
+      // EventSource retries network drops itself; CLOSED means the server refused the stream.
+      if (source.readyState !== EventSource.CLOSED || shareEvents !== source) return;
+      shareEvents = null;
+      shareEventsId = null;
+      startShareMetaPolling();
+    };
+    shareEvents = source;
+    shareEventsId = remoteShareId;
+    return true;
+  };
+
+  const startSharePolling = () => {
+    if (!isRemoteShare || remoteEditable || !remoteShareId) {
+      stopSharePolling();
+      return;
+    }
+    if (shareEvents && shareEventsId === remoteShareId) return;
+    stopSharePolling();
+    if (!startShareEvents()) startShareMetaPolling();
+  };
   const parseHashRoute = (hashValue) => {
     if (!hashValue || hashValue === "#") {
       return { mode: null, listId: null, params: new URLSearchParams() };
@@ -425,6 +674,19 @@ document.addEventListener("DOMContentLoaded", () => {
     syncFromActiveList();
   };
 
+  const waitForImportJob = async (statusUrl) => {
+    // Large files are parsed in the background; poll the job until it settles.
+    for (;;) {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      const response = await fetch(statusUrl, { cache: "no-store" });
+      const job = await response.json().catch(() => ({}));
+      if (!response.ok) throw new Error(job?.error || "Import failed");
+      if (job.state === "queued" || job.state === "running") continue;
+      if (job.state === "cancelled") throw new Error("Import was cancelled");
+      return job;
+    }
+  };
+
   const uploadImportFile = async (file) => {
     if (!file) return;
     if (!isSupportedImportFile(file)) {
@@ -441,8 +703,13 @@ document.addEventListener("DOMContentLoaded", () => {
         method: "POST",
         body: formData,
       });
-      const data = await response.json().catch(() => ({}));
-      if (!response.ok || !data?.ok) {
+      let data = await response.json().catch(() => ({}));
+      if (response.status === 202 && data?.statusUrl) {
+        data = await waitForImportJob(data.statusUrl);
+      } else if (!response.ok) {
+        throw new Error(data?.error || "Import failed");
+      }
+      if (!data?.ok) {
         throw new Error(data?.error || "Import failed");
       }
       addImportedList(data);
@@ -606,7 +873,11 @@ document.addEventListener("DOMContentLoaded", () => {
   const exitListEdit = (persist) => {
     if (!listEditMode) return;
     if (persist && !readOnly) {
+      const previous = new Map(lists.map((l) => [l.id, l]));
       lists = [...listDrafts];
+      lists
+        .filter((l) => previous.has(l.id) && previous.get(l.id).title !== l.title)
+        .forEach(scheduleOwnedShareSave);
       if (!lists.find((l) => l.id === currentListId)) {
         currentListId = lists[0]?.id || null;
       }
@@ -629,6 +900,7 @@ document.addEventListener("DOMContentLoaded", () => {
   };
 
   const applyResolvedState = (resolved) => {
+    if (resolved.remoteShareId !== remoteShareId) remoteShareToken = "";
     lists = resolved.lists;
     currentListId = resolved.currentListId;
     readOnly = resolved.readOnly;
@@ -638,6 +910,7 @@ document.addEventListener("DOMContentLoaded", () => {
     if (!isRemoteShare || remoteEditable) {
       stopSharePolling();
       lastShareUpdatedAt = null;
+      lastShareMetaEtag = null;
     }
   };
 
@@ -1089,6 +1362,11 @@ document.addEventListener("DOMContentLoaded", () => {
     places: getVisiblePlaces(),
     title: savedTitle,
     listId: currentListId,
+    // A view-only share matches the server copy, so exports can stream from the server.
+    serverExport:
+      remoteShareId && !remoteEditable && !pendingDeletedIds.size
+        ? { shareId: remoteShareId, token: remoteShareToken, password: remoteSharePassword }
+        : null,
   }));
 
   renderListsPanel();
@@ -946,12 +946,32 @@ ${items}
     URL.revokeObjectURL(url);
   };
 
+  const SERVER_EXPORT_MIN_PLACES = 500;
+
+  const downloadServerExport = (serverExport, places, format) => {
+    if (!serverExport?.shareId || places.length < SERVER_EXPORT_MIN_PLACES) return false;
+    const url = new URL(
+      `/api/share/${encodeURIComponent(serverExport.shareId)}/export.${format}`,
+      window.location.origin
+    );
+    if (serverExport.token) url.searchParams.set("share_token", serverExport.token);
+    else if (serverExport.password) url.searchParams.set("password", serverExport.password);
+    const link = document.createElement("a");
+    link.href = url.toString();
+    link.download = "";
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+    return true;
+  };
+
   const shareAsGpx = () => {
-    const { places, title } = getData();
+    const { places, title, serverExport } = getData();
     if (!places.length) {
       alert("Add some places on the map");
       return;
     }
+    if (downloadServerExport(serverExport, places, "gpx")) return;
     const gpx = buildGpx(places, title);
     const cleanedTitle = (title || "My map").trim().replace(/[\\/:*?"<>|]+/g, "").trim() || "My map";
     const filename = `${cleanedTitle}.gpx`;
@@ -959,11 +979,12 @@ ${items}
   };
 
   const shareAsCsv = () => {
-    const { places, title } = getData();
+    const { places, title, serverExport } = getData();
     if (!places.length) {
       alert("Add some places on the map");
       return;
     }
+    if (downloadServerExport(serverExport, places, "csv")) return;
     const csv = buildCsv(places);
     const cleanedTitle = (title || "My map").trim().replace(/[\\/:*?"<>|]+/g, "").trim() || "My map";
     const filename = `${cleanedTitle}.csv`;
@@ -971,11 +992,12 @@ ${items}
   };
 
   const shareAsKmz = () => {
-    const { places, title } = getData();
+    const { places, title, serverExport } = getData();
     if (!places.length) {
       alert("Add some places on the map");
       return;
     }
+    if (downloadServerExport(serverExport, places, "kmz")) return;
     const kml = buildKml(places, title);
     const kmz = buildKmz(kml, "doc.kml");
     const cleanedTitle = (title || "My map").trim().replace(/[\\/:*?"<>|]+/g, "").trim() || "My map";
@@ -166,7 +166,13 @@ self.addEventListener("fetch", (event) => {
   }
 
   if (url.pathname.startsWith("/api/")) {
-    if (url.pathname === "/api/share" || url.pathname.startsWith("/api/share/")) {
+    // Leave event streams to the network stack so they are never buffered by the worker.
+    if (request.headers.get("Accept") === "text/event-stream") return;
+    if (
+      url.pathname === "/api/share" ||
+      url.pathname.startsWith("/api/share/") ||
+      url.pathname.startsWith("/api/import/")
+    ) {
       event.respondWith(fetch(request));
       return;
     }
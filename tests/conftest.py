@@ -0,0 +1,32 @@
+import pytest
+
+from app import create_app
+
+
+@pytest.fixture()
+def make_app(tmp_path, monkeypatch):
+    # Builds apps on the test database with extra settings, e.g. make_app(ADMIN_TOKEN="x").
+    apps = []
+
+    def make(**env):
+        monkeypatch.setenv("DB_PATH", str(tmp_path / "test.db"))
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        app = create_app()
+        app.config.update(TESTING=True)
+        apps.append(app)
+        return app
+
+    yield make
+    for app in reversed(apps):
+        app.extensions["shutdown"]()
+
+
+@pytest.fixture()
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture()
+def client(app):
+    return app.test_client()
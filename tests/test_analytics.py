@@ -0,0 +1,45 @@
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture()
+def app(make_app):
+    return make_app(ANALYTICS_FLUSH_SIZE=1000, ANALYTICS_FLUSH_INTERVAL=3600, ADMIN_TOKEN="secret")
+
+
+def stored_count(app, metric):
+    with app.extensions["db_pool"].connection() as conn:
+        return conn.execute("SELECT count FROM analytics WHERE metric = ?", (metric,)).fetchone()["count"]
+
+
+def test_events_are_buffered_and_visible_before_flush(app, client):
+    for _ in range(3):
+        assert client.post("/api/analytics/event", json={"event": "place_added"}).status_code == 200
+
+    assert stored_count(app, "places_added_total") == 0
+    data = client.get("/admin/analytics/data", headers={"X-Admin-Token": "secret"}).get_json()
+    assert data["places_added_total"] == 3
+
+    app.extensions["analytics_buffer"].flush()
+    assert stored_count(app, "places_added_total") == 3
+    data = client.get("/admin/analytics/data", headers={"X-Admin-Token": "secret"}).get_json()
+    assert data["places_added_total"] == 3
+
+
+def test_failed_flush_keeps_pending_increments(app, client):
+    buffer = app.extensions["analytics_buffer"]
+    client.post("/api/analytics/event", json={"event": "session_started"})
+    original = buffer._write
+
+    def failing_write(deltas):
+        raise sqlite3.OperationalError("database is locked")
+
+    buffer._write = failing_write
+    with pytest.raises(sqlite3.OperationalError):
+        buffer.flush()
+    assert buffer.pending() == {"sessions_total": 1}
+
+    buffer._write = original
+    buffer.flush()
+    assert stored_count(app, "sessions_total") == 1
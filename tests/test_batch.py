@@ -0,0 +1,69 @@
+def create(client, title="List", places=None):
+    return client.post("/api/share", json={"title": title, "places": places or []}).get_json()["id"]
+
+
+def test_batch_creates_and_updates_with_per_item_status(client):
+    first, second = create(client, "One"), create(client, "Two")
+    client.put(f"/api/share/{second}/password", json={"password": "secret"})
+    response = client.post(
+        "/api/shares/batch",
+        json={
+            "items": [
+                {"title": "New", "places": [{"id": "a", "lat": 1, "lng": 2}]},
+                {"id": first, "title": "One v2", "places": [{"id": "b"}], "revision": 1},
+                {"id": second, "title": "Locked", "places": []},
+                {"id": "missing", "places": []},
+                {"id": first, "places": [], "revision": 1},
+                {"places": "not a list"},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [item["status"] for item in results] == [201, 200, 401, 404, 409, 400]
+    assert results[1]["revision"] == 2
+    assert results[4] == {"id": first, "status": 409, "error": "revision_conflict", "revision": 2}
+
+    created = client.get(f"/api/share/{results[0]['id']}").get_json()
+    assert created["title"] == "New" and created["places"] == [{"id": "a", "lat": 1, "lng": 2}]
+    assert client.get(f"/api/share/{first}").get_json()["title"] == "One v2"
+
+    unlocked = client.post(
+        "/api/shares/batch", json={"items": [{"id": second, "title": "Unlocked", "password": "secret"}]}
+    ).get_json()["results"][0]
+    assert unlocked["status"] == 200 and unlocked["shareToken"]
+
+
+def test_batch_rejects_empty_and_oversized_requests(client):
+    assert client.post("/api/shares/batch", json={}).status_code == 400
+    response = client.post("/api/shares/batch", json={"items": [{}] * 101})
+    assert response.status_code == 413
+    assert response.get_json() == {"error": "too_many_items", "limit": 100}
+
+
+def test_fetch_returns_documents_metadata_and_revalidation(client):
+    first = create(client, "One", [{"id": "a"}])
+    second = create(client, "Two", [{"id": "b"}, {"id": "c"}])
+    client.put(f"/api/share/{second}/password", json={"password": "secret"})
+
+    results = client.post(
+        "/api/shares/fetch", json={"shares": [first, {"id": second}, "missing", {"id": 5}]}
+    ).get_json()["results"]
+    assert [item["status"] for item in results] == [200, 401, 404, 400]
+    assert results[0]["title"] == "One" and results[0]["places"] == [{"id": "a"}]
+
+    results = client.post(
+        "/api/shares/fetch",
+        json={
+            "fields": "meta",
+            "shares": [{"id": first, "revision": 1}, {"id": second, "password": "secret"}],
+        },
+    ).get_json()["results"]
+    assert results[0] == {"id": first, "status": 304, "revision": 1}
+    assert results[1]["placesCount"] == 2 and "places" not in results[1]
+    token = results[1]["shareToken"]
+
+    full = client.post(
+        "/api/shares/fetch", json={"shares": [second]}, headers={"X-Share-Token": token}
+    ).get_json()["results"][0]
+    assert full["status"] == 200 and full["title"] == "Two"
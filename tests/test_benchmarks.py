@@ -0,0 +1,38 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import bench  # noqa: E402
+
+
+def test_generated_files_parse_back():
+    results = bench.bench_parsers([25], repeat=1, seed=3)
+    assert set(results) == {f"parse.{fmt}.25" for fmt in ("gpx", "kml", "kmz", "csv")}
+
+
+def test_json_benchmark_covers_each_codec():
+    results = bench.bench_json(20, repeat=1, seed=3)
+    assert "json.share_splice.20" in results
+    for codec in bench.json_codecs():
+        assert results[f"json.share_get.{codec}.20"]["seconds"] > 0
+
+
+def test_baseline_comparison(tmp_path):
+    output = tmp_path / "results.json"
+    argv = ["--only", "markdown", "--only", "load", "--duration", "0.3", "--threads", "2"]
+    argv += ["--load-places", "5", "--load-shares", "2", "--repeat", "1"]
+    assert bench.main([*argv, "--output", str(output)]) == 0
+    results = json.loads(output.read_text())["results"]
+    assert results["load.5.total"]["ops_per_s"] > 0
+    assert results["process"]["peak_rss_kb"] > 0
+
+    slower = {key: dict(value) for key, value in results.items()}
+    slower["load.5.total"]["ops_per_s"] *= 0.5
+    slower["markdown.changelog"]["seconds"] *= 2
+    regressions = bench.compare(slower, results, tolerance=0.25)
+    assert {(key, metric) for key, metric, _, _ in regressions} == {
+        ("load.5.total", "ops_per_s"),
+        ("markdown.changelog", "seconds"),
+    }
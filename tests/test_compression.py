@@ -0,0 +1,106 @@
+import gzip
+import json
+import sqlite3
+
+import pytest
+
+from app import decode_share_data, encode_share_data
+
+PLACES = [{"id": f"p{i}", "title": f"Place {i}", "address": "Somewhere street 1", "lat": 1.0, "lng": float(i)} for i in range(60)]
+
+
+def test_share_data_codec_roundtrip():
+    text = json.dumps({"title": "Привет", "places": PLACES})
+    assert decode_share_data(text) == text
+    assert decode_share_data(encode_share_data(text)) == text
+    assert encode_share_data(text, "none") == text
+
+
+def test_json_responses_negotiate_gzip(client):
+    share_id = client.post("/api/share", json={"title": "Big", "places": PLACES}).get_json()["id"]
+    plain = client.get(f"/api/share/{share_id}/places?limit=100")
+    assert "Content-Encoding" not in plain.headers
+    compressed = client.get(f"/api/share/{share_id}/places?limit=100", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    assert gzip.decompress(compressed.data) == plain.data
+
+    small = client.get(f"/api/share/{share_id}/meta", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+
+
+def test_each_coding_has_its_own_etag(client):
+    share_id = client.post("/api/share", json={"title": "Big", "places": PLACES}).get_json()["id"]
+    for path in (f"/api/share/{share_id}", f"/api/share/{share_id}/search?q=somewhere&limit=50"):
+        plain = client.get(path)
+        compressed = client.get(path, headers={"Accept-Encoding": "gzip"})
+        assert compressed.headers["Content-Encoding"] == "gzip"
+        assert compressed.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+        for etag in (plain.headers["ETag"], compressed.headers["ETag"]):
+            for headers in ({}, {"Accept-Encoding": "gzip"}):
+                revalidated = client.get(path, headers={"If-None-Match": etag, **headers})
+                assert revalidated.status_code == 304
+                assert revalidated.headers["ETag"] == etag
+
+
+def test_unknown_share_data_codec_is_rejected(make_app):
+    with pytest.raises(ValueError):
+        make_app(SHARE_DATA_CODEC="lzma")
+
+
+def test_share_data_is_stored_compressed(make_app, tmp_path):
+    db_path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE shares (id TEXT PRIMARY KEY, data TEXT NOT NULL, created_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+    )
+    places = [{"id": str(i), "title": "Place", "note": "Same note " * 5} for i in range(50)]
+    legacy = json.dumps({"title": "Old", "places": places})
+    conn.execute("INSERT INTO shares VALUES ('legacy', ?, '2024-01-01', '2024-01-01')", (legacy,))
+    conn.commit()
+    conn.close()
+
+    app = make_app(DB_PATH=db_path)
+    client = app.test_client()
+    share_id = client.post("/api/share", json={"title": "New", "places": places}).get_json()["id"]
+    with app.extensions["db_pool"].connection() as conn:
+        rows = conn.execute("SELECT data FROM share_blobs").fetchall()
+        assert conn.execute("SELECT COUNT(*) FROM shares WHERE blob_hash IS NULL").fetchone()[0] == 0
+    assert len(rows) == 2
+    for row in rows:
+        assert isinstance(row["data"], bytes)
+        assert len(row["data"]) < len(legacy) / 5
+    assert client.get("/api/share/legacy").get_json()["places"] == places
+    assert client.get(f"/api/share/{share_id}").get_json()["places"] == places
+
+
+def blob_refcounts(app):
+    with app.extensions["db_pool"].connection() as conn:
+        return sorted(row[0] for row in conn.execute("SELECT refcount FROM share_blobs"))
+
+
+def test_identical_shares_share_one_blob(app, client):
+    payload = {"title": "Same", "places": [{"id": "a", "title": "A"}]}
+    first = client.post("/api/share", json=payload).get_json()["id"]
+    second = client.post("/api/share", json=payload).get_json()["id"]
+    assert blob_refcounts(app) == [2]
+
+    client.put(f"/api/share/{first}", json={"title": "Changed", "places": []})
+    assert blob_refcounts(app) == [1, 1]
+    assert client.get(f"/api/share/{second}").get_json()["title"] == "Same"
+
+    client.put(f"/api/share/{second}", json={"title": "Changed", "places": []})
+    assert blob_refcounts(app) == [0, 2]
+
+
+def test_unreferenced_blobs_are_collected(make_app):
+    app = make_app()
+    client = app.test_client()
+    share_id = client.post("/api/share", json={"title": "One", "places": []}).get_json()["id"]
+    client.put(f"/api/share/{share_id}", json={"title": "Two", "places": []})
+    assert blob_refcounts(app) == [0, 1]
+    app.extensions["shutdown"]()
+
+    restarted = make_app()
+    assert blob_refcounts(restarted) == [1]
+    assert restarted.test_client().get(f"/api/share/{share_id}").get_json()["title"] == "Two"
@@ -0,0 +1,78 @@
+import csv
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+
+PLACES = [
+    {"id": "a", "title": "Café <One>", "note": 'Say "hi"', "address": "Main St, 1", "lat": 52.52, "lng": 13.4},
+    {"id": "b", "title": "Two", "lat": 48.85, "lng": 2.35},
+    {"id": "c", "title": "No coords"},
+]
+
+
+def create(client):
+    payload = {"title": "Trip: Berlin/Paris", "places": PLACES}
+    return client.post("/api/share", json=payload).get_json()["id"]
+
+
+def test_export_gpx_and_kml(client):
+    share_id = create(client)
+    response = client.get(f"/api/share/{share_id}/export.gpx")
+    assert response.status_code == 200
+    assert response.mimetype == "application/gpx+xml"
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    assert "filename*=UTF-8''Trip%20BerlinParis.gpx" in response.headers["Content-Disposition"]
+    root = ET.fromstring(response.data)
+    ns = {"gpx": "http://www.topografix.com/GPX/1/1"}
+    waypoints = root.findall("gpx:wpt", ns)
+    assert [wpt.find("gpx:name", ns).text for wpt in waypoints] == ["Café <One>", "Two"]
+    assert waypoints[0].find("gpx:desc", ns).text == 'Say "hi"\nMain St, 1'
+    assert waypoints[1].find("gpx:desc", ns).text == "48.85000, 2.35000"
+
+    kml = ET.fromstring(client.get(f"/api/share/{share_id}/export.kml").data)
+    coords = [node.text for node in kml.iter("{http://www.opengis.net/kml/2.2}coordinates")]
+    assert coords == ["13.4,52.52,0", "2.35,48.85,0"]
+
+
+def test_export_csv_and_kmz(client):
+    share_id = create(client)
+    response = client.get(f"/api/share/{share_id}/export.csv")
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ["Title", "Note", "Address", "Latitude", "Longitude"]
+    assert rows[1] == ["Café <One>", 'Say "hi"', "Main St, 1", "52.52", "13.4"]
+    assert rows[3] == ["No coords", "", "", "", ""]
+
+    kmz = client.get(f"/api/share/{share_id}/export.kmz")
+    assert kmz.mimetype == "application/vnd.google-earth.kmz"
+    with zipfile.ZipFile(io.BytesIO(kmz.data)) as archive:
+        assert archive.namelist() == ["doc.kml"]
+        kml = archive.read("doc.kml")
+    assert kml == client.get(f"/api/share/{share_id}/export.kml").data
+
+
+def test_export_revalidation_and_ranges(client):
+    share_id = create(client)
+    first = client.get(f"/api/share/{share_id}/export.gpx")
+    body, etag = first.data, first.headers["ETag"]
+    assert client.get(f"/api/share/{share_id}/export.gpx", headers={"If-None-Match": etag}).status_code == 304
+
+    partial = client.get(
+        f"/api/share/{share_id}/export.gpx", headers={"Range": "bytes=10-49", "If-Range": etag}
+    )
+    assert partial.status_code == 206
+    assert partial.data == body[10:50]
+    assert partial.headers["Content-Range"] == f"bytes 10-49/{len(body)}"
+
+    client.put(f"/api/share/{share_id}", json={"title": "Changed", "places": PLACES[:1]})
+    stale = client.get(f"/api/share/{share_id}/export.gpx", headers={"Range": "bytes=10-49", "If-Range": etag})
+    assert stale.status_code == 200
+    assert b"Changed" in stale.data
+
+
+def test_export_requires_password(client):
+    share_id = create(client)
+    client.put(f"/api/share/{share_id}/password", json={"password": "secret"})
+    assert client.get(f"/api/share/{share_id}/export.csv").status_code == 401
+    assert client.get(f"/api/share/{share_id}/export.csv?password=secret").status_code == 200
+    assert client.get(f"/api/share/{share_id}/export.pdf").status_code == 404
+    assert client.get("/api/share/missing/export.csv").status_code == 404
@@ -0,0 +1,280 @@
+import gzip
+import io
+import json
+import math
+import sqlite3
+import time
+import zipfile
+from datetime import datetime, timezone
+
+import pytest
+
+import app as app_module
+
+GPX = b"""<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1">
+  <wpt lat="52.1" lon="13.4"><name>Cafe</name><desc>Good coffee</desc></wpt>
+  <trk><trkseg><trkpt lat="1" lon="1"/></trkseg></trk>
+  <wpt lat="52.2" lon="13.5"><name>Park</name></wpt>
+  <wpt lat="bad" lon="13.5"><name>Broken</name></wpt>
+</gpx>
+"""
+
+KML = b"""<?xml version="1.0"?>
+<kml xmlns="http://www.opengis.net/kml/2.2"><Document><Folder>
+  <Placemark><name>Tower</name><description>View</description>
+    <Point><coordinates>2.29,48.85,0</coordinates></Point></Placemark>
+  <Placemark><name>Route</name><LineString><coordinates>1,1 2,2</coordinates></LineString></Placemark>
+</Folder></Document></kml>
+"""
+
+
+def upload(client, name, content):
+    return client.post(
+        "/api/import",
+        data={"file": (io.BytesIO(content), name)},
+        content_type="multipart/form-data",
+    )
+
+
+def chunked_upload(client, name, content):
+    # A multipart body sent without Content-Length, as a chunked request arrives from the server.
+    body = (
+        b'--b\r\nContent-Disposition: form-data; name="file"; filename="%s"\r\n\r\n' % name.encode()
+        + content
+        + b"\r\n--b--\r\n"
+    )
+    return client.post(
+        "/api/import",
+        input_stream=io.BytesIO(body),
+        headers={"Content-Type": "multipart/form-data; boundary=b", "Transfer-Encoding": "chunked"},
+        environ_overrides={"wsgi.input_terminated": True},
+    )
+
+
+def test_import_gpx(client):
+    response = upload(client, "trip.gpx", GPX)
+    data = response.get_json()
+    assert response.status_code == 200
+    assert data["ok"] is True
+    assert data["list_title"] == "trip"
+    assert data["counts"] == {"places": 2, "routes": 0, "dropped": 1, "merged": 0}
+    assert [place["title"] for place in data["places"]] == ["Cafe", "Park"]
+    assert data["places"][0]["note"] == "Good coffee"
+
+
+def test_import_kmz_reads_point_placemarks_only(client):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("doc.kml", KML)
+    data = upload(client, "paris.kmz", buffer.getvalue()).get_json()
+    assert data["counts"]["places"] == 1
+    assert data["places"][0]["lat"] == 48.85
+    assert data["places"][0]["lng"] == 2.29
+
+
+def test_import_csv(client):
+    content = "﻿Name,Latitude,Longitude,Address\nHome,1.5,2.5,Main st\nNowhere,,\n".encode("utf-8")
+    data = upload(client, "points.csv", content).get_json()
+    assert data["counts"]["places"] == 1
+    assert data["places"][0]["address"] == "Main st"
+
+
+def test_import_validates_rounds_and_merges_duplicates(client):
+    content = (
+        "name,lat,lng\n"
+        "Tower,48.8582601234,2.2944813\n"
+        "tower ,48.858265,2.294485\n"
+        "Tower,48.8590,2.2950\n"
+        "Kiosk,48.85826,2.29448\n"
+        "Pole,91,10\n"
+        "Edge,10,-180.5\n"
+        "Void,nan,1\n"
+    ).encode("utf-8")
+    data = upload(client, "points.csv", content).get_json()
+    assert data["counts"] == {"places": 3, "routes": 0, "dropped": 3, "merged": 1}
+    assert [place["title"] for place in data["places"]] == ["Tower", "Tower", "Kiosk"]
+    assert data["places"][0]["lat"] == 48.85826
+    assert len({place["id"] for place in data["places"]}) == 3
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_import_scan_rounds_ties_and_negative_zero(vectorized, monkeypatch):
+    if not vectorized:
+        monkeypatch.setattr(app_module, "numpy", None)
+    elif app_module.numpy is None:
+        pytest.skip("numpy is not installed")
+    rows = [
+        (0.0000025, -0.0000025, "", "", ""),
+        (0.0000035, -0.0000004, "", "", ""),
+        (52.5000005, 13.4000015, "", "", ""),
+        (-89.9999995, 179.9999995, "", "", ""),
+        (-0.0, -0.0, "", "", ""),
+    ]
+    scanned = [(lat, lng) for _, lat, lng, _ in app_module.scan_coordinates(rows)]
+    assert scanned == [(0.000002, -0.000002), (0.000004, 0.0), (52.5, 13.400002), (-90.0, 180.0), (0.0, 0.0)]
+    assert all(math.copysign(1, value) == 1 for value in scanned[-1] + scanned[1][1:])
+
+
+def test_import_scan_matches_without_numpy(monkeypatch):
+    numpy = pytest.importorskip("numpy")
+    rows = [(lat / 7, lng / 3, "", "", "") for lat in range(-640, 640, 37) for lng in range(-541, 541, 29)]
+    rows += [(None, 1.0, "", "", ""), (float("inf"), 0.0, "", "", "")]
+    vectorized = app_module.scan_coordinates(rows, 5.0)
+    monkeypatch.setattr(app_module, "numpy", None)
+    assert app_module.scan_coordinates(rows, 5.0) == vectorized
+    assert isinstance(vectorized[0][0], int) and len(vectorized) == len(rows) - 2 - 36 * 2
+
+
+def test_import_response_is_compressed_when_accepted(client):
+    points = b"".join(b'<wpt lat="1" lon="%d"><name>Point %d</name></wpt>' % (i, i) for i in range(100))
+    response = client.post(
+        "/api/import",
+        data={"file": (io.BytesIO(b"<gpx>" + points + b"</gpx>"), "many.gpx")},
+        content_type="multipart/form-data",
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert response.headers["Content-Encoding"] == "gzip"
+    data = json.loads(gzip.decompress(response.data))
+    assert data["ok"] is True and data["counts"]["places"] == 100
+
+
+def test_import_rejects_empty_and_malformed_files(client):
+    assert upload(client, "empty.gpx", b"<gpx></gpx>").status_code == 400
+    assert upload(client, "broken.gpx", b"<gpx><wpt").status_code == 400
+
+
+def test_import_reports_errors_after_streaming_started(client):
+    points = b"".join(b'<wpt lat="1" lon="%d"/>' % i for i in range(600))
+    data = upload(client, "truncated.gpx", b"<gpx>" + points + b"<wpt lat=").get_json()
+    assert data["ok"] is False
+    assert "places" in data
+
+
+@pytest.fixture()
+def limited_client(make_app):
+    return make_app(IMPORT_MAX_PLACES=3).test_client()
+
+
+def test_import_point_limit(limited_client):
+    points = b"".join(b'<wpt lat="1" lon="%d"/>' % i for i in range(5))
+    data = upload(limited_client, "many.gpx", b"<gpx>" + points + b"</gpx>").get_json()
+    assert data["ok"] is False
+    assert "too many points" in data["error"]
+
+
+def test_chunked_upload_over_the_limit_is_rejected(make_app):
+    client = make_app(IMPORT_MAX_BYTES=1000).test_client()
+    points = b"".join(b'<wpt lat="1" lon="%d"/>' % i for i in range(100))
+    response = chunked_upload(client, "huge.gpx", b"<gpx>" + points + b"</gpx>")
+    assert response.status_code == 413
+    assert response.get_json() == {"ok": False, "error": "This file is too large to import."}
+    assert chunked_upload(client, "trip.gpx", GPX).get_json()["ok"] is True
+
+
+@pytest.fixture()
+def async_client(make_app):
+    return make_app(IMPORT_ASYNC_BYTES=100, IMPORT_WORKERS=1).test_client()
+
+
+def wait_for_job(client, status_url):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        data = client.get(status_url).get_json()
+        if data["state"] not in ("queued", "running"):
+            return data
+        time.sleep(0.05)
+    raise AssertionError("import job did not finish")
+
+
+def test_large_import_runs_as_job(async_client):
+    response = upload(async_client, "trip.gpx", GPX)
+    assert response.status_code == 202
+    job = response.get_json()
+    assert job["state"] == "queued"
+
+    data = wait_for_job(async_client, job["statusUrl"])
+    assert data["ok"] is True
+    assert data["state"] == "done"
+    assert data["list_title"] == "trip"
+    assert data["counts"] == {"places": 2, "routes": 0, "dropped": 1, "merged": 0}
+    assert [place["title"] for place in data["places"]] == ["Cafe", "Park"]
+
+    compressed = async_client.get(job["statusUrl"], headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(compressed.data)) == data
+
+
+def test_chunked_large_import_runs_as_job(async_client):
+    response = chunked_upload(async_client, "trip.gpx", GPX)
+    assert response.status_code == 202
+    data = wait_for_job(async_client, response.get_json()["statusUrl"])
+    assert data["state"] == "done"
+    assert data["counts"]["places"] == 2
+
+
+def test_import_jobs_are_limited(make_app, tmp_path):
+    app = make_app(IMPORT_ASYNC_BYTES=100, IMPORT_WORKERS=1, IMPORT_MAX_JOBS=1)
+    client = app.test_client()
+    now = datetime.now(timezone.utc).isoformat()
+    with app.extensions["db_pool"].connection() as conn:
+        conn.execute(
+            "INSERT INTO import_jobs (id, state, filename, total_bytes, created_at, updated_at) "
+            "VALUES ('busy', 'running', 'busy.gpx', 0, ?, ?)",
+            (now, now),
+        )
+        conn.commit()
+    assert upload(client, "trip.gpx", GPX).status_code == 429
+    assert not list((tmp_path / "import_jobs").glob("*.upload"))
+
+    with app.extensions["db_pool"].connection() as conn:
+        conn.execute("UPDATE import_jobs SET state = 'failed' WHERE id = 'busy'")
+        conn.commit()
+    job = upload(client, "trip.gpx", GPX).get_json()
+    with app.extensions["db_pool"].connection() as conn:
+        row = conn.execute("SELECT total_bytes FROM import_jobs WHERE id = ?", (job["job_id"],)).fetchone()
+    assert row["total_bytes"] == len(GPX)
+    wait_for_job(client, job["statusUrl"])
+
+
+def test_missing_job_result_is_gone(async_client, tmp_path):
+    job = upload(async_client, "trip.gpx", GPX).get_json()
+    wait_for_job(async_client, job["statusUrl"])
+    (tmp_path / "import_jobs" / f"{job['job_id']}.json.gz").unlink()
+    for headers in ({}, {"Accept-Encoding": "gzip"}):
+        response = async_client.get(job["statusUrl"], headers=headers)
+        assert response.status_code == 410
+        assert response.get_json()["ok"] is False
+
+
+def test_import_job_reports_failures(async_client):
+    job = upload(async_client, "broken.gpx", GPX[:-20]).get_json()
+    data = wait_for_job(async_client, job["statusUrl"])
+    assert data["state"] == "failed"
+    assert data["ok"] is False
+    assert data["error"]
+
+
+def test_import_job_can_be_cancelled(async_client):
+    job = upload(async_client, "trip.gpx", GPX).get_json()
+    assert async_client.delete(job["statusUrl"]).status_code == 200
+    data = wait_for_job(async_client, job["statusUrl"])
+    assert data["state"] in ("cancelled", "done")
+    assert async_client.get("/api/import/missing").status_code == 404
+
+
+def test_import_job_fails_on_unexpected_errors(async_client, tmp_path):
+    db_path = str(tmp_path / "test.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            """
+            INSERT INTO import_jobs (id, state, filename, total_bytes, created_at, updated_at)
+            VALUES ('lost', 'queued', 'lost.gpx', 1, '2024-01-01', '2024-01-01')
+            """
+        )
+    # The upload is missing, so opening it raises OSError, which is not a parse error.
+    with pytest.raises(OSError):
+        app_module.run_import_job(db_path, str(tmp_path / "jobs"), "lost", ".gpx", "Lost", 10, 0)
+    data = async_client.get("/api/import/lost").get_json()
+    assert data["state"] == "failed"
+    assert data["error"]
@@ -0,0 +1,94 @@
+import json
+import sqlite3
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+import app as app_module
+from app import dumps_json, loads_json
+
+
+@pytest.fixture(params=["orjson", "json"])
+def codec(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(app_module, "orjson", None)
+    elif app_module.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+def test_codec_round_trips_what_the_json_module_accepts(codec):
+    value = {"title": "Café ✓", "places": [{"lat": 52.52, "lng": -0.0001, "n": 2**70}], "nan": float("nan")}
+    assert loads_json(dumps_json(value))["places"][0]["n"] == 2**70
+    assert loads_json(b'{"a": NaN, "b": [1, 2.5, "x"]}')["b"] == [1, 2.5, "x"]
+    with pytest.raises(ValueError):
+        loads_json("{broken")
+
+
+def test_provider_matches_the_default_provider(codec, app):
+    value = {"b": date(2024, 1, 2), "a": Decimal("1.5"), "c": ["ü", None, True]}
+    expected = {"a": "1.5", "b": "Tue, 02 Jan 2024 00:00:00 GMT", "c": ["ü", None, True]}
+    assert json.loads(app.json.dumps(value)) == expected
+    with app.test_request_context():
+        body = app.json.response(value).get_data()
+    assert body.endswith(b"\n") and list(json.loads(body)) == ["a", "b", "c"]
+    assert app.json.loads(b'{"x": 1}') == {"x": 1}
+    with app.test_request_context():
+        assert json.loads(app.json.response(1, "a").get_data()) == [1, "a"]
+        assert json.loads(app.json.response(a=1).get_data()) == {"a": 1}
+        assert json.loads(app.json.response().get_data()) is None
+        with pytest.raises(TypeError):
+            app.json.response(1, a=1)
+
+
+def test_share_document_is_served_without_reencoding(codec, client):
+    places = [{"id": f"p{index}", "title": f"Place {index}", "lat": 1.5, "lng": index} for index in range(50)]
+    share_id = client.post("/api/share", json={"title": "Trip", "places": places}).get_json()["id"]
+    data = client.get(f"/api/share/{share_id}").get_json()
+    assert data["title"] == "Trip" and data["places"] == places
+    assert (data["id"], data["revision"]) == (share_id, 1)
+
+
+def test_unusual_stored_documents_are_normalised(make_app, tmp_path):
+    db_path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE shares ("
+        "id TEXT PRIMARY KEY, data TEXT NOT NULL, created_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+    )
+    data = json.dumps({"places": [{"id": "a"}], "title": ""})
+    conn.execute("INSERT INTO shares VALUES ('legacy', ?, '2024-01-01', '2024-01-01')", (data,))
+    conn.commit()
+    conn.close()
+
+    data = make_app(DB_PATH=db_path).test_client().get("/api/share/legacy").get_json()
+    assert data["title"] == "My map" and data["places"] == [{"id": "a"}]
+
+
+def test_place_schema_is_validated(client):
+    places = [{"id": "a", "photos": ["x"], "createdAt": 1}]
+    share_id = client.post("/api/share", json={"places": places}).get_json()["id"]
+    for invalid in ([{"id": "a", "lat": "52.5"}], [{"lat": True}], ["a"], {"id": "a"}):
+        response = client.put(f"/api/share/{share_id}", json={"places": invalid})
+        assert response.status_code == 400
+        assert response.get_json()["error"] == "invalid_places"
+    assert client.post("/api/share", json={"places": [{"title": 5}]}).get_json()["detail"] == (
+        "places[0].title has the wrong type"
+    )
+    patch = client.patch(
+        f"/api/share/{share_id}", json={"revision": 1, "ops": [{"op": "add", "place": {"id": "b", "lng": []}}]}
+    )
+    assert patch.get_json()["error"] == "invalid_places"
+    batch = client.post("/api/shares/batch", json={"items": [{"id": share_id, "places": [{"note": 1}]}]})
+    assert batch.get_json()["results"][0]["error"] == "invalid_places"
+    assert client.get(f"/api/share/{share_id}").get_json()["places"] == places
+
+
+def test_non_finite_numbers_are_rejected(codec, client):
+    for place in ({"id": "a", "lat": float("nan")}, {"id": "a", "extra": {"values": [float("inf")]}}):
+        response = client.post(
+            "/api/share", data=json.dumps({"places": [place]}), content_type="application/json"
+        )
+        assert response.status_code == 400
+        assert response.get_json()["detail"] == "places[0] contains NaN or Infinity"
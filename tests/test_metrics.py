@@ -0,0 +1,51 @@
+import io
+
+import pytest
+
+from app import MetricsRegistry
+
+
+@pytest.fixture()
+def admin_client(make_app):
+    return make_app(ADMIN_TOKEN="admin-secret").test_client()
+
+
+def test_histogram_rendering():
+    metrics = MetricsRegistry()
+    metrics.histogram("job_seconds", "Job time.", buckets=(0.1, 1.0))
+    metrics.observe("job_seconds", 0.05, kind='a"b')
+    metrics.observe("job_seconds", 0.5, kind='a"b')
+    metrics.observe("job_seconds", 5, kind='a"b')
+    text = metrics.render()
+    assert "# TYPE job_seconds histogram" in text
+    assert 'job_seconds_bucket{kind="a\\"b",le="0.1"} 1' in text
+    assert 'job_seconds_bucket{kind="a\\"b",le="1.0"} 2' in text
+    assert 'job_seconds_bucket{kind="a\\"b",le="+Inf"} 3' in text
+    assert 'job_seconds_count{kind="a\\"b"} 3' in text
+    assert 'job_seconds_sum{kind="a\\"b"} 5.55' in text
+
+
+def test_metrics_endpoint_reports_hot_paths(admin_client):
+    assert admin_client.get("/admin/metrics").status_code == 404
+
+    share_id = admin_client.post("/api/share", json={"title": "M", "places": [{"id": "a"}]}).get_json()["id"]
+    admin_client.put(f"/api/share/{share_id}/password", json={"password": "pw"})
+    admin_client.get(f"/api/share/{share_id}?password=pw")
+    admin_client.post(
+        "/api/import",
+        data={"file": (io.BytesIO(b'<gpx><wpt lat="1" lon="2"/></gpx>'), "a.gpx")},
+        content_type="multipart/form-data",
+    ).get_data()
+
+    response = admin_client.get("/admin/metrics", headers={"X-Admin-Token": "admin-secret"})
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    text = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{endpoint="get_share",method="GET",status="200"} 1' in text
+    assert 'sqlite_span_seconds_count{endpoint="create_share"} 1' in text
+    assert "sqlite_write_lock_wait_seconds_count 1" in text
+    assert "share_decode_seconds_count 1" in text
+    assert "password_hash_seconds_count 2" in text
+    assert 'import_parse_seconds_count{format="gpx"} 1' in text
+    assert "share_payload_bytes_count 1" in text
+    assert "share_cache_misses_total 1" in text
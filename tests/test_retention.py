@@ -0,0 +1,82 @@
+import pytest
+
+
+@pytest.fixture()
+def retention_app(make_app):
+    return make_app(SHARE_IDLE_TTL=3600, MAINTENANCE_INTERVAL=0)
+
+
+def execute(app, sql, params=()):
+    with app.extensions["db_pool"].connection() as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def test_expired_shares_are_purged(retention_app):
+    client = retention_app.test_client()
+    created = client.post("/api/share", json={"title": "Brief", "places": [{"id": "a"}], "expiresIn": 60}).get_json()
+    assert created["expiresAt"]
+    kept = client.post("/api/share", json={"title": "Kept", "places": []}).get_json()
+    assert kept["expiresAt"] is None
+    execute(retention_app, "UPDATE shares SET expires_at = '2000-01-01T00:00:00+00:00' WHERE id = ?", (created["id"],))
+
+    report = retention_app.extensions["maintenance"]()
+    assert report["expiredShares"] == 1
+    assert report["blobsCollected"] == 1
+    assert report["reclaimedBytes"] >= 0
+    assert client.get(f"/api/share/{created['id']}").status_code == 404
+    assert client.get(f"/api/share/{kept['id']}").status_code == 200
+    assert execute(retention_app, "SELECT COUNT(*) FROM places")[0][0] == 0
+
+    assert client.post("/api/share", json={"places": [], "expiresIn": -5}).status_code == 400
+
+
+def test_idle_shares_are_purged_using_batched_access_times(retention_app):
+    client = retention_app.test_client()
+    stale = client.post("/api/share", json={"title": "Stale", "places": []}).get_json()["id"]
+    active = client.post("/api/share", json={"title": "Active", "places": []}).get_json()["id"]
+    old = "2000-01-01T00:00:00+00:00"
+    execute(retention_app, "UPDATE shares SET last_accessed = ?", (old,))
+
+    client.get(f"/api/share/{active}")
+    # The read is only buffered; the column is written when the buffer flushes.
+    assert execute(retention_app, "SELECT last_accessed FROM shares WHERE id = ?", (active,))[0][0] == old
+
+    report = retention_app.extensions["maintenance"]()
+    assert report["idleShares"] == 1
+    assert client.get(f"/api/share/{stale}").status_code == 404
+    assert client.get(f"/api/share/{active}").status_code == 200
+
+
+def test_new_databases_use_incremental_vacuum(retention_app):
+    assert execute(retention_app, "PRAGMA auto_vacuum")[0][0] == 2
+
+
+def test_expired_shares_are_gone_before_maintenance_runs(retention_app):
+    client = retention_app.test_client()
+    payload = {"title": "Brief", "places": [{"id": "a"}], "expiresIn": 60}
+    share_id = client.post("/api/share", json=payload).get_json()["id"]
+    assert client.get(f"/api/share/{share_id}").status_code == 200
+    execute(retention_app, "UPDATE shares SET expires_at = '2000-01-01T00:00:00+00:00' WHERE id = ?", (share_id,))
+
+    for path in ["", "/meta", "/places", "/search?q=a", "/clusters?z=0", "/export.csv", "/events", "/password"]:
+        assert client.get(f"/api/share/{share_id}{path}").status_code == 404, path
+    assert client.put(f"/api/share/{share_id}", json={"title": "T", "places": []}).status_code == 404
+    assert client.patch(f"/api/share/{share_id}", json={"revision": 1, "ops": []}).status_code == 404
+    assert client.put(f"/api/share/{share_id}/password", json={"password": "pw"}).status_code == 404
+    assert client.delete(f"/api/share/{share_id}/password").status_code == 404
+    batch = client.post("/api/shares/batch", json={"items": [{"id": share_id, "places": []}]}).get_json()
+    assert batch["results"][0]["status"] == 404
+    fetched = client.post("/api/shares/fetch", json={"shares": [share_id]}).get_json()
+    assert fetched["results"][0]["status"] == 404
+    assert execute(retention_app, "SELECT COUNT(*) FROM shares")[0][0] == 1
+
+
+def test_scheduled_maintenance_runs_in_one_worker_at_a_time(make_app):
+    first, second = make_app(MAINTENANCE_INTERVAL=3600), make_app(MAINTENANCE_INTERVAL=3600)
+    assert first.extensions["scheduled_maintenance"]() is not None
+    assert second.extensions["scheduled_maintenance"]() is None
+    assert first.extensions["scheduled_maintenance"]() is not None
+
+    execute(first, "UPDATE task_leases SET expires_at = '2000-01-01T00:00:00+00:00'")
+    assert second.extensions["scheduled_maintenance"]() is not None
+    assert first.extensions["scheduled_maintenance"]() is None
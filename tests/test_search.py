@@ -0,0 +1,97 @@
+import sqlite3
+
+import app as app_module
+
+PLACES = [
+    {"id": "cafe", "title": "Café Einstein", "note": "Kaffee und Kuchen", "lat": 52.5065, "lng": 13.3612},
+    {"id": "museum", "title": "Museum Island", "note": "Near a café", "lat": 52.5169, "lng": 13.4019},
+    {"id": "gate", "title": "Brandenburg Gate", "address": "Pariser Platz", "lat": 52.5163, "lng": 13.3777},
+    {"id": "potsdam", "title": "Sanssouci", "address": "Potsdam", "lat": 52.4045, "lng": 13.0384},
+    {"id": "paris", "title": "Café de Flore", "lat": 48.8541, "lng": 2.3326},
+    {"id": "draft", "title": "Café idea"},
+]
+
+
+def create(client, places=PLACES):
+    return client.post("/api/share", json={"title": "Trip", "places": places}).get_json()["id"]
+
+
+def search(client, share_id, query):
+    response = client.get(f"/api/share/{share_id}/search?{query}")
+    assert response.status_code == 200
+    return response.get_json()["results"]
+
+
+def ids(results):
+    return [result["place"]["id"] for result in results]
+
+
+def test_text_search_ranks_titles_first(client):
+    share_id = create(client)
+    other = create(client, [{"id": "elsewhere", "title": "Cafe Elsewhere"}])
+    results = search(client, share_id, "q=cafe")
+    assert set(ids(results)[:3]) == {"cafe", "paris", "draft"}
+    assert ids(results)[3] == "museum"
+    assert ids(search(client, share_id, "q=bran+gat")) == ["gate"]
+    assert ids(search(client, share_id, "q=pariser")) == ["gate"]
+    assert ids(search(client, other, "q=cafe")) == ["elsewhere"]
+    assert search(client, share_id, "q=%22%29+OR+*") == []
+
+
+def test_search_near_orders_by_distance(client):
+    share_id = create(client)
+    results = search(client, share_id, "near=52.5163,13.3777&radius=3000")
+    assert ids(results) == ["gate", "cafe", "museum"]
+    assert results[0]["distance"] == 0 and 1000 < results[1]["distance"] < 3000
+
+    assert ids(search(client, share_id, "q=cafe&near=48.85,2.33&radius=5000")) == ["paris"]
+    # Without a radius the search widens until it has enough places.
+    assert ids(search(client, share_id, "q=cafe&near=48.85,2.33&limit=2")) == ["paris", "cafe"]
+
+
+def test_search_index_follows_updates(client):
+    share_id = create(client)
+    places = PLACES[1:] + [{"id": "new", "title": "Tea room"}]
+    client.put(f"/api/share/{share_id}", json={"title": "Trip", "places": places})
+    assert "cafe" not in ids(search(client, share_id, "q=einstein"))
+    assert ids(search(client, share_id, "q=tea")) == ["new"]
+    assert search(client, share_id, "q=tea")[0]["position"] == len(PLACES) - 1
+
+
+def test_search_validation_and_password(client):
+    share_id = create(client)
+    assert client.get(f"/api/share/{share_id}/search").status_code == 400
+    assert client.get(f"/api/share/{share_id}/search?near=95,0").status_code == 400
+    assert client.get(f"/api/share/{share_id}/search?q=x&radius=10").status_code == 400
+    assert client.get("/api/share/missing/search?q=x").status_code == 404
+    client.put(f"/api/share/{share_id}/password", json={"password": "secret"})
+    assert client.get(f"/api/share/{share_id}/search?q=cafe").status_code == 401
+    response = client.get(f"/api/share/{share_id}/search?q=cafe", headers={"X-Share-Password": "secret"})
+    assert response.status_code == 200
+    revalidated = client.get(
+        f"/api/share/{share_id}/search?q=cafe",
+        headers={"X-Share-Password": "secret", "If-None-Match": response.headers["ETag"]},
+    )
+    assert revalidated.status_code == 304
+
+
+def test_search_without_fts5(make_app, monkeypatch):
+    monkeypatch.setattr(app_module, "SQLITE_HAS_FTS5", False)
+    client = make_app().test_client()
+    share_id = create(client)
+    assert ids(search(client, share_id, "q=einstein")) == ["cafe"]
+    assert ids(search(client, share_id, "q=museum&near=52.5,13.4&radius=5000")) == ["museum"]
+
+
+def test_search_index_is_built_for_existing_places(make_app, tmp_path, monkeypatch):
+    db_path = tmp_path / "legacy.db"
+    monkeypatch.setattr(app_module, "SQLITE_HAS_FTS5", False)
+    app = make_app(DB_PATH=db_path)
+    share_id = create(app.test_client())
+    app.extensions["shutdown"]()
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'places_fts'").fetchone() is None
+
+    monkeypatch.setattr(app_module, "SQLITE_HAS_FTS5", True)
+    app = make_app(DB_PATH=db_path)
+    assert ids(search(app.test_client(), share_id, "q=sanssouci")) == ["potsdam"]
@@ -1,15 +1,5 @@
-import pytest
-
-from app import create_app
-
-
-@pytest.fixture()
-def client(tmp_path, monkeypatch):
-    db_path = tmp_path / "test.db"
-    monkeypatch.setenv("DB_PATH", str(db_path))
-    app = create_app()
-    app.config.update(TESTING=True)
-    return app.test_client()
+import json
+import sqlite3
 
 
 def test_share_updates_and_meta(client):
@@ -63,3 +53,96 @@ def test_share_cache_headers(client):
     response = client.get(f"/api/share/{share_id}")
     cache_control = response.headers.get("Cache-Control", "")
     assert "no-store" in cache_control
+
+
+def test_share_conditional_get(client):
+    create_resp = client.post(
+        "/api/share",
+        json={"title": "My map", "places": [{"id": "p1", "title": "A", "lat": 1, "lng": 2}]},
+    )
+    share_id = create_resp.get_json()["id"]
+
+    for path in (f"/api/share/{share_id}", f"/api/share/{share_id}/meta"):
+        first = client.get(path)
+        etag = first.headers.get("ETag")
+        assert etag
+        cached = client.get(path, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.headers.get("ETag") == etag
+        assert cached.data == b""
+
+    meta_etag = client.get(f"/api/share/{share_id}/meta").headers["ETag"]
+    client.put(f"/api/share/{share_id}", json={"title": "My map", "places": []})
+    fresh = client.get(f"/api/share/{share_id}/meta", headers={"If-None-Match": meta_etag})
+    assert fresh.status_code == 200
+    assert fresh.get_json()["placesCount"] == 0
+    assert fresh.headers["ETag"] != meta_etag
+
+
+def test_share_meta_columns_and_backfill(make_app, tmp_path):
+    db_path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE shares (id TEXT PRIMARY KEY, data TEXT NOT NULL, created_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+    )
+    data = json.dumps({"title": "Old", "places": [{"id": "a"}, {"id": "b"}, {"id": "c"}]})
+    conn.execute("INSERT INTO shares VALUES ('legacy', ?, '2024-01-01', '2024-01-01')", (data,))
+    conn.commit()
+    conn.close()
+
+    app = make_app(DB_PATH=db_path)
+    client = app.test_client()
+    meta = client.get("/api/share/legacy/meta").get_json()
+    assert meta["placesCount"] == 3
+    assert meta["revision"] == 1
+
+    update = client.put("/api/share/legacy", json={"title": "New", "places": [{"id": "a"}]}).get_json()
+    assert update["revision"] == 2
+    with app.extensions["db_pool"].connection() as conn:
+        row = conn.execute(
+            "SELECT title, places_count, payload_bytes, revision FROM shares WHERE id = 'legacy'"
+        ).fetchone()
+    assert (row["title"], row["places_count"], row["revision"]) == ("New", 1, 2)
+    assert row["payload_bytes"] > 0
+
+
+def test_share_patch_operations(client):
+    places = [{"id": "p1", "title": "A"}, {"id": "p2", "title": "B"}, {"id": "p3", "title": "C"}]
+    share_id = client.post("/api/share", json={"title": "My map", "places": places}).get_json()["id"]
+
+    response = client.patch(
+        f"/api/share/{share_id}",
+        json={
+            "revision": 1,
+            "title": "Renamed",
+            "ops": [
+                {"op": "remove", "id": "p2"},
+                {"op": "update", "id": "p1", "fields": {"note": "hi"}},
+                {"op": "add", "place": {"id": "p4", "title": "D"}, "index": 0},
+                {"op": "reorder", "order": ["p3", "p4", "p1"]},
+            ],
+        },
+    )
+    assert response.status_code == 200
+    assert response.get_json()["revision"] == 2
+
+    data = client.get(f"/api/share/{share_id}").get_json()
+    assert data["title"] == "Renamed"
+    assert [place["id"] for place in data["places"]] == ["p3", "p4", "p1"]
+    assert data["places"][2] == {"id": "p1", "title": "A", "note": "hi"}
+    assert client.get(f"/api/share/{share_id}/meta").get_json()["placesCount"] == 3
+
+
+def test_share_patch_conflicts(client):
+    share_id = client.post("/api/share", json={"title": "T", "places": [{"id": "p1"}]}).get_json()["id"]
+
+    stale = client.patch(f"/api/share/{share_id}", json={"revision": 7, "ops": []})
+    assert stale.status_code == 409
+    assert stale.get_json() == {"error": "revision_conflict", "revision": 1}
+
+    missing = client.patch(f"/api/share/{share_id}", json={"revision": 1, "ops": [{"op": "update", "id": "nope", "fields": {}}]})
+    assert missing.status_code == 409
+
+    invalid = client.patch(f"/api/share/{share_id}", json={"revision": 1, "ops": [{"op": "explode"}]})
+    assert invalid.status_code == 400
+    assert client.patch(f"/api/share/{share_id}", json={"ops": []}).status_code == 400
@@ -0,0 +1,82 @@
+import gzip
+import json
+
+PLACES = [{"id": f"p{i}", "title": f"Place {i}", "note": "n" * 40, "lat": 50 + i / 100, "lng": 10.0} for i in range(40)]
+
+
+def create(client):
+    return client.post("/api/share", json={"title": "Hot", "places": PLACES}).get_json()["id"]
+
+
+def test_repeated_reads_are_served_from_cache(app, client, monkeypatch):
+    share_id = create(client)
+    cache = app.extensions["share_cache"]
+    first = client.get(f"/api/share/{share_id}")
+    assert first.get_json()["places"] == PLACES
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cached share was decoded again")
+
+    monkeypatch.setattr(json, "loads", fail)
+    second = client.get(f"/api/share/{share_id}")
+    monkeypatch.undo()
+    assert second.data == first.data
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_gzip_variant_is_negotiated(client):
+    share_id = create(client)
+    plain = client.get(f"/api/share/{share_id}")
+    compressed = client.get(f"/api/share/{share_id}", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    assert gzip.decompress(compressed.data) == plain.data
+    assert len(compressed.data) < len(plain.data)
+
+
+def test_updates_and_password_changes_invalidate(app, client):
+    share_id = create(client)
+    cache = app.extensions["share_cache"]
+    client.get(f"/api/share/{share_id}")
+    client.put(f"/api/share/{share_id}", json={"title": "Renamed", "places": PLACES[:2]})
+    assert cache.stats()["entries"] == 0
+    assert client.get(f"/api/share/{share_id}").get_json()["title"] == "Renamed"
+
+    client.put(f"/api/share/{share_id}/password", json={"password": "secret"})
+    assert cache.stats()["entries"] == 0
+    assert client.get(f"/api/share/{share_id}").status_code == 401
+
+
+def test_cache_is_bounded(app, client):
+    cache = app.extensions["share_cache"]
+    cache.max_entries = 2
+    for _ in range(3):
+        client.get(f"/api/share/{create(client)}")
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1
+
+
+def test_cache_stats_require_admin(client):
+    assert client.get("/admin/cache").status_code == 404
+
+
+def test_write_between_reads_is_tagged_with_the_newer_revision(app, client, monkeypatch):
+    share_id = create(client)
+    cache = app.extensions["share_cache"]
+    lookup = cache.get
+    written = {}
+
+    def get_during_write(key, revision):
+        monkeypatch.setattr(cache, "get", lookup)
+        update = client.put(f"/api/share/{share_id}", json={"title": "Renamed", "places": PLACES[::-1]})
+        written.update(update.get_json())
+        return lookup(key, revision)
+
+    monkeypatch.setattr(cache, "get", get_during_write)
+    response = client.get(f"/api/share/{share_id}", headers={"Accept-Encoding": "gzip"})
+    body = json.loads(gzip.decompress(response.data))
+    revision = written["revision"]
+    assert body["title"] == "Renamed" and body["revision"] == revision
+    assert response.headers["ETag"] == f'"r{revision}-gzip"'
+    assert cache.get(share_id, revision - 1) is None
+    assert cache.get(share_id, revision)["gzip"] == response.data
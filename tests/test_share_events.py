@@ -0,0 +1,76 @@
+import json
+import time
+
+import pytest
+
+
+def read_event(chunks):
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk.decode("utf-8")
+        if buffer.startswith("event: update") and buffer.endswith("\n\n"):
+            return json.loads(buffer.split("data: ", 1)[1])
+        if buffer.endswith("\n\n") or buffer.startswith("retry"):
+            buffer = ""
+    raise AssertionError("stream ended without an update event")
+
+
+def test_event_stream_pushes_updates(client):
+    share_id = client.post("/api/share", json={"title": "T", "places": []}).get_json()["id"]
+
+    response = client.get(f"/api/share/{share_id}/events", buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    chunks = response.response
+    initial = read_event(chunks)
+    assert initial["id"] == share_id
+
+    update = client.put(f"/api/share/{share_id}", json={"title": "T", "places": [{"id": "p1"}]})
+    pushed = read_event(chunks)
+    assert pushed["updatedAt"] == update.get_json()["updatedAt"]
+    response.close()
+
+
+def test_event_stream_requires_existing_share(client):
+    assert client.get("/api/share/missing/events").status_code == 404
+
+
+@pytest.fixture()
+def sqlite_apps(make_app):
+    return [make_app(SHARE_EVENTS_BACKEND="sqlite") for _ in range(2)]
+
+
+def test_sqlite_backend_fans_out_across_workers(sqlite_apps):
+    writer, reader = sqlite_apps
+    client = writer.test_client()
+    share_id = client.post("/api/share", json={"title": "T", "places": []}).get_json()["id"]
+
+    with reader.extensions["share_events"].listen(share_id) as subscriber:
+        time.sleep(0.1)
+        updated = client.put(f"/api/share/{share_id}", json={"title": "T", "places": []}).get_json()
+        event = subscriber.get(timeout=5)
+    assert event == {"id": share_id, "updatedAt": updated["updatedAt"], "revision": updated["revision"]}
+
+
+def test_event_streams_are_capped_per_worker(make_app):
+    client = make_app(SHARE_EVENTS_MAX_STREAMS=3).test_client()
+    share_id = client.post("/api/share", json={"title": "T", "places": []}).get_json()["id"]
+    attempts = [client.get(f"/api/share/{share_id}/events", buffered=False) for _ in range(5)]
+    assert [response.status_code for response in attempts] == [200, 200, 200, 503, 503]
+    streams, refused = attempts[:3], attempts[3:]
+    assert refused[0].get_json() == {"error": "too_many_streams"}
+    assert refused[0].headers["Retry-After"] == "30"
+    assert client.get("/api/health").status_code == 200
+
+    # The streams that got a slot still deliver every change.
+    for stream in streams:
+        read_event(stream.response)
+    update = client.put(f"/api/share/{share_id}", json={"title": "T", "places": [{"id": "p1"}]}).get_json()
+    for stream in streams:
+        assert read_event(stream.response)["revision"] == update["revision"]
+
+    streams[2].close()
+    reopened = client.get(f"/api/share/{share_id}/events", buffered=False)
+    assert reopened.status_code == 200
+    for stream in [reopened, streams[1], streams[0]]:
+        stream.close()
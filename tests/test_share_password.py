@@ -0,0 +1,74 @@
+import hashlib
+
+import pytest
+
+
+@pytest.fixture()
+def pbkdf2_calls(monkeypatch):
+    calls = []
+    original = hashlib.pbkdf2_hmac
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(hashlib, "pbkdf2_hmac", counting)
+    return calls
+
+
+def create_protected_share(client, password="hunter2"):
+    share_id = client.post("/api/share", json={"title": "T", "places": []}).get_json()["id"]
+    assert client.put(f"/api/share/{share_id}/password", json={"password": password}).status_code == 200
+    return share_id
+
+
+def test_verified_password_is_cached(client, pbkdf2_calls):
+    share_id = create_protected_share(client)
+    pbkdf2_calls.clear()
+    headers = {"X-Share-Password": "hunter2"}
+
+    for path in (f"/api/share/{share_id}", f"/api/share/{share_id}/meta", f"/api/share/{share_id}/meta"):
+        assert client.get(path, headers=headers).status_code == 200
+    assert len(pbkdf2_calls) == 1
+
+    assert client.get(f"/api/share/{share_id}/meta", headers={"X-Share-Password": "wrong"}).status_code == 401
+
+
+def test_access_token_replaces_password(client, pbkdf2_calls):
+    share_id = create_protected_share(client)
+    response = client.get(f"/api/share/{share_id}", headers={"X-Share-Password": "hunter2"})
+    token = response.headers["X-Share-Token"]
+    pbkdf2_calls.clear()
+
+    assert client.get(f"/api/share/{share_id}/meta", headers={"X-Share-Token": token}).status_code == 200
+    assert client.get(f"/api/share/{share_id}/meta?share_token={token}").status_code == 200
+    assert not pbkdf2_calls
+    assert client.get(f"/api/share/{share_id}/meta", headers={"X-Share-Token": "1." + token}).status_code == 401
+
+
+def test_password_change_revokes_cache_and_tokens(client):
+    share_id = create_protected_share(client)
+    response = client.get(f"/api/share/{share_id}", headers={"X-Share-Password": "hunter2"})
+    token = response.headers["X-Share-Token"]
+
+    client.put(f"/api/share/{share_id}/password", json={"password": "changed"})
+    assert client.get(f"/api/share/{share_id}", headers={"X-Share-Password": "hunter2"}).status_code == 401
+    assert client.get(f"/api/share/{share_id}", headers={"X-Share-Token": token}).status_code == 401
+    assert client.get(f"/api/share/{share_id}", headers={"X-Share-Password": "changed"}).status_code == 200
+
+
+def test_update_of_share_deleted_during_password_check(app, client, monkeypatch):
+    share_id = create_protected_share(client)
+    original = hashlib.pbkdf2_hmac
+
+    def purge_then_hash(*args, **kwargs):
+        # The background purge deletes the share while PBKDF2 runs, before the write lock is taken.
+        with app.extensions["db_pool"].connection() as conn:
+            conn.execute("DELETE FROM shares WHERE id = ?", (share_id,))
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(hashlib, "pbkdf2_hmac", purge_then_hash)
+    response = client.put(
+        f"/api/share/{share_id}", json={"title": "T", "places": []}, headers={"X-Share-Password": "hunter2"}
+    )
+    assert response.status_code == 404
@@ -0,0 +1,189 @@
+import json
+import sqlite3
+import time
+
+import pytest
+
+import app as app_module
+
+PLACES = [
+    {"id": "berlin", "title": "Berlin", "lat": 52.52, "lng": 13.40},
+    {"id": "paris", "title": "Paris", "lat": 48.85, "lng": 2.35},
+    {"id": "potsdam", "title": "Potsdam", "lat": 52.39, "lng": 13.06},
+    {"id": "fiji", "title": "Fiji", "lat": -17.7, "lng": 178.0},
+    {"id": "samoa", "title": "Samoa", "lat": -13.8, "lng": -172.1},
+    {"id": "nowhere", "title": "No coords"},
+]
+
+
+def create(client, places=PLACES):
+    return client.post("/api/share", json={"title": "Trip", "places": places}).get_json()["id"]
+
+
+def ids(response):
+    return [place["id"] for place in response.get_json()["places"]]
+
+
+def test_places_bbox_query(client):
+    share_id = create(client)
+    response = client.get(f"/api/share/{share_id}/places?bbox=12,51,14,53")
+    assert response.status_code == 200
+    assert ids(response) == ["berlin", "potsdam"]
+
+    across_antimeridian = client.get(f"/api/share/{share_id}/places?bbox=170,-20,-170,-10")
+    assert ids(across_antimeridian) == ["fiji", "samoa"]
+
+    assert client.get(f"/api/share/{share_id}/places?bbox=1,2,3").status_code == 400
+    assert client.get("/api/share/missing/places").status_code == 404
+
+
+def test_places_cursor_pagination(client):
+    share_id = create(client)
+    first = client.get(f"/api/share/{share_id}/places?limit=4").get_json()
+    assert [place["id"] for place in first["places"]] == ["berlin", "paris", "potsdam", "fiji"]
+    second = client.get(f"/api/share/{share_id}/places?limit=4&cursor={first['nextCursor']}").get_json()
+    assert [place["id"] for place in second["places"]] == ["samoa", "nowhere"]
+    assert second["nextCursor"] is None
+
+    client.patch(f"/api/share/{share_id}", json={"revision": 1, "ops": [{"op": "remove", "id": "paris"}]})
+    stale = client.get(f"/api/share/{share_id}/places?limit=4&cursor={first['nextCursor']}")
+    assert stale.status_code == 409
+
+
+def test_places_follow_updates(client):
+    share_id = create(client)
+    moved = [dict(place) for place in PLACES if place["id"] != "potsdam"]
+    moved[0]["lat"], moved[0]["lng"] = 48.86, 2.34
+    client.put(f"/api/share/{share_id}", json={"title": "Trip", "places": moved})
+    assert ids(client.get(f"/api/share/{share_id}/places?bbox=12,51,14,53")) == []
+    assert ids(client.get(f"/api/share/{share_id}/places?bbox=2,48,3,49")) == ["berlin", "paris"]
+
+
+def test_existing_shares_are_backfilled(make_app, tmp_path):
+    db_path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE shares (id TEXT PRIMARY KEY, data TEXT NOT NULL, created_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO shares VALUES ('legacy', ?, '2024-01-01', '2024-01-01')",
+        (json.dumps({"title": "Old", "places": PLACES}),),
+    )
+    conn.commit()
+    conn.close()
+
+    app = make_app(DB_PATH=db_path)
+    response = app.test_client().get("/api/share/legacy/places?bbox=12,51,14,53")
+    assert ids(response) == ["berlin", "potsdam"]
+
+
+def test_places_bbox_without_rtree(make_app, monkeypatch):
+    monkeypatch.setattr(app_module, "SQLITE_HAS_RTREE", False)
+    client = make_app().test_client()
+    share_id = create(client)
+    assert ids(client.get(f"/api/share/{share_id}/places?bbox=170,-20,-170,-10")) == ["fiji", "samoa"]
+
+
+def clusters(client, share_id, query):
+    response = client.get(f"/api/share/{share_id}/clusters?{query}")
+    assert response.status_code == 200
+    return sorted((cluster["count"], cluster["lat"], cluster["lng"]) for cluster in response.get_json()["clusters"])
+
+
+def test_clusters_by_zoom(client):
+    share_id = create(client)
+    assert [count for count, _, _ in clusters(client, share_id, "z=0")] == [1, 1, 3]
+    assert clusters(client, share_id, "z=3&bbox=0,45,20,55") == [(1, 48.85, 2.35), (2, 52.455, 13.23)]
+    assert [count for count, _, _ in clusters(client, share_id, "z=12&bbox=12,51,14,53")] == [1, 1]
+    assert client.get(f"/api/share/{share_id}/clusters").status_code == 400
+
+
+def test_clusters_follow_edits(client):
+    share_id = create(client)
+    client.patch(
+        f"/api/share/{share_id}",
+        json={
+            "revision": 1,
+            "ops": [
+                {"op": "remove", "id": "potsdam"},
+                {"op": "update", "id": "paris", "fields": {"lat": 52.51, "lng": 13.41}},
+            ],
+        },
+    )
+    assert clusters(client, share_id, "z=8&bbox=12,51,14,53") == [(2, 52.515, 13.405)]
+    assert clusters(client, share_id, "z=8&bbox=1,47,4,50") == []
+
+
+def place_rows(app):
+    with app.extensions["db_pool"].connection() as conn:
+        return [tuple(row) for row in conn.execute("SELECT id, place_id FROM places ORDER BY id")]
+
+
+def test_identical_shares_share_place_rows(app, client):
+    first, second = create(client), create(client)
+    assert len(place_rows(app)) == len(PLACES)
+    assert ids(client.get(f"/api/share/{second}/places?bbox=12,51,14,53")) == ["berlin", "potsdam"]
+
+    client.put(f"/api/share/{second}", json={"title": "Trip", "places": PLACES[:1]})
+    assert len(place_rows(app)) == len(PLACES) + 1
+    assert ids(client.get(f"/api/share/{first}/places?bbox=12,51,14,53")) == ["berlin", "potsdam"]
+    assert ids(client.get(f"/api/share/{second}/places?bbox=12,51,14,53")) == ["berlin"]
+
+
+def test_edits_reuse_the_previous_documents_place_rows(app, client):
+    share_id = create(client)
+    before = place_rows(app)
+    client.patch(
+        f"/api/share/{share_id}",
+        json={"revision": 1, "ops": [{"op": "update", "id": "paris", "fields": {"title": "Paris!"}}]},
+    )
+    assert place_rows(app) == before
+    response = client.get(f"/api/share/{share_id}/places?bbox=2,48,3,49").get_json()
+    assert response["places"][0]["title"] == "Paris!"
+
+
+@pytest.fixture()
+def deferred_app(make_app):
+    return make_app(PLACE_INDEX_INLINE_MAX=2, PLACE_INDEX_INTERVAL=0)
+
+
+def test_large_lists_are_indexed_after_the_write(deferred_app, monkeypatch):
+    monkeypatch.setattr(app_module, "PLACE_INDEX_CHUNK", 2)
+    client = deferred_app.test_client()
+    share_id = create(client)
+    pending = client.get(f"/api/share/{share_id}/places")
+    assert pending.status_code == 503
+    assert pending.get_json() == {"error": "places_indexing", "revision": 1}
+    assert client.get(f"/api/share/{share_id}/search?q=paris").status_code == 503
+    assert client.get(f"/api/share/{share_id}/clusters?z=0").status_code == 503
+    export = client.get(f"/api/share/{share_id}/export.csv").get_data(as_text=True)
+    assert len(export.splitlines()) == len(PLACES) + 1
+
+    assert deferred_app.extensions["index_places"]() == 1
+    assert ids(client.get(f"/api/share/{share_id}/places?bbox=12,51,14,53")) == ["berlin", "potsdam"]
+    assert client.get(f"/api/share/{share_id}/export.csv").get_data(as_text=True) == export
+
+    client.put(f"/api/share/{share_id}", json={"title": "Trip", "places": PLACES[3:]})
+    assert client.get(f"/api/share/{share_id}/places").status_code == 503
+    assert deferred_app.extensions["index_places"]() == 1
+    assert ids(client.get(f"/api/share/{share_id}/places")) == ["fiji", "samoa", "nowhere"]
+    assert [count for count, _, _ in clusters(client, share_id, "z=0")] == [1, 1]
+    assert deferred_app.extensions["index_places"]() == 0
+
+
+def test_background_indexer_is_woken_by_writes(make_app):
+    client = make_app(PLACE_INDEX_INLINE_MAX=2, PLACE_INDEX_INTERVAL=3600).test_client()
+    share_id = create(client)
+    deadline = time.monotonic() + 5
+    while client.get(f"/api/share/{share_id}/places").status_code == 503 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert ids(client.get(f"/api/share/{share_id}/places?bbox=12,51,14,53")) == ["berlin", "potsdam"]
+
+
+def test_undecodable_documents_are_not_retried(deferred_app):
+    create(deferred_app.test_client())
+    with deferred_app.extensions["db_pool"].connection() as conn:
+        conn.execute("UPDATE share_blobs SET data = ?", (b"\x00znot zlib",))
+        conn.commit()
+    assert deferred_app.extensions["index_places"]() == 1
+    assert deferred_app.extensions["index_places"]() == 0
@@ -0,0 +1,50 @@
+import sqlite3
+import threading
+
+from app import create_app
+
+
+def test_pool_reuses_connections_in_wal_mode(app):
+    pool = app.extensions["db_pool"]
+    with pool.connection() as conn:
+        first = conn
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    with pool.connection() as conn:
+        assert conn is first
+
+
+def test_pool_serves_concurrent_readers(app, client):
+    share_id = client.post("/api/share", json={"title": "T", "places": []}).get_json()["id"]
+    pool = app.extensions["db_pool"]
+    errors = []
+
+    def read():
+        try:
+            for _ in range(20):
+                with pool.connection() as conn:
+                    row = conn.execute("SELECT id FROM shares WHERE id = ?", (share_id,)).fetchone()
+                    assert row["id"] == share_id
+        except Exception as exc:  # pragma: no cover - surfaced via assertion below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert pool._idle.qsize() <= pool.size
+
+
+def test_migrations_can_run_outside_app_startup(tmp_path, monkeypatch):
+    db_path = tmp_path / "fresh.db"
+    monkeypatch.setenv("DB_PATH", str(db_path))
+    app = create_app(migrate=False)
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'shares'").fetchone() is None
+
+    result = app.test_cli_runner().invoke(args=["migrate"])
+    assert result.exit_code == 0
+    assert app.test_client().post("/api/share", json={"places": []}).status_code == 200
+    app.extensions["shutdown"]()
+    app.extensions["shutdown"]()
@@ -0,0 +1,9 @@
+"""Production entry point: `gunicorn -c gunicorn.conf.py wsgi:app`.
+
+With `preload_app` this module is imported once in the gunicorn master, so schema migrations
+run a single time before any worker starts and every worker is forked with the app built.
+"""
+
+from app import create_app
+
+app = create_app()